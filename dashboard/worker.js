@@ -0,0 +1,285 @@
+/*
+ * Dashboard filtering engine (Web Worker)
+ * =======================================
+ * Loads the monthly shards listed in manifest.json, keeps them as typed
+ * arrays (day numbers and member / platform / type codes) with a per-member
+ * row index, and answers filter queries off the main thread. Only the chart
+ * series and windows of table rows are posted back.
+ *
+ * The matching rows of the last query are kept as an index; the table pages
+ * through it, and a sort order is computed once per (query, column) and
+ * reused for every scroll.
+ *
+ * In:  {type: 'init', manifest}
+ *      {type: 'query', id, startDay, endDay, members: [codes], types: [codes],
+ *       platform: code or -1, allMembers, allTypes}
+ *      {type: 'rows', id, sort: {key, dir}, offset, limit}
+ * Out: {type: 'result', id, perDay: [[day, n]], perMember: [[code, n]],
+ *       perPlatform: [[code, n]], matched}
+ *      {type: 'rows', id, sort, offset, rows: [[day, member, platform, type, count]]}
+ *      {type: 'error', id, message}
+ */
+'use strict';
+
+const COLUMNS = ['day', 'member', 'platform', 'type', 'count'];
+const ROLLUPS = {
+    byMember: ['day', 'member', 'count'],
+    byPlatform: ['day', 'platform', 'count'],
+    byType: ['day', 'type', 'count'],
+    memberPlatform: ['member', 'platform', 'count']
+};
+
+let manifest = null;
+const shardCache = {};      // month -> Promise of a decoded shard
+let loaded = null;          // merged shards of the last queried range
+let current = null;         // {id, view, matched, orders} of the last query
+let nameRanks = null;       // dictionary -> Int32Array rank of each code by name
+
+// First index i of an ascending array with arr[i] >= value
+function lowerBound(arr, value, lo = 0, hi = arr.length) {
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (arr[mid] < value) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+}
+
+function concatTyped(arrays) {
+    const out = new Int32Array(arrays.reduce((n, a) => n + a.length, 0));
+    let offset = 0;
+    arrays.forEach(a => { out.set(a, offset); offset += a.length; });
+    return out;
+}
+
+// One shard's columnar JSON -> typed arrays, rows sorted by day
+function decodeShard(json) {
+    const c = json.dailyAudit, n = c.count.length;
+    const order = Array.from({ length: n }, (_, i) => i).sort((a, b) => c.day[a] - c.day[b] || a - b);
+    const cols = {};
+    COLUMNS.forEach(col => {
+        const out = cols[col] = new Int32Array(n);
+        for (let i = 0; i < n; i++) out[i] = c[col][order[i]];
+    });
+    const rollups = {};
+    Object.entries(ROLLUPS).forEach(([name, keys]) => {
+        rollups[name] = {};
+        keys.forEach(col => rollups[name][col] = Int32Array.from(json.rollups[name][col] || []));
+    });
+    return { cols, rollups };
+}
+
+function loadShard(m) {
+    if (!shardCache[m.month]) {
+        // Shard names carry a content hash, so the browser cache can keep them
+        shardCache[m.month] = fetch(m.file)
+            .then(res => { if (!res.ok) throw new Error(`${m.file}: HTTP ${res.status}`); return res.json(); })
+            .then(decodeShard)
+            .catch(e => { delete shardCache[m.month]; throw e; });
+    }
+    return shardCache[m.month];
+}
+
+// Shards overlapping [startDay, endDay], concatenated oldest first (everything stays day-sorted)
+async function loadRange(startDay, endDay) {
+    const months = manifest.months.filter(m => m.lastDay >= startDay && m.firstDay <= endDay);
+    const key = months.map(m => m.month).join(',');
+    if (loaded && loaded.key === key) return loaded;
+    const shards = await Promise.all(months.map(loadShard));
+    const cols = {};
+    COLUMNS.forEach(col => cols[col] = concatTyped(shards.map(sh => sh.cols[col])));
+    const rollups = {};
+    Object.entries(ROLLUPS).forEach(([name, keys]) => {
+        rollups[name] = {};
+        keys.forEach(col => rollups[name][col] = concatTyped(shards.map(sh => sh.rollups[name][col])));
+    });
+    return {
+        key, cols, rollups,
+        rows: cols.count.length,
+        firstDay: months.length ? months[0].firstDay : 0,
+        lastDay: months.length ? months[months.length - 1].lastDay : -1,
+        memberRows: null
+    };
+}
+
+// member code -> ascending row indexes (built once per loaded range)
+function memberRows(view) {
+    if (!view.memberRows) {
+        const n = manifest.dictionaries.members.length;
+        const sizes = new Int32Array(n);
+        view.cols.member.forEach(m => sizes[m]++);
+        const index = Array.from(sizes, size => new Int32Array(size));
+        const fill = new Int32Array(n);
+        view.cols.member.forEach((m, i) => index[m][fill[m]++] = i);
+        view.memberRows = index;
+    }
+    return view.memberRows;
+}
+
+function mask(codes, size) {
+    const keep = new Uint8Array(size);
+    codes.forEach(c => keep[c] = 1);
+    return keep;
+}
+
+function add(map, key, n) {
+    map.set(key, (map.get(key) || 0) + n);
+}
+
+// Sum a day-sorted rollup over [startDay, endDay]
+function sumRollup(r, keyCol, keep, startDay, endDay, perDay, perKey) {
+    const lo = lowerBound(r.day, startDay), hi = lowerBound(r.day, endDay + 1);
+    for (let i = lo; i < hi; i++) {
+        const k = r[keyCol][i];
+        if (keep && !keep[k]) continue;
+        if (perDay) add(perDay, r.day[i], r.count[i]);
+        if (perKey) add(perKey, k, r.count[i]);
+    }
+}
+
+async function query(q) {
+    const view = loaded = await loadRange(q.startDay, q.endDay);
+    const { cols, rollups } = view;
+    const dict = manifest.dictionaries;
+    const { startDay, endDay } = q;
+    const allPlatforms = q.platform < 0;
+    const fullRange = startDay <= view.firstDay && endDay >= view.lastDay;
+    const keepMember = mask(q.members, dict.members.length);
+    const keepType = mask(q.types, dict.types.length);
+    const keepPlatform = allPlatforms ? null : mask([q.platform], dict.platforms.length);
+
+    // Answer each view from a rollup when the filters allow it
+    let perDay = null, perMember = null, perPlatform = null;
+    if (q.allTypes && allPlatforms) {
+        perDay = new Map(); perMember = new Map();
+        sumRollup(rollups.byMember, 'member', keepMember, startDay, endDay, perDay, perMember);
+    } else if (q.allMembers && q.allTypes) {
+        perDay = new Map();
+        sumRollup(rollups.byPlatform, 'platform', keepPlatform, startDay, endDay, perDay, null);
+    } else if (q.allMembers && allPlatforms) {
+        perDay = new Map();
+        sumRollup(rollups.byType, 'type', keepType, startDay, endDay, perDay, null);
+    }
+    if (q.allMembers && q.allTypes) {
+        perPlatform = new Map();
+        sumRollup(rollups.byPlatform, 'platform', keepPlatform, startDay, endDay, null, perPlatform);
+    }
+    if (q.allTypes && fullRange && (!perMember || !perPlatform)) {
+        const m = perMember ? null : (perMember = new Map());
+        const p = perPlatform ? null : (perPlatform = new Map());
+        const r = rollups.memberPlatform;
+        for (let i = 0; i < r.count.length; i++) {
+            if (!keepMember[r.member[i]] || (keepPlatform && !keepPlatform[r.platform[i]])) continue;
+            if (m) add(m, r.member[i], r.count[i]);
+            if (p) add(p, r.platform[i], r.count[i]);
+        }
+    }
+
+    // Candidate rows in the date range: the per-member index when few members are selected
+    const lo = lowerBound(cols.day, startDay), hi = lowerBound(cols.day, endDay + 1);
+    let candidates = null;
+    if (!q.allMembers && q.members.length * 4 < dict.members.length) {
+        const index = memberRows(view);
+        const parts = q.members.map(m => {
+            const rows = index[m] || new Int32Array(0);
+            const from = lowerBound(rows, lo), to = lowerBound(rows, hi);
+            return rows.subarray(from, to);
+        });
+        candidates = concatTyped(parts).sort();
+    }
+    const count = candidates ? candidates.length : hi - lo;
+    const rowAt = candidates ? k => candidates[k] : k => lo + k;
+    const matches = i => keepMember[cols.member[i]] && keepType[cols.type[i]] &&
+        (allPlatforms || cols.platform[i] === q.platform);
+
+    // Anything no rollup covers comes from the rows themselves
+    if (!perDay || !perMember || !perPlatform) {
+        const rowsDay = perDay ? null : (perDay = new Map());
+        const rowsMember = perMember ? null : (perMember = new Map());
+        const rowsPlatform = perPlatform ? null : (perPlatform = new Map());
+        for (let k = 0; k < count; k++) {
+            const i = rowAt(k);
+            if (!matches(i)) continue;
+            const n = cols.count[i];
+            if (rowsDay) add(rowsDay, cols.day[i], n);
+            if (rowsMember) add(rowsMember, cols.member[i], n);
+            if (rowsPlatform) add(rowsPlatform, cols.platform[i], n);
+        }
+    }
+
+    // Every matching row, ascending by day, for the detail table
+    const matched = new Int32Array(count);
+    let m = 0;
+    for (let k = 0; k < count; k++) {
+        const i = rowAt(k);
+        if (matches(i)) matched[m++] = i;
+    }
+    current = { id: q.id, view, matched: matched.subarray(0, m), orders: {} };
+
+    return {
+        perDay: [...perDay.entries()].sort((a, b) => a[0] - b[0]),
+        perMember: [...perMember.entries()],
+        perPlatform: [...perPlatform.entries()],
+        matched: m
+    };
+}
+
+function ranks(names) {
+    const order = names.map((_, i) => i).sort((a, b) => String(names[a]).localeCompare(String(names[b])));
+    const rank = new Int32Array(names.length);
+    order.forEach((code, r) => rank[code] = r);
+    return rank;
+}
+
+// Matched rows ordered by `key` ascending (ties: by day, then row), computed once per query and key
+function orderBy(key) {
+    if (!current.orders[key]) {
+        const { matched } = current, cols = current.view.cols;
+        if (key === 'day') {
+            current.orders[key] = matched;
+        } else {
+            if (!nameRanks) {
+                const d = manifest.dictionaries;
+                nameRanks = { member: ranks(d.members), platform: ranks(d.platforms), type: ranks(d.types) };
+            }
+            const rank = nameRanks[key];
+            const col = cols[key];
+            const sortKey = rank ? i => rank[col[i]] : i => col[i];
+            const keys = new Float64Array(matched.length);
+            matched.forEach((i, k) => keys[k] = sortKey(i));
+            const perm = Array.from(matched.keys()).sort((a, b) => keys[a] - keys[b] || a - b);
+            current.orders[key] = Int32Array.from(perm, k => matched[k]);
+        }
+    }
+    return current.orders[key];
+}
+
+// A window of table rows in the requested order (dir -1 = descending)
+function rows(msg) {
+    if (!current || current.id !== msg.id) return null;
+    const order = orderBy(msg.sort.key), cols = current.view.cols;
+    const n = order.length, out = [];
+    for (let k = msg.offset; k < Math.min(n, msg.offset + msg.limit); k++) {
+        const i = order[msg.sort.dir < 0 ? n - 1 - k : k];
+        out.push([cols.day[i], cols.member[i], cols.platform[i], cols.type[i], cols.count[i]]);
+    }
+    return out;
+}
+
+self.onmessage = async e => {
+    const msg = e.data;
+    if (msg.type === 'init') {
+        manifest = msg.manifest;
+        return;
+    }
+    if (msg.type === 'query') {
+        try {
+            self.postMessage({ type: 'result', id: msg.id, ...(await query(msg)) });
+        } catch (err) {
+            self.postMessage({ type: 'error', id: msg.id, message: err.message });
+        }
+    }
+    if (msg.type === 'rows') {
+        const out = rows(msg);
+        if (out) self.postMessage({ type: 'rows', id: msg.id, sort: msg.sort, offset: msg.offset, rows: out });
+    }
+};
@@ -0,0 +1,244 @@
+"""
+Daily Audit Cube
+================
+Compact storage for the Daily Audit matrix.
+
+Instead of one row per Person × Date × (Platform, Event Type) - almost all of
+them zero - counts are held in a single int32 array indexed by
+[member, date, event type], with the axis labels stored alongside.
+Zero-filled Daily Audit rows are only expanded at the edge, for consumers
+that need them (the Google Sheet tab).
+
+Files (under state/daily_audit/):
+- counts.npy - int32 array, shape (members, dates, event types)
+- axes.json  - {"members": [...], "dates": ["2026-01-01", ...],
+                "event_types": [["Platform", "Event Type"], ...]}
+"""
+
+import os
+import json
+import sys
+import hashlib
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+
+sys.path.insert(0, SCRIPT_DIR)
+from config import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+CUBE_DIR = os.path.join(ROOT_DIR, 'state', 'daily_audit')
+
+# Daily Audit columns, in output order
+AUDIT_KEYS = ['Team Member', 'Activity Date', 'Platform', 'Activity Type']
+AUDIT_COLUMNS = AUDIT_KEYS + ['Count']
+
+# Date format used in every Sheet tab
+SHEET_DATE_FORMAT = '%m/%d/%y'
+
+
+class AuditCube:
+    """Daily Audit counts as a dense [member, date, event type] array."""
+
+    def __init__(self, members, dates, event_types, counts):
+        self.members = list(members)
+        self.dates = pd.DatetimeIndex(dates)            # ascending, one per day
+        self.event_types = [tuple(et) for et in event_types]
+        self.counts = counts
+
+    # ------------------------------------------
+    # Building / persistence
+    # ------------------------------------------
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build a cube from rows with AUDIT_COLUMNS (dates typed or MM/DD/YY
+        strings). Dates with no activity at all are left off the date axis.
+        """
+        dt = df['Activity Date']
+        if not pd.api.types.is_datetime64_any_dtype(dt):
+            dt = pd.to_datetime(dt, format=SHEET_DATE_FORMAT, errors='coerce')
+        dt = dt.dt.normalize()
+        if dt.isna().any():
+            print(f"  [WARN] Dropping {int(dt.isna().sum())} rows with unparseable dates")
+        df = df[dt.notna()]
+        dt = dt[dt.notna()]
+
+        member_codes, members = pd.factorize(df['Team Member'], sort=True)
+        date_codes, dates = pd.factorize(dt, sort=True)
+        et_index = pd.MultiIndex.from_frame(df[['Platform', 'Activity Type']])
+        et_codes, event_types = pd.factorize(et_index, sort=True)
+
+        counts = np.zeros((len(members), len(dates), len(event_types)), dtype=np.int32)
+        np.add.at(counts, (member_codes, date_codes, et_codes), df['Count'].to_numpy(dtype=np.int32))
+        return cls(members, dates, list(event_types), counts)._without_idle_dates()
+
+    def _without_idle_dates(self):
+        """This cube without the dates whose counts are all zero."""
+        active = np.asarray(self.counts).any(axis=(0, 2))
+        if active.all():
+            return self
+        return AuditCube(self.members, self.dates[active], self.event_types, self.counts[:, active, :])
+
+    def save(self, path=CUBE_DIR):
+        """Write counts.npy + axes.json to `path`."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'counts.npy'), self.counts)
+        axes = {
+            'members': self.members,
+            'dates': [d.strftime('%Y-%m-%d') for d in self.dates],
+            'event_types': [list(et) for et in self.event_types],
+        }
+        with open(os.path.join(path, 'axes.json'), 'w') as f:
+            json.dump(axes, f)
+
+    @classmethod
+    def load(cls, path=CUBE_DIR, mmap=True):
+        """Load a saved cube (memory-mapped by default). Returns None if missing."""
+        counts_path = os.path.join(path, 'counts.npy')
+        axes_path = os.path.join(path, 'axes.json')
+        if not (os.path.exists(counts_path) and os.path.exists(axes_path)):
+            return None
+        with open(axes_path) as f:
+            axes = json.load(f)
+        counts = np.load(counts_path, mmap_mode='r' if mmap else None)
+        return cls(axes['members'], pd.to_datetime(axes['dates']), axes['event_types'], counts)
+
+    def merge_dates(self, other, dates):
+        """
+        New cube holding this cube's counts, except for `dates` (any date-likes),
+        which are taken from `other`. Axes are the union of both cubes; dates
+        left with no activity at all are dropped.
+        """
+        replaced = pd.DatetimeIndex(pd.to_datetime(list(dates))).normalize()
+        members = sorted(set(self.members) | set(other.members))
+        event_types = sorted(set(self.event_types) | set(other.event_types))
+        all_dates = self.dates.union(other.dates).union(replaced)
+
+        counts = np.zeros((len(members), len(all_dates), len(event_types)), dtype=np.int32)
+        for cube, keep in ((self, ~self.dates.isin(replaced)), (other, other.dates.isin(replaced))):
+            m = np.searchsorted(members, cube.members)
+            d = all_dates.get_indexer(cube.dates[keep])
+            e = np.array([event_types.index(et) for et in cube.event_types], dtype=np.intp)
+            counts[np.ix_(m, d, e)] = np.asarray(cube.counts)[:, keep, :]
+
+        return AuditCube(members, all_dates, event_types, counts)._without_idle_dates()
+
+    # ------------------------------------------
+    # Queries
+    # ------------------------------------------
+    def date_slice(self, start=None, end=None):
+        """Slice of the date axis covering [start, end] (inclusive, any date-like)."""
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start).normalize(), side='left')
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end).normalize(), side='right')
+        return slice(lo, hi)
+
+    def totals(self, start=None, end=None):
+        """
+        Totals for [start, end]: {'total', 'members': {name: n}, 'platforms': {name: n}}.
+        Members and platforms with no activity in the range are left out.
+        """
+        window = np.asarray(self.counts[:, self.date_slice(start, end), :], dtype=np.int64)
+        by_member_et = window.sum(axis=1)                      # (members, event types)
+
+        member_totals = by_member_et.sum(axis=1)
+        members = {self.members[i]: int(member_totals[i]) for i in np.flatnonzero(member_totals)}
+
+        platforms = {}
+        for (platform, _), n in zip(self.event_types, by_member_et.sum(axis=0)):
+            if n:
+                platforms[platform] = platforms.get(platform, 0) + int(n)
+
+        return {'total': int(member_totals.sum()), 'members': members, 'platforms': platforms}
+
+    def member_platform_totals(self, start=None, end=None):
+        """Totals for [start, end] as a DataFrame (members x platforms)."""
+        window = np.asarray(self.counts[:, self.date_slice(start, end), :]).sum(axis=1, dtype=np.int64)
+        platform_codes, platforms = pd.factorize(pd.Index([et[0] for et in self.event_types]), sort=True)
+        by_platform = np.zeros((len(self.members), len(platforms)), dtype=np.int64)
+        np.add.at(by_platform.T, platform_codes, window.T)
+        return pd.DataFrame(by_platform, index=self.members, columns=[str(p) for p in platforms])
+
+    def daily_rollup(self, start=None, end=None):
+        """
+        Date-indexed totals for [start, end], built in one pass over the counts:
+        {'members': DataFrame (dates x members), 'platforms': DataFrame (dates x platforms)}.
+        Any date-range question is then a row slice of these two frames.
+        """
+        window = self.date_slice(start, end)
+        counts = np.asarray(self.counts[:, window, :])
+        by_member = counts.sum(axis=2, dtype=np.int64)                         # (members, dates)
+        by_et = counts.sum(axis=0, dtype=np.int64)                             # (dates, event types)
+
+        platform_codes, platforms = pd.factorize(pd.Index([et[0] for et in self.event_types]), sort=True)
+        by_platform = np.zeros((by_et.shape[0], len(platforms)), dtype=np.int64)
+        np.add.at(by_platform.T, platform_codes, by_et.T)
+
+        return {
+            'members': pd.DataFrame(by_member.T, index=self.dates[window], columns=self.members),
+            'platforms': pd.DataFrame(by_platform, index=self.dates[window], columns=[str(p) for p in platforms]),
+        }
+
+    def month_slices(self):
+        """[('YYYY-MM', date slice), ...] for every month on the date axis, oldest first."""
+        months = self.dates.strftime('%Y-%m')
+        result = []
+        for month in pd.unique(months):
+            idx = np.flatnonzero(months == month)
+            result.append((month, slice(int(idx[0]), int(idx[-1]) + 1)))
+        return result
+
+    def digest(self, dates=slice(None)):
+        """Fingerprint of the axes and the counts for a date slice."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps([self.members, [list(et) for et in self.event_types],
+                             [d.strftime('%Y-%m-%d') for d in self.dates[dates]]]).encode())
+        h.update(np.ascontiguousarray(self.counts[:, dates, :]).tobytes())
+        return h.hexdigest()
+
+    # ------------------------------------------
+    # Row expansion (edge consumers only)
+    # ------------------------------------------
+    def iter_frames(self, chunk_rows=10000, dates=slice(None)):
+        """
+        Yield the zero-filled Daily Audit rows as DataFrames, in tab order:
+        date (newest first), then platform, activity type and person.
+        Each chunk covers whole dates and holds roughly `chunk_rows` rows.
+        `dates` limits the expansion to a slice of the date axis.
+        """
+        n_members, _, n_types = self.counts.shape
+        rows_per_date = n_members * n_types
+        dates_per_chunk = max(1, chunk_rows // max(1, rows_per_date))
+
+        members = np.array(self.members, dtype=object)
+        platforms = np.array([et[0] for et in self.event_types], dtype=object)
+        types = np.array([et[1] for et in self.event_types], dtype=object)
+        labels = np.array(self.dates.strftime(SHEET_DATE_FORMAT), dtype=object)
+
+        newest_first = np.arange(len(self.dates))[dates][::-1]
+        for i in range(0, len(newest_first), dates_per_chunk):
+            idx = newest_first[i:i + dates_per_chunk]
+            # (member, date, type) -> (date, type, member), flattened in tab order
+            block = np.asarray(self.counts[:, idx, :]).transpose(1, 2, 0).reshape(-1)
+            yield pd.DataFrame({
+                'Team Member': np.tile(members, len(idx) * n_types),
+                'Activity Date': np.repeat(labels[idx], rows_per_date),
+                'Platform': np.tile(np.repeat(platforms, n_members), len(idx)),
+                'Activity Type': np.tile(np.repeat(types, n_members), len(idx)),
+                'Count': block.astype(np.int64),
+            }, columns=AUDIT_COLUMNS)
+
+    def nonzero_frame(self):
+        """Only the non-zero Daily Audit rows, in tab order."""
+        m, d, e = np.nonzero(np.asarray(self.counts))
+        df = pd.DataFrame({
+            'Team Member': np.array(self.members, dtype=object)[m],
+            'Activity Date': np.array(self.dates.strftime(SHEET_DATE_FORMAT), dtype=object)[d],
+            'Platform': np.array([et[0] for et in self.event_types], dtype=object)[e],
+            'Activity Type': np.array([et[1] for et in self.event_types], dtype=object)[e],
+            'Count': np.asarray(self.counts)[m, d, e].astype(np.int64),
+        }, columns=AUDIT_COLUMNS)
+        # Tab order: newest date first, then event type, then person
+        order = np.lexsort((m, e, -d))
+        return df.iloc[order].reset_index(drop=True)
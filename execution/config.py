@@ -0,0 +1,166 @@
+"""
+Pipeline Configuration
+======================
+Parses .env and the environment once into a typed, read-only `settings`
+object shared by every script, instead of each module running its own
+load_env() and os.environ.get() calls.
+
+Values in .env override the environment, as before. Scripts keep their
+module-level constants (SHEET_ID, START_DATE_STR, ...) but take them from
+`settings`.
+
+lazy_import() defers heavy libraries (pandas, numpy, gspread) until their
+first attribute access, so `--help`, dry runs and stages that exit early
+(e.g. a fetcher without its API token) don't pay for them.
+"""
+
+import os
+import sys
+import importlib.util
+from dataclasses import dataclass
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+ENV_PATH = os.path.join(ROOT_DIR, '.env')
+
+DEFAULT_SHEET_ID = '1t7jeunt3IDmnBcIoRYxM06sZgzCYYMAK8AgwH21M0Fo'
+
+
+def load_env(path=ENV_PATH):
+    """Copy KEY=value lines from .env into os.environ."""
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    os.environ[key] = value
+
+
+def lazy_import(name):
+    """
+    Module `name`, loaded on first attribute access. Use for heavy
+    libraries imported as a whole (`pd = lazy_import('pandas')`).
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def _str(name, default=''):
+    return os.environ.get(name, default)
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def _flag(name):
+    return os.environ.get(name, '') == '1'
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Google
+    sheet_id: str
+    start_date: str                      # YYYY-MM-DD, first day of every report
+    token_refresh_margin: int            # seconds before expiry to refresh the token
+
+    # Platforms
+    clickup_api_key: str
+    clickup_workspace_id: str
+    clickup_team_id: str
+    github_token: str
+    github_org: str
+    figma_token: str
+    figma_team_id: str
+    backendless_app_id: str
+    backendless_dev_login: str
+    backendless_dev_password: str
+
+    # Reports
+    full_recompute: bool
+    session_idle_minutes: float
+    activity_time_engine: str
+    activity_time_lookback_days: int
+    daily_audit_partitioning: str
+
+    # Run summary
+    import_time_report: bool             # per-stage cold-start import times (eager imports only)
+    http_metrics_textfile: str           # Prometheus textfile for the HTTP metrics
+    trace: bool                          # write Chrome trace-event spans
+    memory_profile: bool                 # tracemalloc peaks / allocation sites per stage
+
+    # Dashboard
+    dashboard_precompress: bool          # also write .gz/.br shard variants
+
+    # Sheets I/O
+    sheets_writes_per_minute: int
+    sheets_full_rewrite: bool
+
+    # Email
+    email_recipients: tuple
+    email_user: str
+    email_password: str
+    dashboard_url: str
+    member_digests: bool
+    digest_domain: str
+    digest_batch_size: int
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            sheet_id=_str('GOOGLE_SHEET_ID') or DEFAULT_SHEET_ID,
+            start_date=_str('START_DATE', '2026-01-01'),
+            token_refresh_margin=_int('TOKEN_REFRESH_MARGIN', '300'),
+
+            clickup_api_key=_str('CLICKUP_API_KEY'),
+            clickup_workspace_id=_str('CLICKUP_WORKSPACE_ID', '9011906822'),
+            clickup_team_id=_str('CLICKUP_TEAM_ID', '9011906822'),
+            github_token=_str('GITHUB_TOKEN') or _str('GH_PAT'),
+            github_org=_str('GITHUB_ORG', 'Pvragon'),
+            figma_token=_str('FIGMA_TOKEN'),
+            figma_team_id=_str('FIGMA_TEAM_ID'),
+            backendless_app_id=_str('BACKENDLESS_APP_ID'),
+            backendless_dev_login=_str('BACKENDLESS_DEV_LOGIN'),
+            backendless_dev_password=_str('BACKENDLESS_DEV_PASSWORD'),
+
+            full_recompute=_flag('FULL_RECOMPUTE'),
+            session_idle_minutes=_float('SESSION_IDLE_MINUTES', '30'),
+            activity_time_engine=_str('ACTIVITY_TIME_ENGINE', 'stream'),
+            activity_time_lookback_days=_int('ACTIVITY_TIME_LOOKBACK_DAYS', '2'),
+            daily_audit_partitioning=_str('DAILY_AUDIT_PARTITIONING').lower(),
+
+            import_time_report=_flag('IMPORT_TIME_REPORT'),
+            trace=_flag('PIPELINE_TRACE'),
+            memory_profile=_flag('MEMORY_PROFILE'),
+            http_metrics_textfile=_str('HTTP_METRICS_TEXTFILE') or os.path.join(ROOT_DIR, 'state', 'metrics', 'pipeline_http.prom'),
+
+            dashboard_precompress=_flag('DASHBOARD_PRECOMPRESS'),
+
+            sheets_writes_per_minute=_int('SHEETS_WRITES_PER_MINUTE', '55'),
+            sheets_full_rewrite=_flag('SHEETS_FULL_REWRITE'),
+
+            email_recipients=tuple(_str('EMAIL_RECIPIENTS', 'areeba@pvragon.com').split(',')),
+            email_user=_str('EMAIL_USER'),
+            email_password=_str('EMAIL_PASSWORD'),
+            dashboard_url=_str('DASHBOARD_URL', 'https://pvragon.github.io/activity-dashboard'),
+            member_digests=_flag('MEMBER_DIGESTS'),
+            digest_domain=_str('DIGEST_DOMAIN', 'pvragon.com').lower(),
+            digest_batch_size=_int('DIGEST_BATCH_SIZE', '20'),
+        )
+
+
+load_env()
+settings = Settings.from_env()
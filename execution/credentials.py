@@ -0,0 +1,155 @@
+"""
+Google Credentials
+==================
+The single place that loads, refreshes and saves the Google OAuth token
+(token.json) and authorizes gspread. Every script gets its credentials and
+its gspread client from here.
+
+- get_credentials() loads token.json once per process and returns the same
+  object on every call. It refreshes the access token proactively, when it
+  expires within TOKEN_REFRESH_MARGIN seconds (default 300), not after a
+  request has failed.
+- A refresh happens under an exclusive lock on token.json.lock. token.json is
+  re-read inside the lock first, so a token another run just refreshed is
+  reused instead of refreshed again. The refreshed token is written to a
+  temp file and renamed into place, so readers never see a partial file.
+- get_gspread_client() / open_sheet() return one authorized gspread client
+  (and one Spreadsheet per key) per process.
+- With no token.json, a local run with a client secret file in the project
+  root opens the browser consent flow; otherwise None is returned.
+
+The token keeps the scopes it was granted; `scopes` is only used for the
+consent flow. File locking needs fcntl (POSIX); elsewhere refreshes are
+unlocked.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:   # Windows: refreshes are not locked
+    fcntl = None
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+TOKEN_PATH = os.path.join(ROOT_DIR, 'token.json')
+LOCK_PATH = TOKEN_PATH + '.lock'
+
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings
+from run_manifest import step
+
+TOKEN_REFRESH_MARGIN = timedelta(seconds=settings.token_refresh_margin)
+DEFAULT_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+_creds = None
+_client = None
+_sheets = {}
+
+
+class _TokenLock:
+    """Exclusive lock on LOCK_PATH (no-op without fcntl)."""
+
+    def __enter__(self):
+        self.f = open(LOCK_PATH, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+        self.f.close()
+
+
+def _load_token():
+    from google.oauth2.credentials import Credentials
+    if not os.path.exists(TOKEN_PATH):
+        return None
+    try:
+        return Credentials.from_authorized_user_file(TOKEN_PATH)
+    except (OSError, ValueError) as e:
+        print(f"  [WARN] Could not read {os.path.basename(TOKEN_PATH)}: {e}")
+        return None
+
+
+def _save_token(creds):
+    tmp = f"{TOKEN_PATH}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(creds.to_json())
+    os.replace(tmp, TOKEN_PATH)
+
+
+def _needs_refresh(creds):
+    """True when the access token is missing, expired or expires within the margin."""
+    if not creds.token or creds.expiry is None:
+        return not creds.valid
+    return creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+
+
+def _refresh(creds):
+    """Refresh `creds` in place, reusing a token another run saved meanwhile."""
+    with _TokenLock():
+        on_disk = _load_token()
+        if on_disk is not None and on_disk.refresh_token == creds.refresh_token and not _needs_refresh(on_disk):
+            creds.token, creds.expiry = on_disk.token, on_disk.expiry
+            return
+        from google.auth.transport.requests import Request
+        print("  [AUTH] Refreshing Google token...")
+        with step('token_refresh'):
+            creds.refresh(Request())
+        _save_token(creds)
+
+
+def _consent_flow(scopes):
+    """Browser consent flow with a client secret file from the project root, or None."""
+    secrets = [f for f in os.listdir(ROOT_DIR) if 'client_secret' in f or f == 'credentials.json']
+    if not secrets or not sys.stdin.isatty():
+        return None
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    flow = InstalledAppFlow.from_client_secrets_file(os.path.join(ROOT_DIR, secrets[0]), scopes)
+    creds = flow.run_local_server(port=0)
+    with _TokenLock():
+        _save_token(creds)
+    return creds
+
+
+def get_credentials(scopes=None):
+    """
+    The process-wide Google credentials, refreshed if they expire soon.
+    Returns None when there is no token and no way to create one.
+    """
+    global _creds
+    if _creds is None:
+        _creds = _load_token() or _consent_flow(scopes or DEFAULT_SCOPES)
+        if _creds is None:
+            print(f"  [ERROR] No valid credentials - {TOKEN_PATH} is missing or unreadable")
+            return None
+    if _creds.refresh_token and _needs_refresh(_creds):
+        _refresh(_creds)
+    return _creds
+
+
+def get_gspread_client(scopes=None):
+    """The process-wide authorized gspread client (None without credentials)."""
+    global _client
+    creds = get_credentials(scopes)
+    if creds is None:
+        return None
+    if _client is None:
+        import gspread
+        _client = gspread.authorize(creds)
+    return _client
+
+
+def open_sheet(sheet_id):
+    """Spreadsheet for `sheet_id`, opened once per process."""
+    if sheet_id not in _sheets:
+        gc = get_gspread_client()
+        if gc is None:
+            raise RuntimeError(f"No Google credentials ({TOKEN_PATH})")
+        _sheets[sheet_id] = gc.open_by_key(sheet_id)
+    return _sheets[sheet_id]
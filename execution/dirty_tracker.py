@@ -0,0 +1,140 @@
+"""
+Dirty-Set Tracker
+=================
+Records which dates received new or changed activity, so the report stages
+only recompute those days instead of every day since START_DATE. Both report
+stages rebuild whole days (every member), so dates are all that is tracked.
+
+Ingestion (the fetch scripts and the console log import) calls
+record_source() after a successful upload. The source's aggregate rows are
+fingerprinted per date and compared with the fingerprints from the previous
+run; dates that appeared, changed or disappeared are added to the pending
+dirty set of every report stage. Each source must be recorded by exactly one
+producer, or the fingerprints flip between their outputs every run.
+
+Report stages call load_dirty(stage), and clear_dirty(stage, dates) with the
+dates they recomputed once their outputs have been written. load_dirty() returns None when nothing has ever
+been recorded, meaning "unknown - recompute everything". Set FULL_RECOMPUTE=1
+to force that (e.g. after editing name_mappings.py exclusion rules).
+
+State (under state/dirty/):
+- fingerprints/<source>.json - {"YYYY-MM-DD": hash}
+- pending.json               - {stage: ["YYYY-MM-DD", ...]}
+"""
+
+import os
+import sys
+import json
+import hashlib
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+DIRTY_DIR = os.path.join(ROOT_DIR, 'state', 'dirty')
+PENDING_PATH = os.path.join(DIRTY_DIR, 'pending.json')
+
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
+
+# Report stages that consume the dirty set
+STAGES = ('daily_audit', 'activity_time')
+FULL_RECOMPUTE = settings.full_recompute
+START_DATE = settings.start_date
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def fingerprints(df, date_col='Date'):
+    """{"YYYY-MM-DD": hash} over a source's aggregate rows."""
+    if df.empty:
+        return {}
+    dates = pd.to_datetime(df[date_col], format='%m/%d/%y', errors='coerce').dt.strftime('%Y-%m-%d')
+    rows = df.astype(str).agg('\x1f'.join, axis=1)
+
+    result = {}
+    for key, group in rows.groupby(dates.fillna(''), sort=False):
+        h = hashlib.blake2b(digest_size=8)
+        for row in sorted(group):
+            h.update(row.encode())
+        result[key] = h.hexdigest()
+    return result
+
+
+def _fingerprint_path(source):
+    return os.path.join(DIRTY_DIR, 'fingerprints', f"{source}.json")
+
+
+def source_changes(source, df, date_col='Date'):
+    """
+    Dates on which `df` differs from the rows last recorded for `source`,
+    without recording anything (for a report stage that uses rows whose
+    upload is still queued).
+    """
+    previous = _read_json(_fingerprint_path(source), {})
+    current = fingerprints(df, date_col)
+    return {k for k in previous.keys() | current.keys()
+            if previous.get(k) != current.get(k) and k and k >= START_DATE}
+
+
+def record_source(source, df, date_col='Date'):
+    """
+    Compare a source's freshly uploaded rows against the previous run and add
+    every date that changed to the pending dirty sets. Call it only once the
+    upload succeeded (directly after flush(), or from scheduler.on_success).
+    Returns the number of dirty dates found.
+    """
+    path = _fingerprint_path(source)
+    previous = _read_json(path, {})
+    current = fingerprints(df, date_col)
+
+    changed = {k for k in previous.keys() | current.keys() if previous.get(k) != current.get(k)}
+    pending = _read_json(PENDING_PATH, {})
+    for stage in STAGES:
+        pending[stage] = sorted(set(pending.get(stage, [])) | changed)
+    _write_json(PENDING_PATH, pending)
+    _write_json(path, current)
+
+    print(f"  [DIRTY] {source}: {len(changed)} changed dates")
+    return len(changed)
+
+
+def load_dirty(stage):
+    """
+    Pending dirty dates ({'YYYY-MM-DD'}) of a report stage, or None when no
+    ingestion has been recorded yet (recompute everything). Dates before
+    START_DATE are dropped: no report covers them.
+    """
+    if FULL_RECOMPUTE:
+        return None
+    pending = _read_json(PENDING_PATH, None)
+    if pending is None or stage not in pending:
+        return None
+    return {d for d in pending[stage] if d and d >= START_DATE}
+
+
+def clear_dirty(stage, dates=None):
+    """
+    Mark a stage's pending dates as processed: `dates` (what the stage loaded
+    and recomputed), or all of them when None (a full recompute). Dates
+    recorded after the stage loaded its set stay pending.
+    """
+    pending = _read_json(PENDING_PATH, {})
+    pending[stage] = [] if dates is None else sorted(set(pending.get(stage, [])) - set(dates))
+    _write_json(PENDING_PATH, pending)
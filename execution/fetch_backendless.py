@@ -1,12 +1,8 @@
 import requests
 import json
-import pandas as pd
 from datetime import datetime
 import os
 import sys
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 import re
 import time
 
@@ -14,24 +10,22 @@ import time
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
 sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
 from name_mappings import map_name, should_exclude
+from sheets_io import SheetSink
+from credentials import get_gspread_client
+from run_manifest import step, count
 
 # Config
 # RECIPE: Target https://develop.backendless.com/console/home/login
 # Note: 'console.backendless.com' is often an alias for 'develop.backendless.com'
 LOGIN_URL = "https://develop.backendless.com/console/home/login"
 
-APP_ID = os.environ.get('BACKENDLESS_APP_ID')
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID')
-DEV_LOGIN = os.environ.get('BACKENDLESS_DEV_LOGIN')
-DEV_PASSWORD = os.environ.get('BACKENDLESS_DEV_PASSWORD')
-
-def get_google_creds():
-    token_path = os.path.join(ROOT_DIR, 'token.json')
-    creds = Credentials.from_authorized_user_file(token_path)
-    if not creds.valid and creds.refresh_token:
-        creds.refresh(Request())
-    return creds
+APP_ID = settings.backendless_app_id
+SHEET_ID = settings.sheet_id
+DEV_LOGIN = settings.backendless_dev_login
+DEV_PASSWORD = settings.backendless_dev_password
 
 def clean_developer_email(dev_raw):
     """
@@ -72,7 +66,8 @@ def fetch_logs_internal_api():
     try:
         # 1. Login
         login_payload = {'login': DEV_LOGIN, 'password': DEV_PASSWORD}
-        res = s.post(LOGIN_URL, json=login_payload)
+        with step('login'):
+            res = s.post(LOGIN_URL, json=login_payload)
         
         if res.status_code != 200:
             print(f"[API] Login Failed: {res.status_code} - {res.text}")
@@ -97,7 +92,8 @@ def fetch_logs_internal_api():
         headers = {'auth-key': auth_key}
         
         print(f"[API] Fetching Logs from {audit_url}...")
-        log_res = s.get(audit_url, headers=headers)
+        with step('audit_logs'):
+            log_res = s.get(audit_url, headers=headers)
         
         if log_res.status_code != 200:
             print(f"[API] Log Validated Failed: {log_res.status_code} - {log_res.text}")
@@ -117,7 +113,8 @@ def main():
     print("Backendless Activity Fetch (Python Recipe)")
     print("="*60)
     
-    logs = fetch_logs_internal_api()
+    with step('fetch'):
+        logs = fetch_logs_internal_api()
     source = 'API'
     
     if not logs:
@@ -135,6 +132,7 @@ def main():
         return # Exit gracefully
 
     # Process
+    count('events_ingested', len(logs))
     print(f"Processing {len(logs)} logs from {source}...")
     processed = []
     
@@ -180,18 +178,16 @@ def main():
     
     # Upload
     print(f"[Sheet] Uploading {len(rows)} summarized rows...")
-    creds = get_google_creds()
-    gc = gspread.authorize(creds)
+    gc = get_gspread_client()
     sh = gc.open_by_key(SHEET_ID)
     
     # Update 'Console_Audit_Logs'
-    try: ws = sh.worksheet('Console_Audit_Logs')
-    except: ws = sh.add_worksheet('Console_Audit_Logs', 5000, 10)
-    
-    ws.clear()
     headers = ['Name', 'Date', 'Platform', 'Event Type', 'Count']
     values = [headers] + [[r[h] for h in headers] for r in rows]
-    ws.update(values=values, range_name='A1')
+    with step('upload'):
+        sink = SheetSink(sh)
+        sink.write('Console_Audit_Logs', values, 5000, 10)
+        sink.flush()
     print("[SUCCESS] Done.")
 
 if __name__ == "__main__":
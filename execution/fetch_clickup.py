@@ -1,38 +1,28 @@
 import requests
 import json
-import pandas as pd
 from datetime import datetime
 import os
+import sys
 import time
-import gspread
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 
 # ==========================================
 # CONFIGURATION - Loaded from environment
 # ==========================================
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
+from sheets_io import SheetSink
+from credentials import get_gspread_client
+from dirty_tracker import record_source
+from run_manifest import step, count, traced
 
-# Load .env file
-def load_env():
-    env_path = os.path.join(ROOT_DIR, '.env')
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
-
-load_env()
-
-CLICKUP_API_KEY = os.environ.get('CLICKUP_API_KEY', '')
-WORKSPACE_ID = os.environ.get('CLICKUP_WORKSPACE_ID', '9011906822')
-TEAM_ID = os.environ.get('CLICKUP_TEAM_ID', '9011906822')
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '')
-START_DATE_STR = os.environ.get('START_DATE', '2026-01-01')
+CLICKUP_API_KEY = settings.clickup_api_key
+WORKSPACE_ID = settings.clickup_workspace_id
+TEAM_ID = settings.clickup_team_id
+SHEET_ID = settings.sheet_id
+START_DATE_STR = settings.start_date
 START_TS_MS = int(datetime.strptime(START_DATE_STR, "%Y-%m-%d").timestamp() * 1000)
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
@@ -74,7 +64,8 @@ def fetch_task_activity():
                 "include_closed": "true",
                 "include_deleted": "true"
             }
-            resp = requests.get(url, headers=get_headers_v2(), params=params)
+            with step('task_page'):
+                resp = requests.get(url, headers=get_headers_v2(), params=params)
             if resp.status_code != 200: break
             tasks = resp.json().get('tasks', [])
             if not tasks: break
@@ -152,7 +143,8 @@ def fetch_chat_activity():
         cursor = ""
         while True:
             url = f"https://api.clickup.com/api/v3/workspaces/{WORKSPACE_ID}/chat/channels"
-            resp = requests.get(url, headers=get_headers_v3(), params={"cursor": cursor} if cursor else {})
+            with step('channel_page'):
+                resp = requests.get(url, headers=get_headers_v3(), params={"cursor": cursor} if cursor else {})
             if resp.status_code != 200: break
             data = resp.json()
             channels = data.get('data', []) or data.get('channels', [])
@@ -195,8 +187,10 @@ def fetch_chat_activity():
     except: pass
     return events
 
+@traced()
 def process_and_upload(events):
     print("[4/4] Processing and Uploading...")
+    count('events_ingested', len(events))
     if not events: print("  No events found."); return
     
     df = pd.DataFrame(events)
@@ -212,33 +206,31 @@ def process_and_upload(events):
     final_df = summary[['Name', 'Date', 'Platform', 'Event Type', 'Quantity']]
     
     # Upload
-    creds = None
-    if os.path.exists('token.json'): creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token: creds.refresh(Request())
-        else:
-             secrets = [f for f in os.listdir('.') if 'client_secret' in f or 'credentials.json' in f]
-             if not secrets: return
-             flow = InstalledAppFlow.from_client_secrets_file(secrets[0], SCOPES)
-             creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token: token.write(creds.to_json())
-
-    gc = gspread.authorize(creds)
+    gc = get_gspread_client(SCOPES)
+    if gc is None: return
     try:
         sh = gc.open_by_key(SHEET_ID)
         tn = "Clickup_Activity"
-        try: ws = sh.worksheet(tn); ws.clear()
-        except: ws = sh.add_worksheet(tn, 1000, 20)
-        ws.update(values=[final_df.columns.values.tolist()], range_name='A1')
-        ws.append_rows(final_df.values.tolist())
+        sink = SheetSink(sh)
+        sink.write_frame(tn, final_df, 1000, 20)
+        sink.flush()
+        record_source(tn, final_df)
         print(f"  [SUCCESS] Uploaded {len(final_df)} aggregate rows.")
         print("  Event breakdown:")
         print(df['event_type'].value_counts().to_string())
     except Exception as e: print(f"  [ERROR] {e}")
 
 if __name__ == "__main__":
-    fetch_users()
-    tasks, task_ids = fetch_task_activity()
-    comm_events = fetch_comments_for_active_tasks(task_ids)
-    chats = fetch_chat_activity()
-    process_and_upload(tasks + comm_events + chats)
+    if not CLICKUP_API_KEY:
+        print("[SKIP] CLICKUP_API_KEY is not set")
+        sys.exit(0)
+    with step('users'):
+        fetch_users()
+    with step('tasks'):
+        tasks, task_ids = fetch_task_activity()
+    with step('comments'):
+        comm_events = fetch_comments_for_active_tasks(task_ids)
+    with step('chat'):
+        chats = fetch_chat_activity()
+    with step('process_upload'):
+        process_and_upload(tasks + comm_events + chats)
@@ -1,37 +1,27 @@
 import requests
 import json
-import pandas as pd
 from datetime import datetime
 import os
+import sys
 import time
-import gspread
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 
 # ==========================================
 # CONFIGURATION - Loaded from environment
 # ==========================================
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
+from sheets_io import SheetSink
+from credentials import get_gspread_client
+from dirty_tracker import record_source
+from run_manifest import step, count, traced
 
-# Load .env file
-def load_env():
-    env_path = os.path.join(ROOT_DIR, '.env')
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
-
-load_env()
-
-FIGMA_TOKEN = os.environ.get('FIGMA_TOKEN', '')
-FIGMA_TEAM_ID = os.environ.get('FIGMA_TEAM_ID', '')
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '')
-START_DATE_STR = os.environ.get('START_DATE', '2026-01-01')
+FIGMA_TOKEN = settings.figma_token
+FIGMA_TEAM_ID = settings.figma_team_id
+SHEET_ID = settings.sheet_id
+START_DATE_STR = settings.start_date
 START_DATE_DT = datetime.strptime(START_DATE_STR, "%Y-%m-%d")
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
@@ -61,7 +51,8 @@ def fetch_files_for_projects(projects):
         print(f"  Checking project: {pname}...")
         
         url = f"https://api.figma.com/v1/projects/{pid}/files"
-        resp = requests.get(url, headers=get_headers())
+        with step('project_files'):
+            resp = requests.get(url, headers=get_headers())
         if resp.status_code != 200: continue
         
         files = resp.json().get('files', [])
@@ -106,8 +97,10 @@ def fetch_files_for_projects(projects):
             
     return all_events
 
+@traced()
 def process_and_upload(events):
     print("[3/4] Processing data...")
+    count('events_ingested', len(events))
     if not events:
         print("  No Figma events (comments) found since 2026.")
         return
@@ -122,30 +115,25 @@ def process_and_upload(events):
     
     print(f"[4/4] Uploading {len(final_df)} rows to Google Sheet...")
     # Auth
-    creds = None
-    if os.path.exists('token.json'): creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token: creds.refresh(Request())
-        else:
-             secrets = [f for f in os.listdir('.') if 'client_secret' in f or 'credentials.json' in f]
-             if not secrets: return
-             flow = InstalledAppFlow.from_client_secrets_file(secrets[0], SCOPES)
-             creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token: token.write(creds.to_json())
-
-    gc = gspread.authorize(creds)
+    gc = get_gspread_client(SCOPES)
+    if gc is None: return
     try:
         sh = gc.open_by_key(SHEET_ID)
         tn = "Figma_Activity"
-        try: ws = sh.worksheet(tn); ws.clear()
-        except: ws = sh.add_worksheet(tn, 1000, 10)
-        
-        ws.update(values=[final_df.columns.values.tolist()], range_name='A1')
-        ws.append_rows(final_df.values.tolist())
+        sink = SheetSink(sh)
+        sink.write_frame(tn, final_df, 1000, 10)
+        sink.flush()
+        record_source(tn, final_df)
         print(f"  [SUCCESS] Uploaded {len(final_df)} aggregate rows.")
     except Exception as e: print(f"  [ERROR] {e}")
 
 if __name__ == "__main__":
-    projects = fetch_projects()
-    events = fetch_files_for_projects(projects)
-    process_and_upload(events)
+    if not FIGMA_TOKEN:
+        print("[SKIP] FIGMA_TOKEN is not set")
+        sys.exit(0)
+    with step('projects'):
+        projects = fetch_projects()
+    with step('files'):
+        events = fetch_files_for_projects(projects)
+    with step('process_upload'):
+        process_and_upload(events)
@@ -1,37 +1,27 @@
 import requests
 import json
-import pandas as pd
 from datetime import datetime
 import os
+import sys
 import time
-import gspread
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 
 # ==========================================
 # CONFIGURATION - Loaded from environment
 # ==========================================
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
+from sheets_io import SheetSink
+from credentials import get_gspread_client
+from dirty_tracker import record_source
+from run_manifest import step, count, traced
 
-# Load .env file
-def load_env():
-    env_path = os.path.join(ROOT_DIR, '.env')
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
-
-load_env()
-
-GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN', '')
-GITHUB_ORG = os.environ.get('GITHUB_ORG', 'Pvragon')
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '')
-START_DATE_STR = os.environ.get('START_DATE', '2026-01-01')
+GITHUB_TOKEN = settings.github_token
+GITHUB_ORG = settings.github_org
+SHEET_ID = settings.sheet_id
+START_DATE_STR = settings.start_date
 # GitHub API uses ISO 8601 strings.
 START_DATE_DT = datetime.strptime(START_DATE_STR, "%Y-%m-%d")
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
@@ -49,7 +39,8 @@ def fetch_repos():
     page = 1
     while True:
         url = f"https://api.github.com/orgs/{GITHUB_ORG}/repos"
-        resp = requests.get(url, headers=get_headers(), params={"page": page, "per_page": 100})
+        with step('repo_page'):
+            resp = requests.get(url, headers=get_headers(), params={"page": page, "per_page": 100})
         if resp.status_code != 200:
             print(f"  Error fetching repos: {resp.status_code} {resp.text}")
             break
@@ -87,7 +78,8 @@ def fetch_events_for_repos(repos):
         repo_active = True
         while repo_active:
             url = f"https://api.github.com/repos/{GITHUB_ORG}/{repo_name}/events"
-            resp = requests.get(url, headers=get_headers(), params={"page": page, "per_page": 100})
+            with step('event_page'):
+                resp = requests.get(url, headers=get_headers(), params={"page": page, "per_page": 100})
             if resp.status_code != 200: break
             events = resp.json()
             if not events: break
@@ -117,8 +109,10 @@ def fetch_events_for_repos(repos):
             
     return all_events
 
+@traced()
 def process_and_upload(events):
     print("[3/4] Processing data...")
+    count('events_ingested', len(events))
     if not events:
         print("  No events found.")
         return
@@ -136,30 +130,25 @@ def process_and_upload(events):
     
     print(f"[4/4] Uploading {len(final_df)} rows to Google Sheet...")
     # Auth
-    creds = None
-    if os.path.exists('token.json'): creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token: creds.refresh(Request())
-        else:
-             secrets = [f for f in os.listdir('.') if 'client_secret' in f or 'credentials.json' in f]
-             if not secrets: return
-             flow = InstalledAppFlow.from_client_secrets_file(secrets[0], SCOPES)
-             creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token: token.write(creds.to_json())
-
-    gc = gspread.authorize(creds)
+    gc = get_gspread_client(SCOPES)
+    if gc is None: return
     try:
         sh = gc.open_by_key(SHEET_ID)
         tn = "Github_Activity"
-        try: ws = sh.worksheet(tn); ws.clear()
-        except: ws = sh.add_worksheet(tn, 2000, 10)
-        
-        ws.update(values=[final_df.columns.values.tolist()], range_name='A1')
-        ws.append_rows(final_df.values.tolist())
+        sink = SheetSink(sh)
+        sink.write_frame(tn, final_df, 2000, 10)
+        sink.flush()
+        record_source(tn, final_df)
         print(f"  [SUCCESS] Uploaded {len(final_df)} aggregate rows.")
     except Exception as e: print(f"  [ERROR] {e}")
 
 if __name__ == "__main__":
-    repos = fetch_repos()
-    events = fetch_events_for_repos(repos)
-    process_and_upload(events)
+    if not GITHUB_TOKEN:
+        print("[SKIP] GITHUB_TOKEN is not set")
+        sys.exit(0)
+    with step('repos'):
+        repos = fetch_repos()
+    with step('events'):
+        events = fetch_events_for_repos(repos)
+    with step('process_upload'):
+        process_and_upload(events)
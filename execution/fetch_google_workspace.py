@@ -1,34 +1,25 @@
 import requests
 import json
-import pandas as pd
 from datetime import datetime, timezone
 import os
+import sys
 import time
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 
 # ==========================================
 # CONFIGURATION - Loaded from environment
 # ==========================================
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
+from sheets_io import SheetSink
+from credentials import get_credentials, get_gspread_client
+from dirty_tracker import record_source
+from run_manifest import step, count, traced
 
-# Load .env file
-def load_env():
-    env_path = os.path.join(ROOT_DIR, '.env')
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
-
-load_env()
-
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '')
-START_DATE_STR = os.environ.get('START_DATE', '2026-01-01') + "T00:00:00Z"
+SHEET_ID = settings.sheet_id
+START_DATE_STR = settings.start_date + "T00:00:00Z"
 SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
     'https://www.googleapis.com/auth/admin.reports.audit.readonly'
@@ -60,27 +51,10 @@ EXCLUDED_SENDER_DOMAINS = [
     'mandrillapp.com',
 ]
 
-def get_creds():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            print("Refreshing token...")
-            creds.refresh(Request())
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-        else:
-            print("No valid credentials found. Please ensure token.json is correct.")
-            return None
-    return creds
-
 def fetch_audit_logs(creds, application_name):
     print(f"Fetching audit logs for: {application_name}...")
     all_events = []
     url = f"https://admin.googleapis.com/admin/reports/v1/activity/users/all/applications/{application_name}"
-    headers = {"Authorization": f"Bearer {creds.token}"}
     
     # Define time windows (30 days max each)
     start_dt = pd.to_datetime(START_DATE_STR)
@@ -105,7 +79,10 @@ def fetch_audit_logs(creds, application_name):
         
         try:
             while True:
-                resp = requests.get(url, headers=headers, params=params)
+                get_credentials(SCOPES)     # refreshes `creds` in place when it expires soon
+                headers = {"Authorization": f"Bearer {creds.token}"}
+                with step('activity_page'):
+                    resp = requests.get(url, headers=headers, params=params)
                 if resp.status_code != 200:
                     print(f"    Error {resp.status_code}: {resp.text}")
                     break
@@ -193,8 +170,10 @@ def fetch_audit_logs(creds, application_name):
         
     return all_events
 
+@traced()
 def process_and_upload(events):
     print("[3/4] Processing and Uploading...")
+    count('events_ingested', len(events))
     if not events:
         print("  No audit events found.")
         return
@@ -207,26 +186,24 @@ def process_and_upload(events):
     
     final_df = summary[['Name', 'Date', 'Platform', 'Event Type', 'Quantity']]
     
-    creds = get_creds()
-    gc = gspread.authorize(creds)
+    gc = get_gspread_client(SCOPES)
     try:
         sh = gc.open_by_key(SHEET_ID)
         tab_name = "GoogleWorkspace_Activity"
-        try:
-            ws = sh.worksheet(tab_name)
-            ws.clear()
-        except:
-            ws = sh.add_worksheet(title=tab_name, rows=2000, cols=10)
-        
-        ws.update(values=[final_df.columns.values.tolist()], range_name='A1')
-        ws.append_rows(final_df.values.tolist())
+        sink = SheetSink(sh)
+        sink.write_frame(tab_name, final_df, min_rows=2000, cols=10)
+        sink.flush()
+        record_source(tab_name, final_df)
         print(f"  [SUCCESS] Uploaded {len(final_df)} aggregate rows.")
     except Exception as e:
         print(f"  [ERROR] Upload: {e}")
 
 if __name__ == "__main__":
-    creds = get_creds()
+    creds = get_credentials(SCOPES)
     if creds:
-        drive_events = fetch_audit_logs(creds, 'drive')
-        gmail_events = fetch_audit_logs(creds, 'gmail')
-        process_and_upload(drive_events + gmail_events)
+        with step('drive'):
+            drive_events = fetch_audit_logs(creds, 'drive')
+        with step('gmail'):
+            gmail_events = fetch_audit_logs(creds, 'gmail')
+        with step('process_upload'):
+            process_and_upload(drive_events + gmail_events)
@@ -12,17 +12,23 @@ Output Columns:
 - Active Window (Hours)
 - Longest Break (Minutes)
 - Total Events
+- Sessions                   (runs of events with no gap above SESSION_IDLE_MINUTES)
+- Focus Time (Hours)         (total time inside sessions)
+- Longest Session (Minutes)
+- Context Switches           (consecutive events on different platforms)
+
+Incremental runs: the last uploaded rows are kept in state/activity_time.csv.
+When they exist, only events from the earliest dirty date (see
+dirty_tracker.py) or the last ACTIVITY_TIME_LOOKBACK_DAYS days, whichever is
+older, are fetched and recomputed; older member-days are carried over.
 """
 
 import os
 import sys
 import requests
 import json
-import pandas as pd
+import heapq
 from datetime import datetime, timezone, timedelta
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 import pytz
 
 # Configuration
@@ -31,121 +37,139 @@ ROOT_DIR = os.path.dirname(SCRIPT_DIR)
 
 # Import name mappings
 sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
 from name_mappings import map_name, should_exclude
+from sheets_io import SheetSink
+from credentials import get_credentials, open_sheet
+from dirty_tracker import load_dirty, clear_dirty
+from run_manifest import step, count, traced
 
-SHEET_ID = '1t7jeunt3IDmnBcIoRYxM06sZgzCYYMAK8AgwH21M0Fo'
+SHEET_ID = settings.sheet_id
 PST = pytz.timezone('America/Los_Angeles')
-START_DATE = '2026-01-01'
-
-# Load .env
-def load_env():
-    env_path = os.path.join(ROOT_DIR, '.env')
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
-
-load_env()
-
-
-def get_creds():
-    """Get Google OAuth credentials."""
-    token_path = os.path.join(ROOT_DIR, 'token.json')
-    creds = Credentials.from_authorized_user_file(token_path)
-    if not creds.valid and creds.refresh_token:
-        creds.refresh(Request())
-        with open(token_path, 'w') as f:
-            f.write(creds.to_json())
-    return creds
-
-
-def fetch_google_workspace_events(creds):
-    """Fetch events from Google Workspace (Drive, Gmail) with timestamps."""
-    print('[1/2] Fetching Google Workspace events...')
-    events = []
-    headers = {'Authorization': f'Bearer {creds.token}'}
+START_DATE = settings.start_date
+
+# A gap longer than this (minutes) ends a work session
+SESSION_IDLE_MINUTES = settings.session_idle_minutes
+
+# 'stream' (default): k-way merge of per-source event streams into O(1)-state
+# member-day accumulators. 'pandas': one vectorized pass over all events.
+ACTIVITY_TIME_ENGINE = settings.activity_time_engine
+
+# Days of Google Workspace activity fetched (and held) per request window
+FETCH_WINDOW_DAYS = 7
+
+# Days always recomputed on an incremental run (late-arriving events)
+ACTIVITY_TIME_LOOKBACK_DAYS = settings.activity_time_lookback_days
+RESULTS_PATH = os.path.join(ROOT_DIR, 'state', 'activity_time.csv')
+
+TIME_COLUMNS = [
+    'Team Member', 'Date', 'First Activity (PST)', 'Last Activity (PST)',
+    'Active Window (Hours)', 'Longest Break (Minutes)', 'Total Events',
+    'Sessions', 'Focus Time (Hours)', 'Longest Session (Minutes)', 'Context Switches',
+]
+
+
+def pst_windows(since, days=FETCH_WINDOW_DAYS):
+    """(start, end) UTC datetimes of consecutive windows of whole PST days, from `since` to now."""
+    day = datetime.strptime(since, '%Y-%m-%d')
+    now = datetime.now(timezone.utc)
+    while True:
+        start = PST.localize(day).astimezone(timezone.utc)
+        if start >= now:
+            return
+        day += timedelta(days=days)
+        yield start, min(PST.localize(day).astimezone(timezone.utc), now)
+
+
+def fetch_google_workspace_events(creds, app, since=START_DATE):
+    """
+    Yield one Google Workspace app's (Drive, Gmail) events with timestamps,
+    from `since` on, as sorted rows (see sorted_rows). Fetched and sorted one
+    FETCH_WINDOW_DAYS window at a time, oldest first.
+    """
+    print(f'[1/3] Fetching Google Workspace {app} events...')
+    total = 0
+    url = f'https://admin.googleapis.com/admin/reports/v1/activity/users/all/applications/{app}'
     
-    for app in ['drive', 'gmail']:
-        start_dt = datetime.strptime(START_DATE, '%Y-%m-%d').replace(tzinfo=timezone.utc)
-        now_dt = datetime.now(timezone.utc)
-        current_start = start_dt
+    for current_start, current_end in pst_windows(since):
+        params = {
+            'startTime': current_start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'endTime': current_end.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'maxResults': 1000
+        }
+        events = []
         
-        while current_start < now_dt:
-            current_end = current_start + timedelta(days=30)
-            if current_end > now_dt:
-                current_end = now_dt
-            
-            params = {
-                'startTime': current_start.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                'endTime': current_end.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                'maxResults': 1000
-            }
-            url = f'https://admin.googleapis.com/admin/reports/v1/activity/users/all/applications/{app}'
-            
-            while True:
-                try:
+        while True:
+            try:
+                get_credentials()       # refreshes `creds` in place when it expires soon
+                headers = {'Authorization': f'Bearer {creds.token}'}
+                with step('activity_page'):
                     resp = requests.get(url, headers=headers, params=params)
-                    if resp.status_code != 200:
-                        break
-                    data = resp.json()
-                    
-                    items = data.get('items', [])
-                    print(f"    Fetched {len(items)} items from {app}...")
-                    
-                    for item in items:
-                        actor = item.get('actor', {})
-                        email = actor.get('email', '')
-                        if not email or actor.get('callerType') == 'KEY':
-                            continue
-                        
-                        ts = item.get('id', {}).get('time', '')
-                        if ts:
-                            try:
-                                dt = pd.to_datetime(ts).tz_convert(PST)
-                                events.append({'raw_name': email, 'timestamp': dt})
-                            except:
-                                pass
+                if resp.status_code != 200:
+                    break
+                data = resp.json()
+                
+                items = data.get('items', [])
+                print(f"    Fetched {len(items)} items from {app}...")
+                
+                for item in items:
+                    actor = item.get('actor', {})
+                    email = actor.get('email', '')
+                    if not email or actor.get('callerType') == 'KEY':
+                        continue
                     
-                    if not data.get('nextPageToken'):
-                        break
-                    params['pageToken'] = data['nextPageToken']
-                except Exception as e:
-                    print(f'  Warning: {e}')
+                    ts = item.get('id', {}).get('time', '')
+                    if ts:
+                        try:
+                            events.append((email, pd.to_datetime(ts).tz_convert(PST), 'Google Workspace'))
+                        except:
+                            pass
+                
+                if not data.get('nextPageToken'):
                     break
-            
-            current_start = current_end
+                params['pageToken'] = data['nextPageToken']
+            except Exception as e:
+                print(f'  Warning: {e}')
+                break
+        
+        rows = sorted_rows(events)
+        total += len(rows)
+        yield from rows
     
-    print(f'  Google Workspace: {len(events)} events')
-    return events
+    print(f'  Google Workspace {app}: {total} events')
 
 
-def fetch_github_events():
-    """Fetch events from GitHub with timestamps."""
-    print('[2/2] Fetching GitHub events...')
+def fetch_github_events(since=START_DATE):
+    """
+    Yield GitHub events with timestamps, from `since` on, as sorted rows.
+    The events API returns at most the latest 300 events per repo, newest
+    first, so they are collected before sorting.
+    """
+    print('[2/3] Fetching GitHub events...')
     events = []
     
-    github_token = os.environ.get('GITHUB_TOKEN', os.environ.get('GH_PAT', ''))
+    github_token = settings.github_token
     if not github_token:
         print('  [SKIP] No GitHub token found')
-        return events
+        return
     
     headers = {'Authorization': f'Bearer {github_token}', 'Accept': 'application/vnd.github+json'}
-    start_dt_pst = pd.to_datetime(START_DATE).tz_localize(PST)
+    start_dt_pst = pd.to_datetime(since).tz_localize(PST)
     
     try:
-        repos_resp = requests.get('https://api.github.com/orgs/Pvragon/repos', headers=headers, params={'per_page': 100})
+        with step('repos'):
+            repos_resp = requests.get('https://api.github.com/orgs/Pvragon/repos', headers=headers, params={'per_page': 100})
         repos = repos_resp.json() if repos_resp.status_code == 200 else []
         
         for repo in repos:
             try:
-                ev_resp = requests.get(
-                    f"https://api.github.com/repos/Pvragon/{repo['name']}/events",
-                    headers=headers,
-                    params={'per_page': 100}
-                )
+                with step('repo_events'):
+                    ev_resp = requests.get(
+                        f"https://api.github.com/repos/Pvragon/{repo['name']}/events",
+                        headers=headers,
+                        params={'per_page': 100}
+                    )
                 if ev_resp.status_code != 200:
                     continue
                     
@@ -156,7 +180,7 @@ def fetch_github_events():
                         try:
                             dt = pd.to_datetime(created).tz_convert(PST)
                             if dt >= start_dt_pst:
-                                events.append({'raw_name': actor, 'timestamp': dt})
+                                events.append((actor, dt, 'GitHub'))
                         except:
                             pass
             except:
@@ -165,148 +189,336 @@ def fetch_github_events():
     except Exception as e:
         print(f'  Warning: {e}')
     
-    print(f'  GitHub: {len(events)} events')
-    return events
+    rows = sorted_rows(events)
+    print(f'  GitHub: {len(rows)} events')
+    yield from rows
 
 
-def fetch_backendless_events():
-    """Fetch events from Backendless CSV with timestamps."""
+def fetch_backendless_events(since=START_DATE):
+    """Yield Backendless CSV events with timestamps, from `since` on, as sorted rows, one PST day at a time."""
     print('[3/3] Fetching Backendless events...')
-    events = []
     
     csv_path = os.path.join(ROOT_DIR, 'console_audit_logs.csv')
     if not os.path.exists(csv_path):
         print('  [SKIP] console_audit_logs.csv not found')
-        return events
-        
+        return
+    
     try:
-        df = pd.read_csv(csv_path)
-        # Parse timestamps
-        if 'timestamp' in df.columns:
-            # Backendless timestamps are milliseconds
-            df['dt'] = pd.to_datetime(df['timestamp'], unit='ms').dt.tz_localize(timezone.utc).dt.tz_convert(PST)
-            
-            # Parse developer email
-            def get_email(dev_str):
-                try:
-                    if pd.isna(dev_str): return ''
-                    return json.loads(str(dev_str)).get('email', '')
-                except: return ''
-            
-            df['email'] = df['developer'].apply(get_email)
-            
-            start_dt = pd.to_datetime(START_DATE).tz_localize(PST)
-            
-            # Filter
-            cutoff = df['dt'] >= start_dt
-            
-            for _, row in df[cutoff].iterrows():
-                if row['email']:
-                    events.append({'raw_name': row['email'], 'timestamp': row['dt']})
-                    
+        df = pd.read_csv(csv_path, usecols=['timestamp', 'developer'])
     except Exception as e:
         print(f'  Warning parsing Backendless CSV: {e}')
-        
-    print(f'  Backendless: {len(events)} events')
-    return events
+        return
+    
+    # Backendless timestamps are milliseconds
+    dt = pd.to_datetime(df['timestamp'], unit='ms').dt.tz_localize(timezone.utc).dt.tz_convert(PST)
+    
+    # Parse developer email
+    def get_email(dev_str):
+        try:
+            if pd.isna(dev_str): return ''
+            return json.loads(str(dev_str)).get('email', '')
+        except: return ''
+    
+    email = df['developer'].map(get_email)
+    keep = (dt >= pd.to_datetime(since).tz_localize(PST)) & email.ne('')
+    events = pd.DataFrame({'email': email[keep], 'dt': dt[keep]})
+    del df
+    
+    total = 0
+    for _, day in events.groupby(events['dt'].dt.date, sort=True):
+        rows = sorted_rows(zip(day['email'], day['dt'], ['Backendless App'] * len(day)))
+        total += len(rows)
+        yield from rows
+    
+    print(f'  Backendless: {total} events')
 
 
-def generate_activity_time_analysis(creds):
-    """Generate Activity Time Analysis from actual event timestamps."""
+@traced()
+def compute_time_metrics(df, idle_minutes=SESSION_IDLE_MINUTES):
+    """
+    Per member-day metrics from an event frame with 'name', tz-aware
+    'timestamp' and 'platform' columns, in one vectorized pass: sort once by
+    (member, time), diff within each member-day, then aggregate.
+    A new session starts at the first event of a member-day and after every
+    gap longer than `idle_minutes`.
+    Returns the Activity Time Analysis columns, newest date first.
+    """
+    if 'platform' not in df.columns:
+        df = df.assign(platform='')
+    df = df[['name', 'timestamp', 'platform']].sort_values(['name', 'timestamp'], kind='stable')
+    day = df['timestamp'].dt.normalize()
+    
+    # Gap to the previous event of the same member on the same day
+    same_group = df['name'].eq(df['name'].shift()) & day.eq(day.shift())
+    gap = (df['timestamp'].diff().dt.total_seconds() / 60).where(same_group)
+    
+    # Sessions: consecutive events with no idle gap; ids are unique across groups
+    new_session = ~same_group | (gap > idle_minutes)
+    switch = same_group & df['platform'].ne(df['platform'].shift())
+    df = df.assign(day=day, gap=gap, session=new_session.cumsum(), switch=switch)
+    
+    sessions = df.groupby('session', sort=False).agg(
+        name=('name', 'first'),
+        day=('day', 'first'),
+        start=('timestamp', 'first'),
+        end=('timestamp', 'last'),
+    )
+    sessions['minutes'] = (sessions['end'] - sessions['start']).dt.total_seconds() / 60
+    session_metrics = sessions.groupby(['name', 'day'], sort=False).agg(
+        sessions=('minutes', 'size'),
+        focus_minutes=('minutes', 'sum'),
+        longest_session=('minutes', 'max'),
+    )
+    
+    metrics = df.groupby(['name', 'day'], sort=False).agg(
+        first=('timestamp', 'min'),
+        last=('timestamp', 'max'),
+        longest_gap=('gap', 'max'),
+        events=('timestamp', 'size'),
+        switches=('switch', 'sum'),
+    ).join(session_metrics).reset_index()
+    
+    # Active window; if multiple events exist but duration is 0 (same minute),
+    # set minimum 0.1 hours (6 mins) to reflect activity burst.
+    active_window = (metrics['last'] - metrics['first']).dt.total_seconds() / 3600
+    active_window = active_window.mask((active_window == 0) & (metrics['events'] > 1), 0.1)
+    
+    result_df = pd.DataFrame({
+        'Team Member': metrics['name'],
+        'Date': metrics['day'].dt.strftime('%m/%d/%y'),
+        'First Activity (PST)': metrics['first'].dt.strftime('%I:%M %p'),
+        'Last Activity (PST)': metrics['last'].dt.strftime('%I:%M %p'),
+        'Active Window (Hours)': active_window.map(lambda h: round(h, 1)),
+        'Longest Break (Minutes)': metrics['longest_gap'].fillna(0).astype(int),
+        'Total Events': metrics['events'].astype(int),
+        'Sessions': metrics['sessions'].astype(int),
+        'Focus Time (Hours)': (metrics['focus_minutes'] / 60).map(lambda h: round(h, 1)),
+        'Longest Session (Minutes)': metrics['longest_session'].astype(int),
+        'Context Switches': metrics['switches'].astype(int),
+    })
+    
+    return sort_time_rows(result_df)
+
+
+def sort_time_rows(result_df):
+    """Sort by date (newest first), then by name."""
+    sort_dt = pd.to_datetime(result_df['Date'], format='%m/%d/%y')
+    order = pd.DataFrame({'day': sort_dt, 'name': result_df['Team Member']})
+    order = order.sort_values(by=['day', 'name'], ascending=[False, True], kind='stable').index
+    return result_df.loc[order].reset_index(drop=True)
+
+
+def merge_key(row):
+    """Order of the streaming merge: (PST day, member, timestamp)."""
+    return row[1].date(), row[0], row[1]
+
+
+def sorted_rows(events):
+    """
+    Reduce a batch of raw (name, timestamp, platform) events (one fetch
+    window or day) to (member, timestamp, platform) rows, mapped and
+    filtered, sorted by merge_key. The fetchers yield these batches in
+    ascending day order, so every source is a sorted stream.
+    """
+    rows = []
+    for raw_name, ts, platform in events:
+        name = map_name(raw_name)
+        if not should_exclude(name):
+            rows.append((name, ts, platform))
+    rows.sort(key=merge_key)
+    return rows
+
+
+class MemberDayAccumulator:
+    """
+    Running Activity Time metrics for one member-day, fed events in time order.
+    Holds O(1) state however many events the day has.
+    """
+    __slots__ = ('name', 'day', 'idle_minutes', 'first', 'last', 'prev_ns', 'prev_platform',
+                 'events', 'longest_gap', 'sessions', 'session_start_ns', 'focus_minutes',
+                 'longest_session', 'switches')
+
+    def __init__(self, name, day, idle_minutes=SESSION_IDLE_MINUTES):
+        self.name = name
+        self.day = day
+        self.idle_minutes = idle_minutes
+        self.first = self.last = None
+        self.prev_ns = self.session_start_ns = 0
+        self.prev_platform = None
+        self.events = self.sessions = self.switches = 0
+        self.longest_gap = self.focus_minutes = self.longest_session = 0.0
+
+    def _close_session(self):
+        minutes = (self.prev_ns - self.session_start_ns) / 1e9 / 60
+        self.focus_minutes += minutes
+        self.longest_session = max(self.longest_session, minutes)
+
+    def add(self, ts, platform):
+        ns = ts.value
+        if self.events == 0:
+            self.first = ts
+            self.sessions = 1
+            self.session_start_ns = ns
+        else:
+            gap = (ns - self.prev_ns) / 1e9 / 60
+            self.longest_gap = max(self.longest_gap, gap)
+            if gap > self.idle_minutes:
+                self._close_session()
+                self.sessions += 1
+                self.session_start_ns = ns
+            if platform != self.prev_platform:
+                self.switches += 1
+        self.last = ts
+        self.prev_ns = ns
+        self.prev_platform = platform
+        self.events += 1
+
+    def row(self):
+        """The finished Activity Time Analysis row (TIME_COLUMNS order)."""
+        self._close_session()
+        active_window = (self.last.value - self.first.value) / 1e9 / 3600
+        # Data Integrity: If multiple events exist but duration is 0 (same minute),
+        # set minimum 0.1 hours (6 mins) to reflect activity burst.
+        if active_window == 0 and self.events > 1:
+            active_window = 0.1
+        return [
+            self.name,
+            self.day.strftime('%m/%d/%y'),
+            self.first.strftime('%I:%M %p'),
+            self.last.strftime('%I:%M %p'),
+            round(active_window, 1),
+            int(self.longest_gap),
+            self.events,
+            self.sessions,
+            round(self.focus_minutes / 60, 1),
+            int(self.longest_session),
+            self.switches,
+        ]
+
+
+def stream_time_metrics(sources, idle_minutes=SESSION_IDLE_MINUTES):
+    """
+    Yield one metrics row per member-day from sources that are each sorted by
+    merge_key (PST day, member, timestamp). The sources are k-way merged
+    lazily and every member-day is emitted as soon as the merged stream moves
+    past it, so only the current member-day's accumulator and each source's
+    current fetch window are kept in memory.
+    """
+    acc = None
+    for name, ts, platform in heapq.merge(*sources, key=merge_key):
+        day = ts.date()
+        if acc is None or acc.name != name or acc.day != day:
+            if acc is not None:
+                yield acc.row()
+            acc = MemberDayAccumulator(name, day, idle_minutes)
+        acc.add(ts, platform)
+    if acc is not None:
+        yield acc.row()
+
+
+@traced()
+def load_previous_results():
+    """Rows uploaded by the last successful run, or None."""
+    if not os.path.exists(RESULTS_PATH):
+        return None
+    text_columns = ['Team Member', 'Date', 'First Activity (PST)', 'Last Activity (PST)']
+    previous = pd.read_csv(RESULTS_PATH, dtype={c: str for c in text_columns})
+    if list(previous.columns) != TIME_COLUMNS:
+        return None                                   # columns changed -> full recompute
+    return previous
+
+
+def recompute_since(previous, dirty):
+    """
+    First day (YYYY-MM-DD, PST) that has to be recomputed: the earliest dirty
+    date or the lookback window, whichever is older. None means everything.
+    """
+    if previous is None or dirty is None:
+        return None
+    since = (datetime.now(PST) - timedelta(days=ACTIVITY_TIME_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+    if dirty:
+        since = min(since, min(dirty))
+    return None if since <= START_DATE else since
+
+
+def generate_activity_time_analysis(creds, sink=None):
+    """
+    Generate Activity Time Analysis from actual event timestamps.
+    Rows are queued on `sink` when given (the caller flushes); otherwise
+    they are uploaded before returning.
+    """
     print('=' * 60)
     print('ACTIVITY TIME ANALYSIS GENERATOR')
     print(f'Started: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
     print('=' * 60)
     
-    # Fetch events
-    gw_events = fetch_google_workspace_events(creds)
-    gh_events = fetch_github_events()
-    bl_events = fetch_backendless_events()
-    
-    all_events = gw_events + gh_events + bl_events
+    # Only the dirty window is recomputed when earlier results exist
+    previous = load_previous_results()
+    dirty = load_dirty('activity_time')
+    since = recompute_since(previous, dirty)
+    if since:
+        print(f'Incremental run: recomputing member-days from {since}')
     
-    if not all_events:
-        print('[SKIP] No events found')
-        return
+    # Event sources: generators of (member, timestamp, platform) rows in
+    # merge_key order, fetched lazily while the metrics are computed
+    window = since or START_DATE
+    sources = [
+        fetch_google_workspace_events(creds, 'drive', window),
+        fetch_google_workspace_events(creds, 'gmail', window),
+        fetch_github_events(window),
+        fetch_backendless_events(window),
+    ]
     
-    # Map names
-    for e in all_events:
-        raw = e['raw_name']
-        e['name'] = map_name(raw)
+    # Group by NAME + DATE and calculate metrics
+    with step('fetch_metrics'):
+        if ACTIVITY_TIME_ENGINE == 'pandas':
+            df = pd.DataFrame([e for src in sources for e in src], columns=['name', 'timestamp', 'platform'])
+            result_df = compute_time_metrics(df) if len(df) else pd.DataFrame(columns=TIME_COLUMNS)
+        else:
+            result_df = sort_time_rows(pd.DataFrame(stream_time_metrics(sources), columns=TIME_COLUMNS))
     
-    # Filter exclusions
-    all_events = [e for e in all_events if not should_exclude(e['name'])]
-    print(f'After filtering: {len(all_events)} events')
+    total = int(result_df['Total Events'].sum())
+    count('events_ingested', total)
+    print(f'After filtering: {total} events')
     
-    if not all_events:
+    if not total and not since:
         print('[SKIP] No events after filtering')
         return
     
-    # Build DataFrame
-    df = pd.DataFrame(all_events)
-    df['date'] = df['timestamp'].dt.strftime('%m/%d/%y')
-    
-    # Group by NAME + DATE and calculate metrics
-    results = []
-    for (name, date), group in df.groupby(['name', 'date']):
-        times = sorted(group['timestamp'].tolist())
-        first = times[0]
-        last = times[-1]
-        
-        # Calculate longest break
-        longest_gap = 0
-        if len(times) > 1:
-            for i in range(1, len(times)):
-                gap = (times[i] - times[i-1]).total_seconds() / 60
-                if gap > longest_gap:
-                    longest_gap = gap
-        
-        # Active window
-        active_window = (last - first).total_seconds() / 3600
-        
-        # Data Integrity: If multiple events exist but duration is 0 (same minute), 
-        # set minimum 0.1 hours (6 mins) to reflect activity burst.
-        if active_window == 0 and len(times) > 1:
-            active_window = 0.1
-        
-        results.append({
-            'Team Member': name,
-            'Date': date,
-            'First Activity (PST)': first.strftime('%I:%M %p'),
-            'Last Activity (PST)': last.strftime('%I:%M %p'),
-            'Active Window (Hours)': round(active_window, 1),
-            'Longest Break (Minutes)': int(longest_gap),
-            'Total Events': len(times)
-        })
-    
-    result_df = pd.DataFrame(results)
-    
-    # Sort by date (newest first), then by name
-    result_df['sort_dt'] = pd.to_datetime(result_df['Date'], format='%m/%d/%y')
-    result_df = result_df.sort_values(by=['sort_dt', 'Team Member'], ascending=[False, True])
-    result_df = result_df.drop(columns=['sort_dt'])
+    if since:
+        # Recomputed window replaces the same days of the previous results
+        cutoff = pd.Timestamp(since)
+        fresh = result_df[pd.to_datetime(result_df['Date'], format='%m/%d/%y') >= cutoff]
+        kept = previous[pd.to_datetime(previous['Date'], format='%m/%d/%y') < cutoff]
+        result_df = sort_time_rows(pd.concat([fresh, kept], ignore_index=True))
+        print(f'Recomputed {len(fresh)} member-days, carried over {len(kept)}')
     
     print(f'Final rows: {len(result_df)}')
     
-    # Upload to Google Sheets
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(SHEET_ID)
+    # Upload to Google Sheets (queued on the caller's sink, or sent right away)
+    own_sink = sink is None
+    if own_sink:
+        sink = SheetSink(open_sheet(SHEET_ID))
     
-    try:
-        ws = sh.worksheet('Activity Time Analysis')
-        ws.clear()
-    except:
-        ws = sh.add_worksheet(title='Activity Time Analysis', rows=5000, cols=10)
+    sink.write_frame('Activity Time Analysis', result_df, min_rows=5000, cols=10)
+    
+    def remember():
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        result_df.to_csv(RESULTS_PATH + '.tmp', index=False)
+        os.replace(RESULTS_PATH + '.tmp', RESULTS_PATH)
+        clear_dirty('activity_time', dirty)
+    sink.scheduler.on_success('Activity Time Analysis', remember)
     
-    values = [result_df.columns.tolist()] + result_df.values.tolist()
-    ws.update(values=values, range_name='A1')
+    if own_sink:
+        with step('upload'):
+            sink.flush()
     
     print(f'\n[SUCCESS] Activity Time Analysis updated: {len(result_df)} rows')
     print('=' * 60)
 
 
 def main():
-    creds = get_creds()
+    creds = get_credentials()
     generate_activity_time_analysis(creds)
 
 
@@ -3,17 +3,15 @@ Complete Data Refresh
 =====================
 Updates Console_Audit_Logs, Daily Audit, and Activity Time Analysis tabs.
 Uses comprehensive name mappings from name_mappings.py
+All three tabs are queued on one SheetSink and uploaded together at the end
+(diff-based, within the Sheets write quota).
 """
 
 import os
 import sys
 import json
-import pandas as pd
 from datetime import datetime
 from collections import defaultdict
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 
 # Configuration
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,36 +19,20 @@ ROOT_DIR = os.path.dirname(SCRIPT_DIR)
 
 # Import name mappings
 sys.path.insert(0, SCRIPT_DIR)
-from name_mappings import map_name, should_exclude
+from config import settings, lazy_import
+pd = lazy_import('pandas')
+from name_mappings import map_names, exclude_mask
+from audit_cube import AuditCube, AUDIT_COLUMNS, CUBE_DIR
+from sheets_io import (read_tabs, values_to_frame, SheetSink, PARTITIONING,
+                       DAILY_AUDIT_TAB, DAILY_AUDIT_INDEX_TAB, partition_tab)
+from dirty_tracker import record_source, source_changes, load_dirty, clear_dirty
+from credentials import get_credentials, get_gspread_client, open_sheet
+from run_manifest import step
 
-# Load .env explicitly if needed (duplicated from other scripts for fallback)
-def load_env():
-    env_path = os.path.join(ROOT_DIR, '.env')
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
+SHEET_ID = settings.sheet_id
 
-load_env()
-
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '1t7jeunt3IDmnBcIoRYxM06sZgzCYYMAK8AgwH21M0Fo')
-
-def get_creds():
-    """Get Google OAuth credentials."""
-    token_path = os.path.join(ROOT_DIR, 'token.json')
-    creds = Credentials.from_authorized_user_file(token_path)
-    if not creds.valid and creds.refresh_token:
-        creds.refresh(Request())
-        with open(token_path, 'w') as f:
-            f.write(creds.to_json())
-    return creds
-
-
-def update_console_audit_logs(gc, sh):
-    """Update Console_Audit_Logs from CSV with proper mappings."""
+def update_console_audit_logs(gc, sh, sink):
+    """Update Console_Audit_Logs from CSV with proper mappings. Returns the uploaded rows."""
     print("\n=== [1/3] Updating Console_Audit_Logs ===")
     
     csv_path = os.path.join(ROOT_DIR, 'console_audit_logs.csv')
@@ -72,11 +54,11 @@ def update_console_audit_logs(gc, sh):
             return 'Unknown'
     
     df['Email'] = df['developer'].apply(get_email)
-    df['Name'] = df['Email'].apply(map_name)
+    df['Name'] = map_names(df['Email'])
     
     # Filter exclusions
-    df = df[~df['Name'].apply(should_exclude)]
-    df = df[~df['Email'].apply(should_exclude)]
+    df = df[~exclude_mask(df['Name'])]
+    df = df[~exclude_mask(df['Email'])]
     
     # Filter for 2026
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -98,19 +80,19 @@ def update_console_audit_logs(gc, sh):
     print(f"  Aggregated to {len(summary)} rows")
     print(f"  Team members: {sorted(summary['Name'].unique())}")
     
-    # Upload
-    try:
-        ws = sh.worksheet('Console_Audit_Logs')
-        ws.clear()
-    except:
-        ws = sh.add_worksheet(title='Console_Audit_Logs', rows=5000, cols=10)
-    
+    # Upload (queued)
     final = summary[['Name', 'Date', 'Platform', 'Event Type', 'Count']]
-    ws.update(values=[final.columns.tolist()] + final.values.tolist(), range_name='A1')
-    print(f"  [SUCCESS] Uploaded {len(final)} rows")
+    sink.write_frame('Console_Audit_Logs', final, min_rows=5000, cols=10)
+    sink.scheduler.on_success('Console_Audit_Logs', lambda: record_source('Console_Audit_Logs', final))
+    print(f"  [SUCCESS] Queued {len(final)} rows")
+    return final
+
+
+# Matrix rows expanded from the cube at a time (bounds memory while diffing)
+MATRIX_CHUNK_ROWS = 10000
 
 
-def update_daily_audit(gc, sh):
+def update_daily_audit(gc, sh, sink, console=None):
     """
     Regenerate Daily Audit from all source tabs.
     
@@ -118,6 +100,16 @@ def update_daily_audit(gc, sh):
     - Every Person × Every Date × Every Platform × Every Event Type
     - Missing combinations get Count = 0
     - This standardizes the pivot table output and makes comparison easier.
+    
+    `console` is the Console_Audit_Logs frame just produced by this run; when
+    given it is used directly instead of re-reading the (not yet uploaded) tab.
+    
+    When a cube from the last run exists, only the dates in the dirty set
+    (dirty_tracker.py) are recomputed: source rows of other dates are dropped
+    right after the read and the rebuilt dates are merged into the cube.
+    The source tabs are still read in full and the single Daily Audit tab is
+    still expanded in full for the sink's diff (monthly partitions only
+    expand the months that changed); both are skipped when nothing is dirty.
     """
     print("\n=== [2/3] Updating Daily Audit (Complete Matrix) ===")
     
@@ -130,107 +122,138 @@ def update_daily_audit(gc, sh):
         'GoogleWorkspace_Activity'
     ]
     
-    all_data = []
-    all_persons = set()
-    all_dates = set()
-    all_event_types = set()  # (Platform, Event Type) tuples
+    # Dates to recompute; None rebuilds the cube from every source row
+    dirty = load_dirty('daily_audit')
+    previous = AuditCube.load(mmap=False) if dirty is not None else None
+    if previous is None:
+        dirty = None
+    elif console is not None:
+        # Console_Audit_Logs is recorded once its upload succeeds, but its
+        # changes are part of this run's Daily Audit already
+        dirty = dirty | source_changes('Console_Audit_Logs', console)
+    dirty_dates = None if dirty is None else pd.to_datetime(sorted(dirty))
+    
+    if dirty_dates is not None and not len(dirty_dates):
+        print("  [SKIP] No dirty dates since the last upload")
+        clear_dirty('daily_audit', dirty)
+        return
     
-    for tab_name in source_tabs:
-        try:
-            ws = sh.worksheet(tab_name)
-            data = ws.get_all_records()
-            print(f"  {tab_name}: {len(data)} rows")
-            
-            for row in data:
-                # Normalize column names
-                name = row.get('Name', row.get('Team Member', ''))
-                date = row.get('Date', row.get('Activity Date', ''))
-                platform = row.get('Platform', tab_name.replace('_Activity', '').replace('_', ' '))
-                event_type = row.get('Event Type', row.get('Activity Type', ''))
-                count = row.get('Count', row.get('Quantity', 1))
-                
-                # Apply name mapping
-                name = map_name(name)
-                
-                if not should_exclude(name) and name and date and event_type:
-                    all_data.append({
-                        'Team Member': name,
-                        'Activity Date': date,
-                        'Platform': platform,
-                        'Activity Type': event_type,
-                        'Count': int(count) if count else 0
-                    })
-                    
-                    # Track all unique values
-                    all_persons.add(name)
-                    all_dates.add(date)
-                    all_event_types.add((platform, event_type))
-                    
-        except Exception as e:
-            print(f"  [WARN] {tab_name}: {e}")
+    # One batched read for every source tab (typed, normalized columns)
+    with step('read_sources'):
+        tabs = read_tabs(sh, [t for t in source_tabs if console is None or t != 'Console_Audit_Logs'])
+    if console is not None:
+        tabs['Console_Audit_Logs'] = values_to_frame([console.columns.tolist()] + console.values.tolist())
+    
+    frames = []
+    for tab_name, df in tabs.items():
+        print(f"  {tab_name}: {len(df)} rows")
+        if dirty_dates is not None and 'Date' in df.columns:
+            df = df[df['Date'].isin(dirty_dates)].copy()
+        if df.empty:
+            continue
+        
+        # Fill in columns some tabs do not have
+        if 'Platform' not in df.columns:
+            df['Platform'] = tab_name.replace('_Activity', '').replace('_', ' ')
+        if 'Count' not in df.columns:
+            df['Count'] = 1
+        for col in ('Name', 'Event Type'):
+            if col not in df.columns:
+                df[col] = ''
+        
+        # Apply name mapping (once per unique identifier)
+        df['Name'] = map_names(df['Name'])
+        keep = ~exclude_mask(df['Name']) & (df['Name'] != '') & df['Date'].notna() & (df['Event Type'] != '')
+        frames.append(df.loc[keep, ['Name', 'Date', 'Platform', 'Event Type', 'Count']])
     
-    if not all_data:
+    if not frames and previous is None:
         print("  [SKIP] No data to update")
         return
     
-    print(f"  Found: {len(all_persons)} persons, {len(all_dates)} dates, {len(all_event_types)} event types")
-    
-    # Create lookup dictionary for existing counts
-    df = pd.DataFrame(all_data)
-    existing = df.groupby(['Team Member', 'Activity Date', 'Platform', 'Activity Type'])['Count'].sum().to_dict()
-    
-    # Generate COMPLETE MATRIX (all combinations including 0s)
-    print("  Generating complete matrix with all combinations...")
-    matrix_rows = []
-    
-    for person in sorted(all_persons):
-        for date in sorted(all_dates, key=lambda d: datetime.strptime(d, '%m/%d/%y'), reverse=True):
-            for (platform, event_type) in sorted(all_event_types):
-                key = (person, date, platform, event_type)
-                count = existing.get(key, 0)  # 0 if not found
-                
-                matrix_rows.append({
-                    'Team Member': person,
-                    'Activity Date': date,
-                    'Platform': platform,
-                    'Activity Type': event_type,
-                    'Count': count
-                })
-    
-    result = pd.DataFrame(matrix_rows)
+    all_data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=AUDIT_COLUMNS)
+    all_data.columns = AUDIT_COLUMNS
     
-    # Sort: Date (newest first), then Platform, then Activity Type, then Person
-    result['sort_dt'] = pd.to_datetime(result['Activity Date'], format='%m/%d/%y', errors='coerce')
-    result = result.sort_values(
-        by=['sort_dt', 'Platform', 'Activity Type', 'Team Member'], 
-        ascending=[False, True, True, True]
-    )
-    result = result.drop(columns=['sort_dt'])
-    
-    print(f"  Total matrix rows: {len(result)} (includes 0s for all combinations)")
-    
-    # Upload in chunks (may be large)
-    try:
-        ws = sh.worksheet('Daily Audit')
-        ws.clear()
-    except:
-        ws = sh.add_worksheet(title='Daily Audit', rows=100000, cols=10)
-    
-    # Upload header
-    headers = result.columns.tolist()
-    rows_to_upload = [headers] + result.values.tolist()
-    
-    # Upload in chunks of 10000 rows
-    CHUNK_SIZE = 10000
-    for i in range(0, len(rows_to_upload), CHUNK_SIZE):
-        chunk = rows_to_upload[i:i + CHUNK_SIZE]
-        if i == 0:
-            ws.update(values=chunk, range_name='A1')
+    # Compact cube: counts indexed [member, date, event type], persisted for
+    # the dashboard export and email summary
+    with step('build_cube'):
+        if previous is None:
+            cube = AuditCube.from_frame(all_data)
         else:
-            ws.append_rows(chunk[1:] if i > 0 else chunk)  # Skip header on subsequent chunks
-        print(f"    Uploaded rows {i} to {min(i + CHUNK_SIZE, len(rows_to_upload))}")
+            cube = previous.merge_dates(AuditCube.from_frame(all_data), dirty_dates)
+            print(f"  Incremental: recomputed {len(dirty_dates)} dirty dates")
+        cube.save()
+    print(f"  Found: {len(cube.members)} persons, {len(cube.dates)} dates, {len(cube.event_types)} event types")
+    
+    if PARTITIONING == 'monthly':
+        write_daily_audit_partitions(cube, sink)
+        sink.scheduler.on_success(DAILY_AUDIT_INDEX_TAB, lambda: clear_dirty('daily_audit', dirty))
+        return
     
-    print(f"  [SUCCESS] Uploaded {len(result)} rows (complete matrix)")
+    # Expand the COMPLETE MATRIX (all combinations including 0s) chunk by chunk;
+    # the sink only keeps rows that changed since the last upload
+    sink.write(DAILY_AUDIT_TAB, matrix_rows(cube), min_rows=100000, cols=10)
+    sink.scheduler.on_success(DAILY_AUDIT_TAB, lambda: clear_dirty('daily_audit', dirty))
+    print(f"  [SUCCESS] Queued complete matrix (includes 0s for all combinations)")
+
+
+def matrix_rows(cube, dates=slice(None)):
+    """Header + zero-filled matrix rows (optionally for a slice of dates), chunk by chunk."""
+    yield AUDIT_COLUMNS
+    chunks = cube.iter_frames(chunk_rows=MATRIX_CHUNK_ROWS, dates=dates)
+    while True:
+        # Expansion only (the consumer's diffing is not part of the span)
+        with step('matrix_chunk'):
+            chunk = next(chunks, None)
+            rows = None if chunk is None else chunk.values.tolist()
+        if rows is None:
+            return
+        yield from rows
+
+
+def write_daily_audit_partitions(cube, sink):
+    """
+    Queue the Daily Audit as one tab per month ('Daily Audit 2026-03') plus an
+    index tab. Only the current month and months whose data changed since the
+    last successful upload are rewritten.
+    """
+    state_dir = os.path.join(CUBE_DIR, 'partitions')
+    os.makedirs(state_dir, exist_ok=True)
+    current_month = datetime.now().strftime('%Y-%m')
+    n_combinations = len(cube.members) * len(cube.event_types)
+    
+    index_rows = [['Tab', 'Month', 'Start Date', 'End Date', 'Rows', 'Updated']]
+    rewritten = 0
+    for month, dates in cube.month_slices():
+        tab = partition_tab(month)
+        state_path = os.path.join(state_dir, f"{month}.json")
+        digest = cube.digest(dates)
+        
+        previous = {}
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                previous = json.load(f)
+        
+        n_rows = n_combinations * (dates.stop - dates.start)
+        updated = previous.get('updated', '')
+        if month == current_month or previous.get('digest') != digest:
+            updated = datetime.now().strftime('%Y-%m-%d %H:%M')
+            sink.write(tab, matrix_rows(cube, dates), min_rows=n_rows + 1, cols=10)
+            
+            def remember(path=state_path, record={'digest': digest, 'updated': updated}):
+                with open(path, 'w') as f:
+                    json.dump(record, f)
+            sink.scheduler.on_success(tab, remember)
+            rewritten += 1
+        
+        index_rows.append([
+            tab, month,
+            cube.dates[dates.start].strftime('%m/%d/%y'),
+            cube.dates[dates.stop - 1].strftime('%m/%d/%y'),
+            n_rows, updated,
+        ])
+    
+    sink.write(DAILY_AUDIT_INDEX_TAB, index_rows, min_rows=100, cols=6)
+    print(f"  [SUCCESS] Queued {rewritten} of {len(index_rows) - 1} monthly partitions")
 
 
 # Import generator for Activity Time Analysis
@@ -242,7 +265,7 @@ except ImportError:
     from generate_activity_time import generate_activity_time_analysis
 
 
-def update_activity_time_analysis(gc, sh):
+def update_activity_time_analysis(gc, sh, sink):
     """
     Update Activity Time Analysis using robust timestamp-based logic.
     Delegates to generate_activity_time.py which fetches raw timestamps.
@@ -250,17 +273,8 @@ def update_activity_time_analysis(gc, sh):
     print("\n=== [3/3] Updating Activity Time Analysis (Robust) ===")
     
     try:
-        # Use credentials from existing gc object or fetch new ones
-        # generate_activity_time_analysis expects creds object
-        # We can pass the creds object we already have if it's compatible, 
-        # but generate_activity_time_analysis calls get_creds() internally or expects argument.
-        # It takes 'creds' argument.
-        
-        # We need to get the Credentials object. gc.auth is the Credentials object in newer gspread?
-        # Or we can just grab them again.
-        
-        creds = get_creds()
-        generate_activity_time_analysis(creds)
+        # Same credentials object the gspread client was authorized with
+        generate_activity_time_analysis(get_credentials(), sink=sink)
         
     except Exception as e:
         print(f"  [ERROR] Failed to update Activity Time Analysis: {e}")
@@ -275,14 +289,21 @@ def main():
     print("=" * 60)
     
     # Authenticate
-    creds = get_creds()
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(SHEET_ID)
-    
-    # Update all tabs
-    update_console_audit_logs(gc, sh)
-    update_daily_audit(gc, sh)
-    update_activity_time_analysis(gc, sh)
+    gc = get_gspread_client()
+    sh = open_sheet(SHEET_ID)
+    
+    # Build all tabs, then upload them together
+    sink = SheetSink(sh)
+    with step('console_audit_logs'):
+        console = update_console_audit_logs(gc, sh, sink)
+    with step('daily_audit'):
+        update_daily_audit(gc, sh, sink, console=console)
+    with step('activity_time'):
+        update_activity_time_analysis(gc, sh, sink)
+    
+    print("\n=== Uploading ===")
+    with step('upload'):
+        sink.flush()
     
     print("\n" + "=" * 60)
     print("[COMPLETE] All tabs updated successfully!")
@@ -0,0 +1,253 @@
+"""
+HTTP Metrics
+============
+Latency, status and rate-limit figures for every outbound request of a run,
+per provider (ClickUp, GitHub, Figma, Sheets, ...) and endpoint template
+(ids in the path replaced by placeholders, e.g.
+'/api/v3/workspaces/{id}/chat/messages/{id}/replies').
+
+Recorded per endpoint:
+- latency histogram (seconds, Prometheus-style buckets), sum, count and max
+- responses by status code ('error' when no response came back)
+- response bytes (total and largest)
+and per provider the last seen rate-limit remaining / reset / Retry-After.
+
+record() is called by the requests.Session.send hook in run_manifest.py, so
+it covers the fetchers and every gspread read and write. Each stage writes
+its snapshot() into its run manifest part; run_daily_workflow.py merges them,
+writes a Prometheus textfile (HTTP_METRICS_TEXTFILE, default
+state/metrics/pipeline_http.prom) and prints summary().
+"""
+
+import os
+import re
+import copy
+import time
+import threading
+from urllib.parse import urlsplit
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last is +Inf
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# Host -> provider label
+PROVIDERS = {
+    'api.clickup.com': 'clickup',
+    'api.github.com': 'github',
+    'api.figma.com': 'figma',
+    'sheets.googleapis.com': 'sheets',
+    'www.googleapis.com': 'google',
+    'admin.googleapis.com': 'google_admin',
+    'oauth2.googleapis.com': 'google_oauth',
+    'develop.backendless.com': 'backendless',
+}
+
+# Path segments that are names rather than ids, per provider pattern
+PATH_TEMPLATES = [
+    (re.compile(r'/repos/[^/]+/[^/]+'), '/repos/{owner}/{repo}'),
+    (re.compile(r'/orgs/[^/]+'), '/orgs/{org}'),
+    (re.compile(r'/spreadsheets/[^/:]+'), '/spreadsheets/{id}'),
+    (re.compile(r'/values/[^/:]+'), '/values/{range}'),
+    (re.compile(r'/files/[^/]+'), '/files/{key}'),
+]
+
+# Rate-limit response headers (first one present wins)
+REMAINING_HEADERS = ['X-RateLimit-Remaining', 'RateLimit-Remaining']
+RESET_HEADERS = ['X-RateLimit-Reset', 'RateLimit-Reset']
+
+_endpoints = {}              # (provider, endpoint) -> stats
+_rate_limits = {}            # provider -> {'remaining', 'reset', 'retry_after', 'seen'}
+_lock = threading.Lock()
+
+
+# ==========================================
+# Recording
+# ==========================================
+def provider_of(host):
+    host = (host or '').lower()
+    if host in PROVIDERS:
+        return PROVIDERS[host]
+    return 'backendless' if host.endswith('backendless.com') else host
+
+
+def endpoint_template(path):
+    """URL path with ids replaced: known name segments first, then any segment holding a digit."""
+    for pattern, replacement in PATH_TEMPLATES:
+        path = pattern.sub(replacement, path)
+    segments = []
+    for seg in path.split('/'):
+        name, colon, method = seg.partition(':')          # Sheets 'values:batchUpdate'
+        if name and not name.startswith('{') and not re.fullmatch(r'v\d+', name) \
+                and (re.search(r'\d', name) or len(name) >= 20):
+            name = '{id}'
+        segments.append(name + colon + method)
+    return '/'.join(segments) or '/'
+
+
+def _new_stats():
+    return {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0, 'max': 0.0,
+            'status': {}, 'bytes': 0, 'bytes_max': 0}
+
+
+def _header(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+def record(url, seconds, response=None, size=None):
+    """Add one request (`response` None when it raised) to the run's metrics."""
+    parts = urlsplit(url)
+    key = (provider_of(parts.hostname), endpoint_template(parts.path))
+    status = str(response.status_code) if response is not None else 'error'
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+
+    limits = {}
+    if response is not None:
+        limits = {'remaining': _header(response.headers, REMAINING_HEADERS),
+                  'reset': _header(response.headers, RESET_HEADERS),
+                  'retry_after': _header(response.headers, ['Retry-After'])}
+        limits = {k: v for k, v in limits.items() if v is not None}
+
+    with _lock:
+        stats = _endpoints.setdefault(key, _new_stats())
+        stats['buckets'][bucket] += 1
+        stats['sum'] += seconds
+        stats['count'] += 1
+        stats['max'] = max(stats['max'], seconds)
+        stats['status'][status] = stats['status'].get(status, 0) + 1
+        if size:
+            stats['bytes'] += size
+            stats['bytes_max'] = max(stats['bytes_max'], size)
+        if limits:
+            seen = _rate_limits.setdefault(key[0], {})
+            seen.update(limits, seen=time.time())
+
+
+def snapshot():
+    """JSON-safe copy of this process's metrics."""
+    with _lock:
+        return copy.deepcopy({
+            'endpoints': [dict(provider=p, endpoint=e, **stats) for (p, e), stats in _endpoints.items()],
+            'rate_limits': _rate_limits,
+        })
+
+
+# ==========================================
+# Merging / reporting (run_daily_workflow.py)
+# ==========================================
+def merge(snapshots):
+    """Combine the snapshots of several stages into one."""
+    endpoints, rate_limits = {}, {}
+    for snap in snapshots:
+        for ep in snap.get('endpoints', []):
+            key = (ep['provider'], ep['endpoint'])
+            stats = endpoints.setdefault(key, dict(provider=key[0], endpoint=key[1], **_new_stats()))
+            stats['buckets'] = [a + b for a, b in zip(stats['buckets'], ep['buckets'])]
+            for k in ('sum', 'count', 'bytes'):
+                stats[k] += ep[k]
+            for k in ('max', 'bytes_max'):
+                stats[k] = max(stats[k], ep[k])
+            for code, n in ep['status'].items():
+                stats['status'][code] = stats['status'].get(code, 0) + n
+        for provider, limits in snap.get('rate_limits', {}).items():
+            if limits.get('seen', 0) >= rate_limits.get(provider, {}).get('seen', 0):
+                rate_limits[provider] = limits
+    return {'endpoints': sorted(endpoints.values(), key=lambda s: (s['provider'], s['endpoint'])),
+            'rate_limits': rate_limits}
+
+
+def quantile(stats, q):
+    """Upper bound of the histogram bucket holding quantile `q` (the max for the last bucket)."""
+    target, seen = q * stats['count'], 0
+    for bound, n in zip(LATENCY_BUCKETS, stats['buckets']):
+        seen += n
+        if seen >= target:
+            return min(bound, stats['max'])
+    return stats['max']
+
+
+def _num(value):
+    """Integral floats without exponent (epoch resets), others as is."""
+    return str(int(value)) if float(value).is_integer() else f"{value:.3f}"
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(metrics, now=None):
+    """Prometheus text exposition format of merged metrics."""
+    lines = [
+        '# HELP pipeline_http_request_duration_seconds Outbound HTTP request latency.',
+        '# TYPE pipeline_http_request_duration_seconds histogram',
+    ]
+    for s in metrics['endpoints']:
+        labels = f'provider="{_label(s["provider"])}",endpoint="{_label(s["endpoint"])}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS + ['+Inf'], s['buckets']):
+            cumulative += n
+            lines.append(f'pipeline_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'pipeline_http_request_duration_seconds_sum{{{labels}}} {s["sum"]:.6f}')
+        lines.append(f'pipeline_http_request_duration_seconds_count{{{labels}}} {s["count"]}')
+
+    lines += ['# HELP pipeline_http_responses_total Outbound HTTP responses by status code.',
+              '# TYPE pipeline_http_responses_total counter']
+    for s in metrics['endpoints']:
+        labels = f'provider="{_label(s["provider"])}",endpoint="{_label(s["endpoint"])}"'
+        for code, n in sorted(s['status'].items()):
+            lines.append(f'pipeline_http_responses_total{{{labels},status="{_label(code)}"}} {n}')
+
+    lines += ['# HELP pipeline_http_response_bytes_total Response body bytes downloaded.',
+              '# TYPE pipeline_http_response_bytes_total counter']
+    lines += [f'pipeline_http_response_bytes_total{{provider="{_label(s["provider"])}",endpoint="{_label(s["endpoint"])}"}} {s["bytes"]}'
+              for s in metrics['endpoints']]
+    lines += ['# HELP pipeline_http_response_max_bytes Largest response body of the run.',
+              '# TYPE pipeline_http_response_max_bytes gauge']
+    lines += [f'pipeline_http_response_max_bytes{{provider="{_label(s["provider"])}",endpoint="{_label(s["endpoint"])}"}} {s["bytes_max"]}'
+              for s in metrics['endpoints']]
+
+    gauges = [('remaining', 'pipeline_http_ratelimit_remaining', 'Last seen rate-limit remaining requests.'),
+              ('reset', 'pipeline_http_ratelimit_reset', 'Last seen rate-limit reset header value.'),
+              ('retry_after', 'pipeline_http_retry_after_seconds', 'Last seen Retry-After header.')]
+    for key, name, help_text in gauges:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        lines += [f'{name}{{provider="{_label(p)}"}} {_num(limits[key])}'
+                  for p, limits in sorted(metrics['rate_limits'].items()) if key in limits]
+
+    lines += ['# HELP pipeline_http_last_run_timestamp_seconds When these metrics were written.',
+              '# TYPE pipeline_http_last_run_timestamp_seconds gauge',
+              f'pipeline_http_last_run_timestamp_seconds {now or time.time():.0f}']
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(metrics, path):
+    """Write the Prometheus textfile atomically (node_exporter may read it any time)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(to_prometheus(metrics))
+    os.replace(tmp, path)
+
+
+def summary(metrics):
+    """Summary table lines for the workflow summary."""
+    lines = [f"  {'provider':<13} {'endpoint':<48} {'reqs':>5} {'errors':>6} {'mean':>7} {'p95':>7} {'max':>7} {'MB':>7}"]
+    for s in metrics['endpoints']:
+        errors = sum(n for code, n in s['status'].items() if code == 'error' or int(code) >= 400)
+        mean = s['sum'] / s['count'] if s['count'] else 0
+        endpoint = s['endpoint'] if len(s['endpoint']) <= 48 else '…' + s['endpoint'][-47:]
+        lines.append(f"  {s['provider']:<13} {endpoint:<48} {s['count']:>5} {errors:>6} "
+                     f"{mean:>6.2f}s {quantile(s, 0.95):>6.2f}s {s['max']:>6.2f}s {s['bytes'] / 1e6:>7.2f}")
+    for provider, limits in sorted(metrics['rate_limits'].items()):
+        shown = ', '.join(f"{k} {_num(limits[k])}" for k in ('remaining', 'reset', 'retry_after') if k in limits)
+        lines.append(f"  rate limit {provider}: {shown}")
+    return lines
@@ -0,0 +1,161 @@
+"""
+Memory Profile
+==============
+Peak memory of each pipeline stage, so memory regressions show up in the
+run history before the Actions runner gets OOM-killed.
+
+Always (cheap): every stage reports its RSS high-water mark (ru_maxrss of
+the stage process) in its run manifest part.
+
+Opt-in (MEMORY_PROFILE=1): run_daily_workflow.py starts each stage with
+tracemalloc on from interpreter startup (PYTHONTRACEMALLOC). Each top-level
+step() then records:
+- py_peak_mb  - peak traced Python heap during the step
+- rss_peak_mb - process RSS high-water mark when the step ends.
+
+A tracemalloc snapshot is kept from the end of the top-level step with the
+most live memory; it gives the stage's top allocation sites. Each site is
+attributed to the innermost frame in execution/ (e.g. the line building a
+DataFrame) rather than to a pandas or numpy internal, when one is within
+TRACE_FRAMES. tracemalloc slows a stage down and adds memory
+of its own, so it is meant for investigating, not for every night.
+"""
+
+import os
+import sys
+import tracemalloc
+
+try:
+    import resource
+except ImportError:   # Windows: no RSS high-water mark
+    resource = None
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings
+
+ENABLED = settings.memory_profile
+TRACE_FRAMES = 8             # frames kept per allocation (to find our own call site)
+TOP_SITES = 8
+
+_largest = None              # (live traced bytes, step name, snapshot)
+_held = 0                    # traced bytes of the snapshot we hold ourselves
+_py_peak = 0
+
+
+def maxrss_mb(usage):
+    """ru_maxrss of a getrusage() result in MB (KB on Linux, bytes on macOS)."""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / scale, 1)
+
+
+def rss_peak_mb():
+    """RSS high-water mark of this process in MB (None without `resource`)."""
+    return None if resource is None else maxrss_mb(resource.getrusage(resource.RUSAGE_SELF))
+
+
+def step_started():
+    """Start measuring a top-level step's Python heap peak."""
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def step_finished(name):
+    """
+    Peak figures of the top-level step that just ended. Keeps a snapshot of
+    the heap when more is live than at the end of any earlier step.
+    """
+    global _largest, _held, _py_peak
+    figures = {'rss_peak_mb': rss_peak_mb()}
+    if not tracemalloc.is_tracing():
+        return figures
+    current, peak = tracemalloc.get_traced_memory()
+    # The snapshot we hold is traced memory too; leave it out of the figures
+    live, peak = current - _held, peak - _held
+    _py_peak = max(_py_peak, peak)
+    figures['py_peak_mb'] = round(peak / 1e6, 1)
+    if _largest is None or live > _largest[0]:
+        _largest, _held = None, 0
+        before = tracemalloc.get_traced_memory()[0]
+        snapshot = tracemalloc.take_snapshot()
+        _held = tracemalloc.get_traced_memory()[0] - before
+        _largest = (live, name, snapshot)
+    return figures
+
+
+def _site(frame):
+    """'execution/x.py:12' for project files, 'pandas/core/frame.py:700' for libraries."""
+    path = frame.filename
+    if path.startswith(ROOT_DIR + os.sep):
+        path = os.path.relpath(path, ROOT_DIR)
+    elif os.sep in path:
+        path = os.path.join(*path.split(os.sep)[-3:])
+    return f"{path}:{frame.lineno}"
+
+
+def top_sites(snapshot, limit=TOP_SITES):
+    """
+    [{'site', 'size_mb', 'blocks'}, ...] grouped by the innermost execution/
+    frame of each allocation (or the allocating line when none is within
+    TRACE_FRAMES). Allocations made while importing modules are left out.
+    """
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>', all_frames=True),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>', all_frames=True),
+    ])
+    sites = {}
+    for stat in snapshot.statistics('traceback'):
+        frames = list(reversed(stat.traceback))      # most recent call first
+        ours = next((f for f in frames if f.filename.startswith(SCRIPT_DIR)), frames[0])
+        site = _site(ours)
+        size, blocks = sites.get(site, (0, 0))
+        sites[site] = (size + stat.size, blocks + stat.count)
+    ranked = sorted(sites.items(), key=lambda s: s[1][0], reverse=True)[:limit]
+    return [{'site': site, 'size_mb': round(size / 1e6, 2), 'blocks': blocks} for site, (size, blocks) in ranked]
+
+
+def report():
+    """
+    This process's memory figures for its run manifest part. Stops tracing
+    (the process is exiting) so the snapshot analysis runs at full speed.
+    """
+    result = {'rss_peak_mb': rss_peak_mb()}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        result['py_peak_mb'] = round(max(_py_peak, peak - _held) / 1e6, 1)
+        largest = _largest
+        if largest is None or current - _held > largest[0]:
+            largest = (current - _held, None, tracemalloc.take_snapshot())
+        tracemalloc.stop()
+        result['snapshot_step'] = largest[1]
+        result['top_allocations'] = top_sites(largest[2])
+    return result
+
+
+def child_env():
+    """Extra environment for a stage process when profiling is on."""
+    return {'PYTHONTRACEMALLOC': str(TRACE_FRAMES)} if ENABLED else {}
+
+
+def summary(stages):
+    """Memory table lines for the workflow summary."""
+    lines = [f"  {'stage':<12} {'RSS peak':>9} {'py heap':>9}  heaviest step"]
+    for s in stages:
+        memory = s.get('memory') or {}
+        rss, py = memory.get('rss_peak_mb'), memory.get('py_peak_mb')
+        steps = [st for st in s.get('steps', []) if st.get('py_peak_mb') is not None]
+        heaviest = max(steps, key=lambda st: st['py_peak_mb'], default=None)
+        lines.append(f"  {s['stage']:<12} {'-' if rss is None else f'{rss:.0f} MB':>9} "
+                     f"{'-' if py is None else f'{py:.0f} MB':>9}  "
+                     + (f"{heaviest['name']} ({heaviest['py_peak_mb']:.0f} MB)" if heaviest else ''))
+    for s in stages:
+        memory = s.get('memory') or {}
+        if memory.get('top_allocations'):
+            lines.append(f"\n  {s['stage']} - top allocation sites (live at end of {memory.get('snapshot_step') or 'run'}):")
+            lines += [f"    {site['size_mb']:>8.2f} MB {site['blocks']:>8} blocks  {site['site']}"
+                      for site in memory['top_allocations'][:5]]
+    return lines
@@ -3,6 +3,9 @@
 # This file contains the canonical name mappings used across ALL platforms.
 # Import this in all fetch scripts to ensure consistency.
 
+import re
+from functools import lru_cache
+
 # Full name mappings (email/handle -> Display Name)
 NAME_MAP = {
     # === Pvragon Team (Primary Emails) ===
@@ -135,6 +138,79 @@ EXCLUDE_PATTERNS = [
 ]
 
 
+# Keyword-based fallback (for partial matches).
+# Order matters: when several keywords occur in an identifier, the one listed
+# first wins (e.g. 'bradd konert' before 'bradd').
+KEYWORD_MAP = {
+    'jkhereford': 'James Hereford',
+    'jaime': 'James Hereford',
+    'james': 'James Hereford',
+    'alexander': 'Alexander Pavelko',
+    'pavelko': 'Alexander Pavelko',
+    'areeba': 'Areeba Akhlaque',
+    'bilal': 'Bilal Munir',
+    'mughal': 'Bilal Munir',
+    'farhan': 'Muhammad Farhan',
+    'cherry': 'Cherry Aznar',
+    'kristi': 'Kristi Bergeron',
+    'bergeron': 'Kristi Bergeron',
+    'saifullah': 'Saifullah Khan',
+    'sunnat': 'Sunnat Choriev',
+    'javidal10': 'Juan Vidal',
+    'juan': 'Juan Vidal',
+    'roman naidenko': 'Roman Naidenko',
+    'roman': 'Roman Naidenko',
+    'victor cheung': 'Victor Cheung',
+    'victor': 'Victor Cheung',
+    'saymond montoya': 'Saymond Montoya',
+    'saymond': 'Saymond Montoya',
+    'tara yowell': 'Tara Yowell',
+    'tara': 'Tara Yowell',
+    'ricardo': 'Ricardo',
+    'bogdan': 'Bogdan',
+    'xingran': 'Xingran Du',
+    'kinney': 'Kinney',
+    'michel': 'Michel',
+    'david': 'David',
+    'bradd schofield': 'Bradd Schofield',
+    'bradd konert': 'Bradd Konert',
+    'bradd': 'Bradd Schofield',
+    'megha': 'Megha Sharma',
+    'adriane': 'Adriane Barredo',
+    'mariana': 'Mariana Gracia Salgado',
+    'cristina': 'Cristina Villarreal',
+    'maz': 'Maz Tayebi',
+    'jerry': 'Jerry Miller',
+    'jeniffer': 'Jeniffer Rosa',
+    'keeko': 'Keeko Villaveces',
+    'lena': 'Lena Klapper',
+    'a.s. johan': 'A.S. Johan',
+    'johan': 'A.S. Johan',
+}
+
+
+# ==========================================
+# Compiled resolver (built once at import)
+# ==========================================
+# Exact matches: lowercase key -> display name. The first key in NAME_MAP wins
+# when two keys only differ by case.
+_EXACT = {}
+for _key, _value in NAME_MAP.items():
+    _EXACT.setdefault(_key.lower(), _value)
+
+# Keywords: one alternation wrapped in a lookahead so every start position is
+# tried. At a given position the regex engine picks the earliest-listed
+# keyword, so the minimum rank over all matches is the keyword KEYWORD_MAP
+# lists first - the same precedence as scanning the dict in order.
+_KEYWORD_RANK = {kw: rank for rank, kw in enumerate(KEYWORD_MAP)}
+_KEYWORD_NAMES = list(KEYWORD_MAP.values())
+_KEYWORD_RE = re.compile('(?=(' + '|'.join(re.escape(kw) for kw in KEYWORD_MAP) + '))')
+
+# Exclusions: any hit excludes, so a plain alternation is enough.
+_EXCLUDE_RE = re.compile('|'.join(re.escape(p.lower()) for p in EXCLUDE_PATTERNS))
+
+
+@lru_cache(maxsize=4096)
 def map_name(identifier):
     """
     Map an email/username/handle to a friendly display name.
@@ -146,75 +222,38 @@ def map_name(identifier):
     identifier_lower = identifier.lower().strip()
     
     # Direct lookup
-    for key, value in NAME_MAP.items():
-        if key.lower() == identifier_lower:
-            return value
+    name = _EXACT.get(identifier_lower)
+    if name is not None:
+        return name
     
     # Keyword-based fallback (for partial matches)
-    keyword_map = {
-        'jkhereford': 'James Hereford',
-        'jaime': 'James Hereford',
-        'james': 'James Hereford',
-        'alexander': 'Alexander Pavelko',
-        'pavelko': 'Alexander Pavelko',
-        'areeba': 'Areeba Akhlaque',
-        'bilal': 'Bilal Munir',
-        'mughal': 'Bilal Munir',
-        'farhan': 'Muhammad Farhan',
-        'cherry': 'Cherry Aznar',
-        'kristi': 'Kristi Bergeron',
-        'bergeron': 'Kristi Bergeron',
-        'saifullah': 'Saifullah Khan',
-        'sunnat': 'Sunnat Choriev',
-        'javidal10': 'Juan Vidal',
-        'juan': 'Juan Vidal',
-        'roman naidenko': 'Roman Naidenko',
-        'roman': 'Roman Naidenko',
-        'victor cheung': 'Victor Cheung',
-        'victor': 'Victor Cheung',
-        'saymond montoya': 'Saymond Montoya',
-        'saymond': 'Saymond Montoya',
-        'tara yowell': 'Tara Yowell',
-        'tara': 'Tara Yowell',
-        'ricardo': 'Ricardo',
-        'bogdan': 'Bogdan',
-        'xingran': 'Xingran Du',
-        'kinney': 'Kinney',
-        'michel': 'Michel',
-        'david': 'David',
-        'bradd schofield': 'Bradd Schofield',
-        'bradd konert': 'Bradd Konert',
-        'bradd': 'Bradd Schofield',
-        'megha': 'Megha Sharma',
-        'adriane': 'Adriane Barredo',
-        'mariana': 'Mariana Gracia Salgado',
-        'cristina': 'Cristina Villarreal',
-        'maz': 'Maz Tayebi',
-        'jerry': 'Jerry Miller',
-        'jeniffer': 'Jeniffer Rosa',
-        'keeko': 'Keeko Villaveces',
-        'lena': 'Lena Klapper',
-        'a.s. johan': 'A.S. Johan',
-        'johan': 'A.S. Johan',
-    }
-    
-    for keyword, name in keyword_map.items():
-        if keyword in identifier_lower:
-            return name
+    ranks = [_KEYWORD_RANK[m.group(1)] for m in _KEYWORD_RE.finditer(identifier_lower)]
+    if ranks:
+        return _KEYWORD_NAMES[min(ranks)]
     
     # Return original if no mapping found
     return identifier
 
 
+@lru_cache(maxsize=4096)
 def should_exclude(name):
     """Check if a name/email should be excluded from reports."""
     if not name:
         return True
     
-    name_lower = name.lower().strip()
-    
-    for pattern in EXCLUDE_PATTERNS:
-        if pattern.lower() in name_lower:
-            return True
-    
-    return False
+    return _EXCLUDE_RE.search(name.lower().strip()) is not None
+
+
+def map_names(values):
+    """
+    Map a pandas Series of identifiers to display names.
+    Each distinct identifier is resolved once and the result broadcast back.
+    """
+    lookup = {v: map_name(v) for v in values.unique()}
+    return values.map(lookup)
+
+
+def exclude_mask(values):
+    """Boolean pandas mask of the values that should_exclude() rejects."""
+    lookup = {v: should_exclude(v) for v in values.unique()}
+    return values.map(lookup).astype(bool)
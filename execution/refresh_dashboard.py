@@ -1,96 +1,376 @@
 """
 Pvragon Dashboard Data Refresh Script
 =====================================
-This script fetches all activity data and exports it to dashboard/data.json
-Run this on a schedule (e.g., every hour) to keep the dashboard updated.
+Exports the pipeline's report outputs to dashboard/ as one shard per month
+plus a small manifest. Runs right after generate_reports.py.
+
+Inputs come from the local pipeline state written by generate_reports.py
+(the Daily Audit cube in state/daily_audit/ and the Activity Time results
+in state/activity_time.csv) - no Sheets reads. `--from-sheets` reads the
+"Daily Audit" and "Activity Time Analysis" tabs instead (fallback when the
+local state is missing). Other code can call export_dashboard() directly
+with in-memory frames.
+
+Publishing: shard files are named by a hash of their content
+(data/2026-03.<hash>.json), so browsers can cache them forever. GitHub
+Pages compresses on the fly and ignores precompressed files, so .gz and .br
+variants (.br needs `pip install brotli`) are only written with
+DASHBOARD_PRECOMPRESS=1, for hosts that serve them. Every file is written
+to a temp file and renamed into place. Shards of the previous manifest are
+kept for one more run, so open pages never fetch a deleted file. The
+manifest is the only uncached file; it is left untouched when the data hash
+(everything except lastUpdated) matches the published one, so
+identical data never produces a new commit. Dictionaries are append-only
+across runs to keep the codes - and therefore the shard hashes - stable.
+
+Data is columnar (format 3): member / platform / type strings are
+dictionary-encoded (dictionaries live in the manifest), dates are integer
+day offsets from `epoch` (START_DATE), and zero rows are left out.
+
+dashboard/manifest.json:
+    {"format": 3, "epoch": "2026-01-01", "lastUpdated": "...",
+     "dictionaries": {"members": [...], "platforms": [...], "types": [...]},
+     "members": [...], "platforms": [...], "types": [...],   # filter options
+     "dataHash": "...",
+     "months": [{"month": "2026-03", "file": "data/2026-03.<hash>.json",
+                 "firstDay": 59, "lastDay": 89, "rows": 1234}, ...],
+     "stats": {...}}
+
+dashboard/data/YYYY-MM.<hash>.json:
+    {"month": "2026-03",
+     "dailyAudit": {"day": [...], "member": [...], "platform": [...],
+                    "type": [...], "count": [...]},
+     "rollups": {"byMember": {"day", "member", "count"},
+                 "byPlatform": {"day", "platform", "count"},
+                 "byType": {"day", "type", "count"},
+                 "memberPlatform": {"member", "platform", "count"}},
+     "timeAnalysis": {"day": [...], "member": [...], "<column>": [...], ...}}
+
+The page only fetches the shards overlapping the selected dates. The
+rollups (sorted by day) answer the KPI tiles and charts for the common
+filter combinations; dailyAudit rows are only scanned for the detail table
+and for filter combinations no rollup covers.
 """
 
-import requests
 import json
-import pandas as pd
+import argparse
 import pytz
-from datetime import datetime, timezone, timedelta
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+from datetime import datetime, timezone
 import os
-import time
+import sys
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:   # optional: .br variants are skipped with a warning
+    brotli = None
 
 # Set Timezone to PST
 PST = pytz.timezone('America/Los_Angeles')
-now_pst = datetime.now(timezone.utc).astimezone(PST)
-
-print(f"=== Dashboard Data Refresh - {now_pst.strftime('%Y-%m-%d %H:%M:%S %Z')} ===")
 
 # Configuration
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
-# Load .env explicitly
-env_path = os.path.join(ROOT_DIR, '.env')
-if os.path.exists(env_path):
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#') and '=' in line:
-                key, value = line.split('=', 1)
-                os.environ[key] = value
-
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '1t7jeunt3IDmnBcIoRYxM06sZgzCYYMAK8AgwH21M0Fo')
+
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+from audit_cube import AuditCube, AUDIT_COLUMNS, SHEET_DATE_FORMAT
+from run_manifest import step, traced
+
+SHEET_ID = settings.sheet_id
 DASHBOARD_DIR = os.path.join(ROOT_DIR, 'dashboard')
+SHARD_DIR = os.path.join(DASHBOARD_DIR, 'data')
+DASHBOARD_FORMAT = 3
+DASHBOARD_EPOCH = datetime.strptime(settings.start_date, '%Y-%m-%d')   # day offset 0 (START_DATE)
+PRECOMPRESS = settings.dashboard_precompress
 
-# Ensure dashboard directory exists
-os.makedirs(DASHBOARD_DIR, exist_ok=True)
+# Received-mail events are not activity; kept out of every dashboard table
+EXCLUDED_TERMS = ['gmail received', 'received email', 'message received', 'email received']
 
-# Auth
-print("[1/3] Authenticating...")
-creds = Credentials.from_authorized_user_file(os.path.join(ROOT_DIR, 'token.json'))
-if not creds.valid and creds.refresh_token:
-    creds.refresh(Request())
-    with open(os.path.join(ROOT_DIR, 'token.json'), 'w') as f:
-        f.write(creds.to_json())
 
-gc = gspread.authorize(creds)
-sh = gc.open_by_key(SHEET_ID)
+def to_days(dates):
+    """Integer day offsets from DASHBOARD_EPOCH (dates typed or MM/DD/YY strings)."""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=SHEET_DATE_FORMAT, errors='coerce')
+    days = ((dates.dt.normalize() - DASHBOARD_EPOCH) // pd.Timedelta(days=1)).astype('Int64')
+    before = int((days < 0).sum())
+    if before:
+        print(f"  [WARN] {before} rows dated before START_DATE ({DASHBOARD_EPOCH:%Y-%m-%d}), "
+              f"exported with negative day offsets")
+    return days
 
-# Fetch Daily Audit Report
-print("[2/3] Fetching Daily Audit Report...")
-try:
-    ws1 = sh.worksheet('Daily Audit')
-    data1 = ws1.get_all_records()
-    print(f"  Loaded {len(data1)} rows")
-except Exception as e:
-    print(f"  Error: {e}")
-    data1 = []
-
-# Fetch Activity Time Analysis
-print("[3/3] Fetching Activity Time Analysis...")
-try:
-    ws2 = sh.worksheet('Activity Time Analysis')
-    data2 = ws2.get_all_records()
-    print(f"  Loaded {len(data2)} rows")
-except Exception as e:
-    print(f"  Error: {e}")
-    data2 = []
-
-# Build dashboard data
-dashboard_data = {
-    'dailyAudit': data1,
-    'timeAnalysis': data2,
-    'lastUpdated': now_pst.strftime('%Y-%m-%d %H:%M:%S %Z'),
-    'stats': {
-        'totalAuditRows': len(data1),
-        'totalTimeRows': len(data2),
-        'uniqueMembers': len(set(r.get('Team Member', '') for r in data1)),
-        'platforms': list(set(r.get('Platform', '') for r in data1 if r.get('Platform')))
+
+def encode(values, dictionary):
+    """Codes of `values` in `dictionary` (a list, extended with unseen values)."""
+    index = {v: i for i, v in enumerate(dictionary)}
+    for v in pd.unique(values):
+        if v not in index:
+            index[v] = len(dictionary)
+            dictionary.append(v)
+    return values.map(index).astype(int).tolist()
+
+
+def encode_audit(audit, dictionaries):
+    """Non-zero Daily Audit rows (AUDIT_COLUMNS) as columnar, dictionary-encoded arrays."""
+    audit = audit[audit['Count'] != 0]
+    pattern = '|'.join(EXCLUDED_TERMS)
+    excluded = (audit['Activity Type'].astype(str).str.lower().str.contains(pattern, regex=True)
+                | audit['Platform'].astype(str).str.lower().str.contains(pattern, regex=True))
+    audit = audit[~excluded]
+    days = to_days(audit['Activity Date'])
+    audit = audit[days.notna()]
+    return {
+        'day': days.dropna().astype(int).tolist(),
+        'member': encode(audit['Team Member'].astype(str), dictionaries['members']),
+        'platform': encode(audit['Platform'].astype(str), dictionaries['platforms']),
+        'type': encode(audit['Activity Type'].astype(str), dictionaries['types']),
+        'count': audit['Count'].astype(int).tolist(),
+    }
+
+
+def rollup(columns, keys):
+    """Sum `count` over `keys` of the encoded dailyAudit columns, sorted by the keys."""
+    df = pd.DataFrame({k: columns[k] for k in keys + ['count']})
+    summed = df.groupby(keys, sort=True)['count'].sum().reset_index()
+    return {col: summed[col].astype(int).tolist() for col in summed.columns}
+
+
+def build_rollups(columns):
+    """Daily totals by member / platform / type, and member x platform totals."""
+    return {
+        'byMember': rollup(columns, ['day', 'member']),
+        'byPlatform': rollup(columns, ['day', 'platform']),
+        'byType': rollup(columns, ['day', 'type']),
+        'memberPlatform': rollup(columns, ['member', 'platform']),
+    }
+
+
+def month_of(days):
+    """'YYYY-MM' for each day offset."""
+    return (DASHBOARD_EPOCH + pd.to_timedelta(pd.Series(days, dtype='int64'), unit='D')).dt.strftime('%Y-%m')
+
+
+def split_by_month(columns):
+    """{month: columns} for a dict of parallel arrays with a 'day' column."""
+    if not columns or not columns.get('day'):
+        return {}
+    df = pd.DataFrame(columns)
+    return {month: {col: group[col].tolist() for col in group.columns}
+            for month, group in df.groupby(month_of(df['day']).values, sort=True)}
+
+
+def used(codes, names):
+    """Sorted names behind a list of dictionary codes."""
+    return sorted({names[i] for i in codes})
+
+
+def to_json_bytes(data):
+    """Compact JSON (no indentation)."""
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def content_hash(payload):
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def atomic_write(path, payload):
+    """Write bytes to a temp file, then rename it into place."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+def publish(path, payload):
+    """Write `payload`, plus its .gz (and .br) precompressed variants with DASHBOARD_PRECOMPRESS=1."""
+    atomic_write(path, payload)
+    if not PRECOMPRESS:
+        return
+    atomic_write(path + '.gz', gzip.compress(payload, compresslevel=9, mtime=0))
+    if brotli is not None:
+        atomic_write(path + '.br', brotli.compress(payload))
+    else:
+        print(f"  [WARN] brotli not installed, skipped {os.path.basename(path)}.br (pip install brotli)")
+
+
+def load_manifest(path):
+    """Currently published manifest, or {}."""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get('format') == DASHBOARD_FORMAT else {}
+
+
+def encode_time(records, dictionaries):
+    """Activity Time Analysis records as columnar arrays (member and date encoded)."""
+    df = pd.DataFrame(records)
+    if df.empty:
+        return {}
+    days = to_days(df['Date'])
+    df = df[days.notna()]
+    columns = {
+        'day': days.dropna().astype(int).tolist(),
+        'member': encode(df['Team Member'].astype(str), dictionaries['members']),
+    }
+    for col in df.columns.drop(['Team Member', 'Date']):
+        columns[col] = [None if pd.isna(v) else v.item() if isinstance(v, np.generic) else v
+                        for v in df[col]]
+    return columns
+
+
+@traced()
+def load_local_outputs():
+    """
+    (audit, time) frames from the local pipeline state, or None when the
+    Daily Audit cube has not been built yet.
+    """
+    from generate_activity_time import load_previous_results
+    cube = AuditCube.load()
+    if cube is None:
+        return None
+    audit = cube.nonzero_frame()
+    time_df = load_previous_results()
+    if time_df is None:
+        print("  [WARN] No local Activity Time results - exporting without them")
+        time_df = pd.DataFrame()
+    print(f"  Loaded {len(audit)} non-zero audit rows and {len(time_df)} time rows from local state")
+    return audit, time_df
+
+
+@traced()
+def load_sheet_outputs():
+    """(audit, time) frames read from the Sheet tabs (fallback mode)."""
+    from credentials import open_sheet
+    from sheets_io import read_daily_audit
+
+    sh = open_sheet(SHEET_ID)
+
+    try:
+        # Single tab, or every monthly partition listed in the index tab
+        audit = read_daily_audit(sh).rename(columns={'Name': 'Team Member', 'Date': 'Activity Date',
+                                                     'Event Type': 'Activity Type'})
+    except Exception as e:
+        print(f"  Error: {e}")
+        audit = pd.DataFrame(columns=AUDIT_COLUMNS)
+    try:
+        time_df = pd.DataFrame(sh.worksheet('Activity Time Analysis').get_all_records())
+    except Exception as e:
+        print(f"  Error: {e}")
+        time_df = pd.DataFrame()
+    print(f"  Loaded {len(audit)} audit rows and {len(time_df)} time rows from the Sheet")
+    return audit, time_df
+
+
+def export_dashboard(audit, time_df, now_pst=None):
+    """
+    Write the month shards and the manifest for `audit` (AUDIT_COLUMNS rows)
+    and `time_df` (Activity Time Analysis rows). Returns the manifest.
+    """
+    now_pst = now_pst or datetime.now(timezone.utc).astimezone(PST)
+    os.makedirs(SHARD_DIR, exist_ok=True)
+
+    # Build dashboard data (columnar, dictionary-encoded, one shard per month).
+    # Dictionaries continue the published ones so existing codes never move.
+    output_path = os.path.join(DASHBOARD_DIR, 'manifest.json')
+    published = load_manifest(output_path)
+    dictionaries = published.get('dictionaries') or {'members': [], 'platforms': [], 'types': []}
+    with step('encode'):
+        daily_audit = encode_audit(audit, dictionaries)
+        time_analysis = encode_time(time_df, dictionaries)
+        n_audit = len(daily_audit['count'])
+
+        audit_months = split_by_month(daily_audit)
+        time_months = split_by_month(time_analysis)
+    months = []
+    written = 0
+    for month in sorted(audit_months.keys() | time_months.keys()):
+        columns = audit_months.get(month, {k: [] for k in daily_audit})
+        with step('shard', month=month):
+            payload = to_json_bytes({
+                'month': month,
+                'dailyAudit': columns,
+                'rollups': build_rollups(columns),
+                'timeAnalysis': time_months.get(month, {}),
+            })
+            file = f"data/{month}.{content_hash(payload)}.json"
+            if not os.path.exists(os.path.join(DASHBOARD_DIR, file)):
+                publish(os.path.join(DASHBOARD_DIR, file), payload)
+                written += 1
+        first = pd.Timestamp(f"{month}-01")
+        last = first + pd.offsets.MonthEnd(0)
+        months.append({
+            'month': month,
+            'file': file,
+            'firstDay': (first - DASHBOARD_EPOCH).days,
+            'lastDay': (last - DASHBOARD_EPOCH).days,
+            'rows': len(columns['count']),
+        })
+
+    manifest = {
+        'format': DASHBOARD_FORMAT,
+        'epoch': DASHBOARD_EPOCH.strftime('%Y-%m-%d'),
+        'dictionaries': dictionaries,
+        'members': used(daily_audit['member'], dictionaries['members']),
+        'platforms': used(daily_audit['platform'], dictionaries['platforms']),
+        'types': used(daily_audit['type'], dictionaries['types']),
+        'months': months,
+        'stats': {
+            'totalAuditRows': n_audit,
+            'totalTimeRows': len(time_df),
+            'uniqueMembers': len(set(daily_audit['member'])),
+            'platforms': used(daily_audit['platform'], dictionaries['platforms']),
+        }
     }
-}
+    manifest['dataHash'] = content_hash(to_json_bytes(manifest))
+
+    if published.get('dataHash') == manifest['dataHash']:
+        print(f"\n[SKIP] Dashboard data unchanged since {published.get('lastUpdated')} (hash {manifest['dataHash']})")
+    else:
+        manifest['lastUpdated'] = now_pst.strftime('%Y-%m-%d %H:%M:%S %Z')
+        atomic_write(output_path, to_json_bytes(manifest))
+        print(f"\n[SUCCESS] Dashboard data saved to: {output_path} ({written} of {len(months)} monthly shards rewritten)")
+        print(f"  Total audit records: {n_audit}")
+        print(f"  Total time records: {len(time_df)}")
+        print(f"  Last updated: {manifest['lastUpdated']}")
+
+    # Drop shard files neither this manifest nor the previously published one
+    # points at (all variants), and precompressed variants once
+    # DASHBOARD_PRECOMPRESS is off. Pages still running the previous manifest
+    # keep finding their shards until the next run.
+    live = {os.path.basename(m['file']) for m in months + published.get('months', [])}
+    for name in os.listdir(SHARD_DIR):
+        shard = name.split('.json')[0] + '.json'
+        if shard not in live or (name != shard and not PRECOMPRESS):
+            os.remove(os.path.join(SHARD_DIR, name))
+
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export pipeline outputs to the dashboard')
+    parser.add_argument('--from-sheets', action='store_true',
+                        help='read the report tabs from the Sheet instead of the local pipeline state')
+    args = parser.parse_args()
+
+    now_pst = datetime.now(timezone.utc).astimezone(PST)
+    print(f"=== Dashboard Data Refresh - {now_pst.strftime('%Y-%m-%d %H:%M:%S %Z')} ===")
+
+    print("[1/2] Loading report outputs...")
+    with step('load'):
+        outputs = load_sheet_outputs() if args.from_sheets else load_local_outputs()
+    if outputs is None:
+        print("  [ERROR] No local Daily Audit cube - run generate_reports.py first, or use --from-sheets")
+        sys.exit(1)
+
+    print("[2/2] Writing dashboard files...")
+    with step('export'):
+        export_dashboard(*outputs, now_pst=now_pst)
 
-# Save to JSON
-output_path = os.path.join(DASHBOARD_DIR, 'data.json')
-with open(output_path, 'w') as f:
-    json.dump(dashboard_data, f, indent=2)
 
-print(f"\n[SUCCESS] Dashboard data saved to: {output_path}")
-print(f"  Total audit records: {len(data1)}")
-print(f"  Total time records: {len(data2)}")
-print(f"  Last updated: {dashboard_data['lastUpdated']}")
+if __name__ == "__main__":
+    main()
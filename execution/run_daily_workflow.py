@@ -7,13 +7,42 @@ See: directives/daily_workflow.md
 
 import os
 import sys
+import time
+import tempfile
 import subprocess
 from datetime import datetime
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
 
-def run_script(script_name, description):
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings
+import run_manifest
+import http_metrics
+import memory_profile
+
+# (section header, [(step, script, description), ...]) in run order
+STEPS = [
+    ("📡 STEP 1: FETCHING PLATFORM DATA", [
+        ('clickup', 'fetch_clickup.py', 'ClickUp Activity'),
+        ('github', 'fetch_github.py', 'GitHub Activity'),
+        ('google', 'fetch_google_workspace.py', 'Google Workspace Activity'),
+        ('figma', 'fetch_figma.py', 'Figma Activity'),
+        ('backendless', 'fetch_backendless.py', 'Backendless Activity'),
+    ]),
+    # Daily Audit + Activity Time Analysis
+    ("📊 STEP 1.5: GENERATING REPORTS", [
+        ('reports', 'generate_reports.py', 'Daily Audit & Time Analysis'),
+    ]),
+    ("📈 STEP 2: REFRESHING DASHBOARD", [
+        ('dashboard', 'refresh_dashboard.py', 'Dashboard Data Export'),
+    ]),
+    ("📧 STEP 3: SENDING EMAIL SUMMARY", [
+        ('email', 'send_daily_email.py', 'Daily Summary Email'),
+    ]),
+]
+
+def run_script(script_name, description, env=None):
     """Run a Python script and return success status."""
     script_path = os.path.join(SCRIPT_DIR, script_name)
     print(f"\n{'='*60}")
@@ -26,7 +55,8 @@ def run_script(script_name, description):
             [sys.executable, script_path],
             cwd=ROOT_DIR,
             capture_output=False,
-            text=True
+            text=True,
+            env=env
         )
         if result.returncode == 0:
             print(f"[SUCCESS] {description}")
@@ -39,6 +69,86 @@ def run_script(script_name, description):
         return False
 
 
+def run_stage(step, script, description, part_dir):
+    """
+    Run one stage and return its run manifest entry: wall / CPU time of the
+    process plus the sub-steps and counters the script reported.
+    """
+    part_path = os.path.join(part_dir, f"{step}.json")
+    env = dict(os.environ, **{run_manifest.PART_ENV: part_path}, **memory_profile.child_env())
+    cpu_before, rss_before = run_manifest.children_usage()
+    started = time.perf_counter()
+    with run_manifest.step(step, script=script):
+        ok = run_script(script, description, env=env)
+    wall = time.perf_counter() - started
+    cpu_after, rss_after = run_manifest.children_usage()
+    cpu = None if cpu_before is None else cpu_after - cpu_before
+    return run_manifest.stage_record(step, script, ok, wall, cpu, part_path, rss_before, rss_after)
+
+
+def print_stage_table(stages):
+    """Per-stage timings, volumes and peak RSS for the run summary."""
+    print(f"\n  {'stage':<12} {'wall':>8} {'cpu':>8} {'requests':>9} {'MB down':>8} {'events':>8} {'rows':>8} {'retries':>8} {'RSS MB':>7}")
+    for s in stages:
+        cpu = '-' if s['cpu_s'] is None else f"{s['cpu_s']:.1f}s"
+        rss = s['memory'].get('rss_peak_mb')
+        print(f"  {s['stage']:<12} {s['wall_s']:>7.1f}s {cpu:>8} {s['api_requests']:>9} "
+              f"{s['bytes_downloaded'] / 1e6:>8.2f} {s['events_ingested']:>8} {s['rows_written']:>8} {s['retries']:>8} "
+              f"{'-' if rss is None else f'{rss:.0f}':>7}")
+
+
+def measure_import_time(script_name, top=3):
+    """
+    Cold-start cost of a stage, from `python -X importtime -c "import <module>"`
+    (the scripts do no work at import). Libraries loaded through lazy_import()
+    are only imported on first use, so their cost is not counted here - this
+    is the startup cost before any work. Returns (total ms for the interpreter,
+    ms for the module itself, [(import, ms), ...] its heaviest direct imports),
+    or None if the import failed.
+    """
+    module = os.path.splitext(script_name)[0]
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SCRIPT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+
+    # Lines: "import time: <self us> | <cumulative us> | <indent><name>", children first
+    total_us, module_us, children, pending = 0, 0, [], []
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative, name = int(parts[1]), parts[2]
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            total_us += cumulative
+            if name == module:
+                module_us = cumulative
+                children = pending
+            pending = []
+        elif depth == 1:
+            pending.append((name, cumulative))
+
+    heaviest = sorted(children, key=lambda c: c[1], reverse=True)[:top]
+    return total_us / 1000, module_us / 1000, [(name, us / 1000) for name, us in heaviest]
+
+
+def print_import_report(scripts):
+    """Import-time table for the run summary, so cold-start regressions show up."""
+    print("\n⏱️ IMPORT TIME (cold start, python -X importtime; lazily imported libraries not counted)")
+    for script in scripts:
+        report = measure_import_time(script)
+        if report is None:
+            print(f"  {script:<28} import failed")
+            continue
+        total, own, heaviest = report
+        top = ', '.join(f"{name} {ms:.0f}" for name, ms in heaviest)
+        print(f"  {script:<28} {total:6.0f} ms total, {own:6.0f} ms module  ({top})")
+
+
 def main():
     start_time = datetime.now()
     print("\n" + "=" * 60)
@@ -47,31 +157,39 @@ def main():
     print("=" * 60)
     
     results = {}
+    stages = []
+    cpu_before, _ = run_manifest.children_usage()
     
-    # Step 1: Fetch platform data
-    print("\n📡 STEP 1: FETCHING PLATFORM DATA")
-    results['clickup'] = run_script('fetch_clickup.py', 'ClickUp Activity')
-    results['github'] = run_script('fetch_github.py', 'GitHub Activity')
-    results['google'] = run_script('fetch_google_workspace.py', 'Google Workspace Activity')
-    results['figma'] = run_script('fetch_figma.py', 'Figma Activity')
-    results['backendless'] = run_script('fetch_backendless.py', 'Backendless Activity')
-    
-    # Step 1.5: Generate Reports (Daily Audit + Activity Time Analysis)
-    print("\n📊 STEP 1.5: GENERATING REPORTS")
-    results['reports'] = run_script('generate_reports.py', 'Daily Audit & Time Analysis')
-    
-    # Step 2: Refresh dashboard
-    print("\n📈 STEP 2: REFRESHING DASHBOARD")
-    results['dashboard'] = run_script('refresh_dashboard.py', 'Dashboard Data Export')
-    
-    # Step 3: Send email summary
-    print("\n📧 STEP 3: SENDING EMAIL SUMMARY")
-    results['email'] = run_script('send_daily_email.py', 'Daily Summary Email')
+    with tempfile.TemporaryDirectory(prefix='run_manifest_') as part_dir:
+        for header, steps in STEPS:
+            print(f"\n{header}")
+            for step, script, description in steps:
+                stages.append(run_stage(step, script, description, part_dir))
+                results[step] = stages[-1]['ok']
     
     # Summary
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
     
+    http = http_metrics.merge([s.pop('http') for s in stages])
+    trace = [e for s in stages for e in s.pop('trace')]
+    run_id = start_time.strftime('%Y%m%dT%H%M%S')
+    if run_manifest.TRACING:
+        trace_path = os.path.join(run_manifest.TRACE_DIR, f"run-{run_id}.json")
+        run_manifest.write_trace(run_manifest.trace_events('run_daily_workflow.py') + trace, trace_path)
+    http_metrics.write_textfile(http, settings.http_metrics_textfile)
+    run_manifest.append_run({
+        'run_id': run_id,
+        'started': start_time.isoformat(timespec='seconds'),
+        'finished': end_time.isoformat(timespec='seconds'),
+        'ok': all(results.values()),
+        'wall_s': round(duration, 3),
+        'cpu_s': None if cpu_before is None else round(run_manifest.children_usage()[0] - cpu_before, 3),
+        **{k: sum(s[k] for s in stages) for k in run_manifest.COUNTERS},
+        'stages': stages,
+        'http': http,
+    })
+    
     print("\n" + "=" * 60)
     print("📋 WORKFLOW SUMMARY")
     print("=" * 60)
@@ -86,6 +204,25 @@ def main():
     print(f"\nCompleted: {success_count}/{total_count} steps successful")
     print(f"Duration: {duration:.1f} seconds")
     print(f"Finished: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print_stage_table(stages)
+    print(f"Run manifest: {os.path.relpath(run_manifest.HISTORY_PATH, ROOT_DIR)} "
+          f"(compare: python execution/run_manifest.py)")
+    
+    if run_manifest.TRACING:
+        print(f"Trace: {os.path.relpath(trace_path, ROOT_DIR)} (open in ui.perfetto.dev or chrome://tracing)")
+    
+    if memory_profile.ENABLED:
+        print("\n🧠 MEMORY (MEMORY_PROFILE=1, tracemalloc)")
+        for line in memory_profile.summary(stages):
+            print(line)
+    
+    if http['endpoints']:
+        print(f"\n🌐 HTTP REQUESTS (Prometheus: {settings.http_metrics_textfile})")
+        for line in http_metrics.summary(http):
+            print(line)
+    
+    if settings.import_time_report:
+        print_import_report([script for _, steps in STEPS for _, script, _ in steps])
     
     if success_count < total_count:
         print("\n⚠️ Some steps failed. Check logs above for details.")
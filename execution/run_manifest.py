@@ -0,0 +1,403 @@
+"""
+Run Manifest
+============
+Machine-readable history of pipeline runs: one JSON line per run of
+run_daily_workflow.py, appended to state/run_history.jsonl.
+
+Each run records, per stage (one script) and per sub-step inside it:
+- wall_s / cpu_s       - elapsed and CPU seconds
+- api_requests         - HTTP requests sent through `requests` (fetchers, gspread;
+                         Gmail API sends go through httplib2 and are not counted)
+- bytes_downloaded     - response body bytes of those requests
+- events_ingested      - raw events / log rows a stage read from its source
+- rows_written         - Sheet rows sent by the upload scheduler
+- retries              - retried Sheet writes
+- rss_peak_mb          - RSS high-water mark of the stage process; with
+                         MEMORY_PROFILE=1 also per top-level step, next to the
+                         tracemalloc heap peak and top allocation sites
+                         (memory_profile.py)
+
+Per-endpoint latency, status codes and rate limits of the same requests are
+kept by http_metrics.py and written alongside the counters.
+
+Stage scripts mark sub-steps with `with step('comments'):` and add to the
+counters with `count('events_ingested', n)`. Only when run_daily_workflow.py sets RUN_MANIFEST_PART does
+a stage hook `requests` and write its steps and counters to that file at
+exit, for the orchestrator to fold into the run record.
+
+Tracing (PIPELINE_TRACE=1): every step() - also used as the @traced()
+decorator - becomes a span with its parent/child nesting, written in Chrome
+trace-event JSON. Under the orchestrator the spans of all stage processes are
+merged into state/traces/run-<run id>.json; a script run on its own writes
+state/traces/<script>-<time>.json. Open either in ui.perfetto.dev,
+chrome://tracing or speedscope. With neither the orchestrator nor tracing
+active, step() returns a shared no-op context and @traced leaves the
+function as it is.
+
+Compare the latest run against the median of the runs before it:
+    python execution/run_manifest.py [--baseline 7] [--threshold 1.25]
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+import functools
+from statistics import median
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:   # Windows: no child CPU accounting
+    resource = None
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings
+import http_metrics
+import memory_profile
+
+HISTORY_PATH = os.path.join(ROOT_DIR, 'state', 'run_history.jsonl')
+TRACE_DIR = os.path.join(ROOT_DIR, 'state', 'traces')
+PART_ENV = 'RUN_MANIFEST_PART'
+
+COUNTERS = ['api_requests', 'bytes_downloaded', 'events_ingested', 'rows_written', 'retries']
+MEMORY_METRICS = ['rss_peak_mb', 'py_peak_mb']
+
+_counters = dict.fromkeys(COUNTERS, 0)
+_steps = {}                  # step path -> totals, in first-completion order
+_local = threading.local()   # per-thread stack of open step names
+_trace = []                  # Chrome trace events of this process (TRACING only)
+_lock = threading.Lock()
+
+# Timings are only taken when something consumes them
+TRACING = settings.trace
+ACTIVE = bool(os.environ.get(PART_ENV)) or TRACING
+
+
+# ==========================================
+# Recording (inside a stage script)
+# ==========================================
+def count(name, n=1):
+    """Add `n` to counter `name` (thread-safe)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+class _Step:
+    """One timed span; see step()."""
+    __slots__ = ('name', 'args', 'stack', 'path', 'before', 'ts', 'wall', 'cpu', 'memory')
+
+    def __init__(self, name, args):
+        self.name, self.args = name, args
+
+    def __enter__(self):
+        stack = self.stack = _local.__dict__.setdefault('stack', [])
+        stack.append(self.name)
+        self.path = '/'.join(stack)
+        # Memory figures for top-level steps of the main thread (MEMORY_PROFILE=1)
+        self.memory = (memory_profile.ENABLED and len(stack) == 1
+                       and threading.current_thread() is threading.main_thread())
+        if self.memory:
+            memory_profile.step_started()
+        with _lock:
+            self.before = dict(_counters)
+        self.ts = time.time_ns() // 1000
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        self.stack.pop()
+        figures = memory_profile.step_finished(self.path) if self.memory else {}
+        with _lock:
+            deltas = {k: v - self.before.get(k, 0) for k, v in _counters.items() if v != self.before.get(k, 0)}
+            totals = _steps.setdefault(self.path, {'name': self.path, 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            totals['calls'] += 1
+            totals['wall_s'] += wall
+            totals['cpu_s'] += cpu
+            for k, v in deltas.items():
+                totals[k] = totals.get(k, 0) + v
+            for k, v in figures.items():
+                if v is not None:
+                    totals[k] = max(totals.get(k, 0), v)
+            if TRACING:
+                _trace.append({'name': self.name, 'cat': 'pipeline', 'ph': 'X', 'ts': self.ts,
+                               'dur': int(wall * 1e6), 'pid': os.getpid(), 'tid': threading.get_native_id(),
+                               'args': {**self.args, **deltas, 'cpu_ms': round(cpu * 1000, 1)}})
+        return False
+
+
+_NO_STEP = nullcontext()
+
+
+def step(name, **args):
+    """
+    Time a sub-step of the current stage (`with step('comments'):`). Nested
+    steps are recorded as 'outer/inner' and summed per path, so steps inside
+    loops are fine; counters are attributed to every open step. With tracing
+    on, each call is also a trace span carrying `args`. Outside the
+    orchestrator and without tracing this is a shared no-op context.
+    """
+    return _Step(name, args) if ACTIVE else _NO_STEP
+
+
+def traced(name=None):
+    """
+    Decorator form of step(), named after the function by default. Returns
+    the function unchanged when nothing is recorded. Not for generators (only
+    their creation would be timed).
+    """
+    def decorate(fn):
+        if not ACTIVE:
+            return fn
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with _Step(label, {}):
+                return fn(*a, **kw)
+        return wrapper
+    return decorate
+
+
+def trace_events(process_name=None):
+    """
+    This process's trace events (cleared), with the metadata events naming
+    the process and its threads.
+    """
+    with _lock:
+        events, _trace[:] = list(_trace), []
+    if not events:
+        return []
+    pid = os.getpid()
+    meta = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+             'args': {'name': process_name or os.path.basename(sys.argv[0]) or 'python'}}]
+    main_tid = threading.main_thread().native_id
+    for tid in sorted({e['tid'] for e in events}):
+        meta.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                     'args': {'name': 'main' if tid == main_tid else f'worker {tid}'}})
+    return meta + events
+
+
+def write_trace(events, path):
+    """Write Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev, speedscope)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def _instrument_requests():
+    """
+    Count and time every request sent through requests.Session (also used by
+    gspread); per-endpoint figures go to http_metrics.
+    """
+    try:
+        import requests
+    except ImportError:
+        return
+    send = requests.Session.send
+    if getattr(send, 'run_manifest', False):
+        return
+
+    def counted_send(self, request, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = send(self, request, **kwargs)
+        except Exception:
+            count('api_requests')
+            http_metrics.record(request.url, time.perf_counter() - started)
+            raise
+        size = None if kwargs.get('stream') else len(response.content)
+        count('api_requests')
+        count('bytes_downloaded', size or 0)
+        http_metrics.record(request.url, time.perf_counter() - started, response, size)
+        return response
+
+    counted_send.run_manifest = True
+    requests.Session.send = counted_send
+
+
+def _write_part(path):
+    with _lock:
+        steps = [dict(s, wall_s=round(s['wall_s'], 3), cpu_s=round(s['cpu_s'], 3)) for s in _steps.values()]
+        part = {'counters': dict(_counters), 'steps': steps}
+    part['http'] = http_metrics.snapshot()
+    part['memory'] = memory_profile.report()
+    part['trace'] = trace_events()
+    with open(path, 'w') as f:
+        json.dump(part, f)
+
+
+def _write_own_trace():
+    """Standalone traced run: the script's trace goes to state/traces/."""
+    events = trace_events()
+    if events:
+        script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+        path = os.path.join(TRACE_DIR, f"{script}-{time.strftime('%Y%m%dT%H%M%S')}.json")
+        write_trace(events, path)
+        print(f"[TRACE] {path}")
+
+
+if os.environ.get(PART_ENV):
+    _instrument_requests()
+    atexit.register(_write_part, os.environ[PART_ENV])
+elif TRACING:
+    atexit.register(_write_own_trace)
+
+
+# ==========================================
+# Collecting (run_daily_workflow.py)
+# ==========================================
+def children_usage():
+    """
+    (CPU seconds, RSS high-water MB) over all finished child processes, or
+    (None, None) without `resource`. The RSS figure is the largest of any
+    child so far, not of the last one.
+    """
+    if resource is None:
+        return None, None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime, memory_profile.maxrss_mb(usage)
+
+
+def stage_record(step_name, script, ok, wall_s, cpu_s, part_path, rss_before=None, rss_after=None):
+    """
+    One stage entry of the run record, merged with what the script wrote to
+    `part_path`. Without a part (the script died before writing it) the RSS
+    peak falls back to the children high-water mark, when this stage raised it.
+    """
+    part = {'counters': {}, 'steps': []}
+    if os.path.exists(part_path):
+        try:
+            with open(part_path) as f:
+                part = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  [WARN] Could not read run manifest part for {step_name}: {e}")
+    record = {'stage': step_name, 'script': script, 'ok': ok,
+              'wall_s': round(wall_s, 3), 'cpu_s': None if cpu_s is None else round(cpu_s, 3)}
+    record.update({k: part['counters'].get(k, 0) for k in COUNTERS})
+    record['steps'] = part['steps']
+    record['http'] = part.get('http', {})
+    record['trace'] = part.get('trace', [])
+    record['memory'] = part.get('memory') or {}
+    if record['memory'].get('rss_peak_mb') is None and rss_after is not None and rss_after > (rss_before or 0):
+        record['memory']['rss_peak_mb'] = rss_after
+    return record
+
+
+def append_run(run, path=None):
+    """Append one run record to the history file."""
+    path = path or HISTORY_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+
+def load_history(path=None):
+    """All run records, oldest first (unreadable lines are skipped)."""
+    path = path or HISTORY_PATH
+    runs = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    return runs
+
+
+# ==========================================
+# Comparing
+# ==========================================
+def flatten(run):
+    """{'stage' or 'stage/step': {metric: value}} for one run."""
+    metrics = {}
+    for stage in run.get('stages', []):
+        name = stage['stage']
+        metrics[name] = {k: stage.get(k) for k in ['wall_s', 'cpu_s'] + COUNTERS}
+        metrics[name].update({k: (stage.get('memory') or {}).get(k) for k in MEMORY_METRICS})
+        for s in stage.get('steps', []):
+            metrics[f"{name}/{s['name']}"] = {k: s.get(k, 0) for k in ['wall_s', 'cpu_s'] + COUNTERS}
+            metrics[f"{name}/{s['name']}"].update({k: s.get(k) for k in MEMORY_METRICS})
+    return metrics
+
+
+def compare(latest, baseline_runs, threshold=1.25, min_seconds=1.0, min_mb=50):
+    """
+    Rows of (name, metric, latest, baseline median, ratio, regressed) for every
+    stage and sub-step metric that is non-zero in the latest run or the baseline.
+    A time metric regresses when it grows by more than `threshold` and at least
+    `min_seconds`, a memory peak by more than `threshold` and at least `min_mb`;
+    counters are reported but never flagged.
+    """
+    history = [flatten(run) for run in baseline_runs]
+    rows = []
+    for name, metrics in flatten(latest).items():
+        for metric, value in metrics.items():
+            past = [h[name][metric] for h in history if name in h and h[name].get(metric) is not None]
+            base = median(past) if past else None
+            if value is None or (not value and not base):
+                continue
+            ratio = value / base if base else None
+            floor = min_seconds if metric in ('wall_s', 'cpu_s') else min_mb if metric in MEMORY_METRICS else None
+            regressed = (floor is not None and ratio is not None
+                         and ratio > threshold and value - base >= floor)
+            rows.append((name, metric, value, base, ratio, regressed))
+    return rows
+
+
+def fmt(metric, value):
+    if value is None:
+        return '-'
+    if metric == 'bytes_downloaded':
+        return f"{value / 1e6:.2f} MB"
+    if metric in ('wall_s', 'cpu_s'):
+        return f"{value:.1f}s"
+    if metric in MEMORY_METRICS:
+        return f"{value:.0f} MB"
+    return f"{value:g}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the latest pipeline run against a rolling baseline')
+    parser.add_argument('--baseline', type=int, default=7, help='number of earlier runs in the baseline (default 7)')
+    parser.add_argument('--threshold', type=float, default=1.25, help='ratio above which a time is flagged (default 1.25)')
+    parser.add_argument('--history', default=HISTORY_PATH, help='run history file')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit 1 when a stage or step regressed')
+    args = parser.parse_args()
+
+    runs = load_history(args.history)
+    if not runs:
+        print(f"[SKIP] No runs recorded in {args.history}")
+        return
+    latest, earlier = runs[-1], [r for r in runs[:-1] if r.get('ok')][-args.baseline:]
+    print(f"Run {latest['run_id']} ({'ok' if latest.get('ok') else 'FAILED'}, {latest['wall_s']:.0f}s) "
+          f"vs median of {len(earlier)} earlier successful run(s)")
+    if not earlier:
+        print("  [WARN] No baseline yet - showing the latest run only")
+
+    rows = compare(latest, earlier, args.threshold)
+    print(f"\n  {'stage / step':<36} {'metric':<17} {'latest':>10} {'baseline':>10} {'change':>8}")
+    for name, metric, value, base, ratio, regressed in rows:
+        change = '' if ratio is None else f"{(ratio - 1) * 100:+.0f}%"
+        flag = '  ⚠️' if regressed else ''
+        print(f"  {name:<36} {metric:<17} {fmt(metric, value):>10} {fmt(metric, base):>10} {change:>8}{flag}")
+
+    regressions = [r for r in rows if r[5]]
+    if regressions:
+        print(f"\n[WARN] {len(regressions)} timing / memory regression(s) above {args.threshold:g}x the baseline")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,118 +9,172 @@ import os
 import sys
 import json
 import base64
+import argparse
+from string import Template
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import smtplib
 
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 
 # Configuration
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
 
-# Load from .env if exists
-def load_env():
-    env_path = os.path.join(ROOT_DIR, '.env')
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
-
-load_env()
-
-SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '1t7jeunt3IDmnBcIoRYxM06sZgzCYYMAK8AgwH21M0Fo')
-EMAIL_RECIPIENTS = os.environ.get('EMAIL_RECIPIENTS', 'areeba@pvragon.com').split(',')
-EMAIL_USER = os.environ.get('EMAIL_USER', '')
-EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', '')
-DASHBOARD_URL = os.environ.get('DASHBOARD_URL', 'https://pvragon.github.io/activity-dashboard')
+sys.path.insert(0, SCRIPT_DIR)
+from config import settings, lazy_import
+pd = lazy_import('pandas')
+from audit_cube import AuditCube, SHEET_DATE_FORMAT
+from sheets_io import read_daily_audit
+from generate_activity_time import load_previous_results
+from name_mappings import NAME_MAP
+from credentials import get_credentials, open_sheet
+from run_manifest import step, traced
+
+SHEET_ID = settings.sheet_id
+EMAIL_RECIPIENTS = list(settings.email_recipients)
+EMAIL_USER = settings.email_user
+EMAIL_PASSWORD = settings.email_password
+DASHBOARD_URL = settings.dashboard_url
 SHEET_URL = f'https://docs.google.com/spreadsheets/d/{SHEET_ID}'
 
+# Comparison window for week-over-week and the daily average
+COMPARE_DAYS = 7
 
-def get_credentials():
-    """Get Google OAuth credentials."""
-    token_path = os.path.join(ROOT_DIR, 'token.json')
-    creds = Credentials.from_authorized_user_file(token_path)
-    if not creds.valid and creds.refresh_token:
-        creds.refresh(Request())
-        with open(token_path, 'w') as f:
-            f.write(creds.to_json())
-    return creds
+# Per-member digests (opt-in): sent to each member's primary address in NAME_MAP
+MEMBER_DIGESTS = settings.member_digests
+DIGEST_DOMAIN = settings.digest_domain
+DIGEST_BATCH_SIZE = settings.digest_batch_size    # Gmail API sends per batch request
 
+# Activity Time columns read as numbers
+TIME_METRICS = ['Active Window (Hours)', 'Longest Break (Minutes)', 'Sessions', 'Focus Time (Hours)']
 
-def get_daily_summary(creds):
-    """Fetch summary data from Google Sheet."""
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(SHEET_ID)
-    
-    # Get today's date string (MM/DD/YY format)
-    today = datetime.now()
-    today_str = today.strftime('%m/%d/%y')
-    yesterday_str = (today - timedelta(days=1)).strftime('%m/%d/%y')
-    
-    # Fetch Daily Audit data
-    ws = sh.worksheet('Daily Audit')
-    data = ws.get_all_records()
-    
-    # Filter for today or yesterday (depending on when run)
-    today_data = [r for r in data if r.get('Activity Date') in [today_str, yesterday_str]]
-    
-    # Calculate metrics
-    total_activities = sum(int(r.get('Count', 0)) for r in today_data)
-    
-    # Get unique active members
-    active_members = set(r.get('Team Member') for r in today_data if int(r.get('Count', 0)) > 0)
-    
-    # Get top performers
-    member_counts = {}
-    for r in today_data:
-        member = r.get('Team Member', '')
-        count = int(r.get('Count', 0))
-        member_counts[member] = member_counts.get(member, 0) + count
-    
-    top_performers = sorted(member_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    # Get platform breakdown
-    platform_counts = {}
-    for r in today_data:
-        platform = r.get('Platform', '')
-        count = int(r.get('Count', 0))
-        platform_counts[platform] = platform_counts.get(platform, 0) + count
-    
-    # Fetch Time Analysis for avg hours
+
+@traced()
+def load_audit_cube(start, end):
+    """
+    Daily Audit cube covering [start, end]. Prefers the local cube written by
+    generate_reports.py; falls back to the Sheet partitions (or tab) of the range.
+    """
+    cube = AuditCube.load()
+    if cube is None:
+        audit = read_daily_audit(open_sheet(SHEET_ID), start, end)
+        cube = AuditCube.from_frame(audit.rename(columns={'Name': 'Team Member', 'Date': 'Activity Date',
+                                                          'Event Type': 'Activity Type'}))
+    return cube
+
+
+@traced()
+def load_time_results():
+    """Activity Time rows from state/activity_time.csv, falling back to the Sheet tab."""
+    time_df = load_previous_results()
+    if time_df is None:
+        time_df = pd.DataFrame(open_sheet(SHEET_ID).worksheet('Activity Time Analysis').get_all_records())
+    time_df = time_df.copy()
+    time_df.index = pd.to_datetime(time_df['Date'], format=SHEET_DATE_FORMAT, errors='coerce')
+    for col in TIME_METRICS:
+        time_df[col] = pd.to_numeric(time_df[col], errors='coerce')
+    return time_df[time_df.index.notna()].sort_index()
+
+
+def load_report_data():
+    """
+    Everything the summary and the digests read, loaded once: the report
+    window (yesterday and today), the Daily Audit cube and its date-indexed
+    rollup covering the window plus the comparison days, and the Activity Time
+    rows (None if unavailable).
+    """
+    today = pd.Timestamp(datetime.now()).normalize()
+    start = today - timedelta(days=1)
+    baseline_start = start - timedelta(days=COMPARE_DAYS)      # 7 days before the window
+
+    cube = load_audit_cube(baseline_start, today)
     try:
-        ws_time = sh.worksheet('Activity Time Analysis')
-        time_data = ws_time.get_all_records()
-        time_today = [r for r in time_data if r.get('Date') in [today_str, yesterday_str]]
-        
-        if time_today:
-            avg_hours = sum(float(r.get('Active Window (Hours)', 0)) for r in time_today) / len(time_today)
-            avg_break = sum(int(r.get('Longest Break (Minutes)', 0)) for r in time_today) / len(time_today)
-        else:
-            avg_hours = 0
-            avg_break = 0
-    except:
-        avg_hours = 0
-        avg_break = 0
-    
+        time_df = load_time_results()
+    except Exception as e:
+        print(f"  [WARN] Activity Time unavailable: {e}")
+        time_df = None
     return {
-        'date': yesterday_str if not today_data else today_str,
-        'total_activities': total_activities,
-        'active_members': len(active_members),
+        'today': today,
+        'start': start,
+        'baseline_start': baseline_start,
+        'cube': cube,
+        'rollup': cube.daily_rollup(baseline_start, today),
+        'time': time_df,
+    }
+
+
+def window_totals(rollup, start, end):
+    """{'days', 'total', 'members': {name: n}, 'platforms': {name: n}} for [start, end]."""
+    members = rollup['members'].loc[start:end]
+    member_sums = members.sum()
+    platform_sums = rollup['platforms'].loc[start:end].sum()
+    return {
+        'days': len(members),
+        'total': int(member_sums.sum()),
+        'members': member_sums[member_sums > 0].astype(int).to_dict(),
+        'platforms': platform_sums[platform_sums > 0].astype(int).to_dict(),
+    }
+
+
+def pct_change(current, previous):
+    """Percent change, or None when there is nothing to compare against."""
+    return round((current - previous) * 100 / previous) if previous else None
+
+
+def get_daily_summary(data):
+    """Summary for today and yesterday, compared with the same days last week and the prior 7 days."""
+    today, start, baseline_start = data['today'], data['start'], data['baseline_start']
+    week_ago = timedelta(days=COMPARE_DAYS)
+
+    # One rollup covers the window, the same days last week and the 7-day baseline
+    rollup = data['rollup']
+    current = window_totals(rollup, start, today)
+    last_week = window_totals(rollup, start - week_ago, today - week_ago)
+    baseline = window_totals(rollup, baseline_start, start - timedelta(days=1))
+    has_data = current['days'] > 0
+
+    member_counts = current['members']
+    top_performers = sorted(member_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+
+    # Activity Time averages for the same windows
+    time_df = data['time']
+    if time_df is not None:
+        hours = time_df['Active Window (Hours)']
+        avg_hours = hours.loc[start:today].mean()
+        avg_break = time_df['Longest Break (Minutes)'].loc[start:today].mean()
+        last_week_hours = hours.loc[start - week_ago:today - week_ago].mean()
+    else:
+        avg_hours = avg_break = last_week_hours = float('nan')
+    avg_hours, avg_break, last_week_hours = (0 if pd.isna(v) else float(v) for v in (avg_hours, avg_break, last_week_hours))
+
+    # Daily average over the 7 days before the window (days with no activity count as 0)
+    avg_7d = baseline['total'] / COMPARE_DAYS
+    daily_rate = current['total'] / ((today - start).days + 1)
+
+    return {
+        'date': (today if has_data else start).strftime('%m/%d/%y'),
+        'total_activities': current['total'],
+        'active_members': len(member_counts),
         'avg_hours': round(avg_hours, 1),
         'avg_break': round(avg_break),
         'top_performers': top_performers,
-        'platform_counts': platform_counts
+        'platform_counts': current['platforms'],
+        'last_week_activities': last_week['total'],
+        'last_week_members': len(last_week['members']),
+        'last_week_hours': round(last_week_hours, 1),
+        'wow_change': pct_change(current['total'], last_week['total']),
+        'avg_7d': round(avg_7d),
+        'vs_avg_7d': pct_change(daily_rate, avg_7d),
     }
 
 
+def format_change(change):
+    """'+12%' / '-5%' / 'n/a'."""
+    return 'n/a' if change is None or pd.isna(change) else f"{int(change):+d}%"
+
+
+@traced()
 def generate_email_html(summary):
     """Generate HTML email content."""
     # Format top performers
@@ -177,6 +231,16 @@ def generate_email_html(summary):
                     </div>
                 </div>
                 
+                <div class="section">
+                    <h3>📈 Compared to Last Week</h3>
+                    <ul>
+                        <li>Activities: {summary['total_activities']:,} vs {summary['last_week_activities']:,} same days last week ({format_change(summary['wow_change'])})</li>
+                        <li>Active members: {summary['active_members']} vs {summary['last_week_members']}</li>
+                        <li>Avg active hours: {summary['avg_hours']}h vs {summary['last_week_hours']}h</li>
+                        <li>7-day average: {summary['avg_7d']:,} activities/day (this report: {format_change(summary['vs_avg_7d'])} per day)</li>
+                    </ul>
+                </div>
+
                 <div class="section">
                     <h3>🏆 Top Performers</h3>
                     <p>{top_performers_html}</p>
@@ -203,15 +267,224 @@ def generate_email_html(summary):
     return html
 
 
+# ==========================================
+# Per-member digests
+# ==========================================
+DIGEST_TEMPLATE = Template("""
+    <!DOCTYPE html>
+    <html>
+    <body style="font-family: 'Segoe UI', Arial, sans-serif; background: #f5f5f5; margin: 0; padding: 20px;">
+        <div style="max-width: 600px; margin: 0 auto; background: white; border-radius: 12px; overflow: hidden;">
+            <div style="background: linear-gradient(135deg, #6366f1, #818cf8); color: white; padding: 24px; text-align: center;">
+                <h1 style="margin: 0; font-size: 22px;">👋 Your Daily Digest, $first_name</h1>
+                <p style="margin: 8px 0 0; opacity: 0.9;">$date</p>
+            </div>
+            <div style="padding: 24px;">
+                <h3 style="font-size: 14px; text-transform: uppercase; color: #333;">📈 Activity</h3>
+                <p><b>$activities</b> activities ($wow_change vs the same days last week: $last_week).<br>
+                   Team average per active member: $team_avg ($vs_team for you).</p>
+                <h3 style="font-size: 14px; text-transform: uppercase; color: #333;">📱 By Platform</h3>
+                <ul>$platform_rows</ul>
+                <h3 style="font-size: 14px; text-transform: uppercase; color: #333;">⏰ Active Window</h3>
+                <p>$day_windows</p>
+                <p>Both days: $hours h active, $focus h focus,
+                   $sessions sessions, longest break $longest_break min</p>
+            </div>
+            <div style="text-align: center; padding: 20px; background: #f0f0ff;">
+                <a href="$dashboard_url" style="padding: 12px 24px; background: #6366f1; color: white; text-decoration: none; border-radius: 6px;">📊 Open Dashboard</a>
+            </div>
+        </div>
+    </body>
+    </html>
+""")
+PLATFORM_ROW = Template("<li>$platform: $count</li>")
+
+
+def member_addresses():
+    """{display name: address} for every primary DIGEST_DOMAIN address in NAME_MAP."""
+    addresses = {}
+    for identifier, name in NAME_MAP.items():
+        if identifier.lower().endswith('@' + DIGEST_DOMAIN) and name not in addresses:
+            addresses[name] = identifier
+    return addresses
+
+
+def member_summaries(data):
+    """
+    One row per member with activity or Activity Time rows in the report
+    window: activity totals (window and last week), per-platform totals and
+    Activity Time stats. First/last activity are kept per report day
+    (`day_windows`, e.g. "01/05/26: 09:00 AM - 05:30 PM"), since a first and
+    last taken across days would span midnight. Computed with whole-frame
+    operations, not per member.
+    """
+    today, start = data['today'], data['start']
+    week_ago = timedelta(days=COMPARE_DAYS)
+    members = data['rollup']['members']
+    frame = pd.DataFrame({
+        'activities': members.loc[start:today].sum(),
+        'last_week': members.loc[start - week_ago:today - week_ago].sum(),
+    }).astype(int)
+
+    time_df = data['time']
+    if time_df is not None:
+        window = time_df.loc[start:today]
+        day_windows = (window.index.strftime(SHEET_DATE_FORMAT) + ': ' + window['First Activity (PST)'].astype(str)
+                       + ' - ' + window['Last Activity (PST)'].astype(str))
+        stats = window.assign(day_windows=day_windows).groupby('Team Member').agg(
+            day_windows=('day_windows', '<br>'.join),
+            hours=('Active Window (Hours)', 'sum'),
+            focus=('Focus Time (Hours)', 'sum'),
+            sessions=('Sessions', 'sum'),
+            longest_break=('Longest Break (Minutes)', 'max'),
+        )
+        frame = frame.join(stats, how='outer')
+    frame['activities'] = frame['activities'].fillna(0).astype(int)
+    frame['last_week'] = frame['last_week'].fillna(0).astype(int)
+    has_time = frame['hours'].notna() if 'hours' in frame else False
+    frame = frame[(frame['activities'] > 0) | has_time]
+
+    active = frame['activities'][frame['activities'] > 0]
+    team_avg = active.mean() if len(active) else 0
+    frame['team_avg'] = team_avg
+    frame['wow_change'] = [pct_change(a, b) for a, b in zip(frame['activities'], frame['last_week'])]
+    frame['vs_team'] = [pct_change(a, team_avg) for a in frame['activities']]
+
+    platforms = data['cube'].member_platform_totals(start, today)
+    return frame, platforms.reindex(frame.index, fill_value=0)
+
+
+def display(value, digits=None):
+    """Template value: '-' for missing, rounded numbers otherwise."""
+    if value is None or pd.isna(value):
+        return '-'
+    if digits is None:
+        return str(value)
+    return f"{round(float(value), digits):g}" if digits else str(int(round(float(value))))
+
+
+def render_digests(data, addresses):
+    """[(address, subject, html)] - one digest per member with an address."""
+    frame, platforms = member_summaries(data)
+    date = data['today'].strftime('%m/%d/%y')
+    subject = f"👋 Your Daily Activity Digest - {date}"
+    messages = []
+    for name, row in frame.iterrows():
+        address = addresses.get(name)
+        if not address:
+            continue
+        counts = platforms.loc[name]
+        counts = counts[counts > 0].sort_values(ascending=False)
+        platform_rows = ''.join(PLATFORM_ROW.substitute(platform=p, count=f"{int(c):,}") for p, c in counts.items())
+        html = DIGEST_TEMPLATE.substitute(
+            first_name=str(name).split()[0],
+            date=date,
+            activities=f"{int(row['activities']):,}",
+            last_week=f"{int(row['last_week']):,}",
+            wow_change=format_change(row['wow_change']),
+            team_avg=round(row['team_avg']),
+            vs_team=format_change(row['vs_team']),
+            platform_rows=platform_rows or '<li>No activity recorded</li>',
+            day_windows=display(row.get('day_windows')),
+            hours=display(row.get('hours'), 1),
+            focus=display(row.get('focus'), 1),
+            sessions=display(row.get('sessions'), 0),
+            longest_break=display(row.get('longest_break'), 0),
+            dashboard_url=DASHBOARD_URL,
+        )
+        messages.append((address, subject, html))
+    return messages
+
+
+def build_message(sender, recipients, subject, html_content):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = ', '.join(recipients)
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+def send_digests_smtp(user, password, messages):
+    """
+    Send every digest over one SMTP connection (a single login). A dropped
+    connection is reopened once. Returns the number of digests sent.
+    """
+    sent = 0
+    server = None
+    try:
+        for address, subject, html in messages:
+            msg = build_message(f"Pvragon Activity Bot <{user}>", [address], subject, html)
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
+                        server.login(user, password)
+                    server.send_message(msg)
+                    sent += 1
+                    break
+                except smtplib.SMTPServerDisconnected as e:
+                    server = None
+                    if attempt:
+                        print(f"  [ERROR] {address}: {e}")
+                except Exception as e:
+                    print(f"  [ERROR] {address}: {e}")
+                    break
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                pass
+    return sent
+
+
+def send_digests_gmail(creds, messages, batch_size=None):
+    """
+    Send digests through one Gmail API client in batch requests of at most
+    DIGEST_BATCH_SIZE messages, which bounds how many sends are in flight.
+    Returns the number of digests sent.
+    """
+    from googleapiclient.discovery import build
+    batch_size = batch_size or DIGEST_BATCH_SIZE
+    service = build('gmail', 'v1', credentials=creds)
+    sent = []
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            print(f"  [ERROR] {request_id}: {exception}")
+        else:
+            sent.append(request_id)
+
+    for i in range(0, len(messages), batch_size):
+        batch = service.new_batch_http_request(callback=on_response)
+        for address, subject, html in messages[i:i + batch_size]:
+            raw = base64.urlsafe_b64encode(build_message('me', [address], subject, html).as_bytes()).decode()
+            batch.add(service.users().messages().send(userId='me', body={'raw': raw}), request_id=address)
+        batch.execute()
+    return len(sent)
+
+
+def send_member_digests(creds, data):
+    """Render and send every member digest. Returns True if none failed."""
+    messages = render_digests(data, member_addresses())
+    if not messages:
+        print("  [SKIP] No members with activity and an address")
+        return True
+    if EMAIL_USER and EMAIL_PASSWORD:
+        print(f"  Sending {len(messages)} digests over one SMTP connection...")
+        sent = send_digests_smtp(EMAIL_USER, EMAIL_PASSWORD, messages)
+    else:
+        print(f"  Sending {len(messages)} digests via Gmail API batches of {DIGEST_BATCH_SIZE}...")
+        sent = send_digests_gmail(creds, messages)
+    print(f"  [SUCCESS] {sent} of {len(messages)} digests sent")
+    return sent == len(messages)
+
+
 def send_email_smtp(user, password, recipients, subject, html_content):
     """Send email using SMTP (App Password)."""
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"Pvragon Activity Bot <{user}>"
-        msg['To'] = ', '.join(recipients)
-        
-        msg.attach(MIMEText(html_content, 'html'))
+        msg = build_message(f"Pvragon Activity Bot <{user}>", recipients, subject, html_content)
         
         # Connect to Gmail SMTP (SSL)
         with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
@@ -227,16 +500,9 @@ def send_email_smtp(user, password, recipients, subject, html_content):
 
 def send_email(creds, recipients, subject, html_content):
     """Send email using Gmail API."""
+    from googleapiclient.discovery import build
     service = build('gmail', 'v1', credentials=creds)
-    
-    message = MIMEMultipart('alternative')
-    message['Subject'] = subject
-    message['From'] = 'me'
-    message['To'] = ', '.join(recipients)
-    
-    # Attach HTML content
-    html_part = MIMEText(html_content, 'html')
-    message.attach(html_part)
+    message = build_message('me', recipients, subject, html_content)
     
     # Encode and send
     raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
@@ -251,6 +517,11 @@ def send_email(creds, recipients, subject, html_content):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Send the daily activity summary email')
+    parser.add_argument('--digests', action='store_true', default=MEMBER_DIGESTS,
+                        help='also send each member their own digest (or set MEMBER_DIGESTS=1)')
+    args = parser.parse_args()
+
     print("=== Sending Daily Activity Summary Email ===")
     
     # Get credentials
@@ -258,9 +529,12 @@ def main():
     
     # Get summary data
     print("[1/3] Fetching summary data...")
-    summary = get_daily_summary(creds)
+    with step('load'):
+        data = load_report_data()
+        summary = get_daily_summary(data)
     print(f"  Total activities: {summary['total_activities']:,}")
     print(f"  Active members: {summary['active_members']}")
+    print(f"  Week over week: {format_change(summary['wow_change'])}, vs 7-day average: {format_change(summary['vs_avg_7d'])}")
     
     # Generate email
     print("[2/3] Generating email...")
@@ -270,13 +544,20 @@ def main():
     # Send email
     print(f"[3/3] Sending to: {', '.join(EMAIL_RECIPIENTS)}")
     
-    if EMAIL_USER and EMAIL_PASSWORD:
-        print(f"  Using SMTP (App Password)...")
-        success = send_email_smtp(EMAIL_USER, EMAIL_PASSWORD, EMAIL_RECIPIENTS, subject, html)
-    else:
-        print(f"  Using Gmail API (OAuth)...")
-        success = send_email(creds, EMAIL_RECIPIENTS, subject, html)
+    with step('send'):
+        if EMAIL_USER and EMAIL_PASSWORD:
+            print(f"  Using SMTP (App Password)...")
+            success = send_email_smtp(EMAIL_USER, EMAIL_PASSWORD, EMAIL_RECIPIENTS, subject, html)
+        else:
+            print(f"  Using Gmail API (OAuth)...")
+            success = send_email(creds, EMAIL_RECIPIENTS, subject, html)
     
+    if args.digests:
+        print("[+] Sending member digests...")
+        with step('digests'):
+            if not send_member_digests(creds, data):
+                print("  [WARN] Some digests were not sent. Check logs above.")
+
     if success:
         print("\n[COMPLETE] Daily summary email sent successfully!")
     else:
@@ -0,0 +1,658 @@
+"""
+Google Sheets I/O Helpers
+=========================
+Shared read/write helpers for every stage that touches the Sheet.
+
+Reading:
+- read_tabs() fetches several tabs with a single values_batch_get call
+  (unformatted values) and returns one typed DataFrame per tab with
+  normalized column names: Name, Date (datetime64), Platform, Event Type,
+  Count (int).
+
+Writing:
+- SheetSink.write() streams the new rows of a tab once, hashing them in
+  blocks of SNAPSHOT_BLOCK_ROWS. It compares each block with a local snapshot
+  of what was last written (state/sheets/: one hash per block). It only queues
+  the blocks that differ, the appended tail and a clear of any rows that
+  disappeared. Rows added above unchanged content (newest-first tabs) are
+  inserted with one insertDimension request instead of shifting every row
+  down. A full rewrite only happens when the layout (header / width) changed
+  or no snapshot exists. Stale cells are cleared after the new values are
+  written, so a failure never leaves a half-empty tab. Queued values are
+  spooled to a temp file, so a full rewrite of a large tab is never held in
+  memory.
+- The snapshot is only trusted when its digest matches the one stored in the
+  tab's developer metadata (SNAPSHOT_METADATA_KEY). That digest is
+  invalidated before a tab's writes and set after they all succeed. A lost
+  cache, a stale restored snapshot or an upload that died halfway therefore
+  means a full rewrite rather than a wrong diff. SHEETS_FULL_REWRITE=1 skips the
+  snapshots altogether.
+- UploadScheduler collects the queued writes of every tab, coalesces them
+  into values_batch_update requests sized by cell count, sends the tabs one
+  after another and retries 429 / 5xx responses with backoff inside a
+  per-minute request budget.
+"""
+
+import os
+import re
+import json
+import time
+import math
+import random
+import hashlib
+import tempfile
+from itertools import chain
+from datetime import datetime
+from collections import deque
+
+from config import settings, lazy_import
+from run_manifest import step, count, traced
+pd = lazy_import('pandas')
+gspread = lazy_import('gspread')
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+SNAPSHOT_DIR = os.path.join(ROOT_DIR, 'state', 'sheets')
+
+# Upload tuning (Sheets allows 60 write requests / minute / user by default)
+WRITE_REQUESTS_PER_MINUTE = settings.sheets_writes_per_minute
+MAX_CELLS_PER_REQUEST = 50000
+MAX_RETRIES = 6
+FULL_REWRITE = settings.sheets_full_rewrite
+SNAPSHOT_METADATA_KEY = 'sheet_sink_snapshot'
+# Rows per snapshot block: one hash per block is kept, and a changed block is rewritten whole
+SNAPSHOT_BLOCK_ROWS = 500
+# Rows held while looking for old content pushed down by rows added on top
+SHIFT_SEARCH_ROWS = 20000
+
+# Alternate headers used by the different source tabs -> canonical name
+COLUMN_ALIASES = {
+    'Team Member': 'Name',
+    'User': 'Name',
+    'Activity Date': 'Date',
+    'Activity Type': 'Event Type',
+    'Quantity': 'Count',
+}
+
+# Google Sheets serial dates count days from this epoch
+SHEETS_EPOCH = datetime(1899, 12, 30)
+
+# Date format used in every Sheet tab
+SHEET_DATE_FORMAT = '%m/%d/%y'
+
+
+def quote_tab(title):
+    """A1-notation range for a whole tab (quotes escaped)."""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def parse_sheet_dates(values):
+    """
+    Parse a column of Sheet dates to datetime64.
+    Handles MM/DD/YY strings and unformatted serial numbers; anything else is NaT.
+    """
+    values = pd.Series(values, dtype=object)
+    numeric = pd.to_numeric(values, errors='coerce')
+    is_serial = numeric.notna() & values.map(lambda v: isinstance(v, (int, float)))
+
+    parsed = pd.to_datetime(values.where(~is_serial).astype(str), format=SHEET_DATE_FORMAT, errors='coerce')
+    serial = SHEETS_EPOCH + pd.to_timedelta(numeric.where(is_serial), unit='D')
+    return parsed.where(~is_serial, serial).dt.normalize()
+
+
+def values_to_frame(values):
+    """Turn a raw values grid (header row first) into a typed, normalized DataFrame."""
+    if not values:
+        return pd.DataFrame()
+
+    header = [str(h).strip() for h in values[0]]
+    width = len(header)
+    # The API trims trailing empty cells, so pad ragged rows
+    rows = [list(r[:width]) + [''] * (width - len(r)) for r in values[1:]]
+    df = pd.DataFrame(rows, columns=header)
+
+    # Normalize column names; keep the first column when two map to the same name
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(c, c))
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    if 'Date' in df.columns:
+        df['Date'] = parse_sheet_dates(df['Date'])
+    if 'Count' in df.columns:
+        df['Count'] = pd.to_numeric(df['Count'], errors='coerce').fillna(0).astype(int)
+    for col in ('Name', 'Platform', 'Event Type'):
+        if col in df.columns:
+            df[col] = df[col].map(lambda v: '' if v is None else str(v).strip())
+    return df
+
+
+@traced()
+def read_tabs(sh, tabs, existing=None):
+    """
+    Read several tabs in one values_batch_get call.
+    Returns {tab: DataFrame}; tabs that do not exist are left out.
+    `existing` (set of tab titles) saves the metadata call when already known.
+    """
+    if existing is None:
+        existing = {ws.title for ws in sh.worksheets()}
+    present = [t for t in tabs if t in existing]
+    for t in tabs:
+        if t not in existing:
+            print(f"  [WARN] {t}: tab not found")
+    if not present:
+        return {}
+
+    resp = sh.values_batch_get(
+        [quote_tab(t) for t in present],
+        params={'valueRenderOption': 'UNFORMATTED_VALUE'},
+    )
+    frames = {}
+    for tab, value_range in zip(present, resp.get('valueRanges', [])):
+        frames[tab] = values_to_frame(value_range.get('values', []))
+    return frames
+
+
+# ==========================================
+# Daily Audit partitions
+# ==========================================
+# With DAILY_AUDIT_PARTITIONING=monthly the Daily Audit is written as one tab
+# per month plus a small index tab listing them.
+DAILY_AUDIT_TAB = 'Daily Audit'
+DAILY_AUDIT_INDEX_TAB = 'Daily Audit Index'
+PARTITIONING = settings.daily_audit_partitioning
+
+
+def partition_tab(month):
+    """Tab name for a 'YYYY-MM' partition."""
+    return f"{DAILY_AUDIT_TAB} {month}"
+
+
+def read_daily_audit(sh, start=None, end=None):
+    """
+    Daily Audit rows for [start, end] as a typed frame (Name, Date, Platform,
+    Event Type, Count). Reads only the monthly partitions overlapping the range
+    when an index tab exists, otherwise the single Daily Audit tab.
+    """
+    existing = {ws.title for ws in sh.worksheets()}
+    start = None if start is None else pd.Timestamp(start).normalize()
+    end = None if end is None else pd.Timestamp(end).normalize()
+
+    if DAILY_AUDIT_INDEX_TAB in existing:
+        index = read_tabs(sh, [DAILY_AUDIT_INDEX_TAB], existing)[DAILY_AUDIT_INDEX_TAB]
+        first = '0000-00' if start is None else start.strftime('%Y-%m')
+        last = '9999-99' if end is None else end.strftime('%Y-%m')
+        tabs = [tab for tab, month in zip(index.get('Tab', []), index.get('Month', []))
+                if first <= str(month) <= last]
+    else:
+        tabs = [DAILY_AUDIT_TAB]
+
+    frames = [df for df in read_tabs(sh, tabs, existing).values() if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=['Name', 'Date', 'Platform', 'Event Type', 'Count'])
+    df = pd.concat(frames, ignore_index=True)
+    if start is not None:
+        df = df[df['Date'] >= start]
+    if end is not None:
+        df = df[df['Date'] <= end]
+    return df
+
+
+# ==========================================
+# Writing
+# ==========================================
+def cell_value(v):
+    """Make a cell JSON-safe (numpy scalars -> Python, NaN/None -> '')."""
+    if v is None:
+        return ''
+    if hasattr(v, 'item'):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return ''
+    return v
+
+
+def row_hash(row):
+    """Short stable fingerprint of one row."""
+    return hashlib.blake2b(json.dumps(row, default=str).encode(), digest_size=8).hexdigest()
+
+
+def block_hash(row_hashes):
+    """Fingerprint of a block of rows, from their row hashes."""
+    return hashlib.blake2b(''.join(row_hashes).encode(), digest_size=8).hexdigest()
+
+
+def snapshot_digest(snap):
+    """Fingerprint of a snapshot, as stored in the tab's developer metadata."""
+    return row_hash([snap['width'], snap['rows'], snap['header'], snap['blocks']])
+
+
+def is_retryable(error):
+    """429 (quota) and 5xx responses are worth retrying."""
+    return isinstance(error, gspread.exceptions.APIError) and (error.code == 429 or error.code >= 500)
+
+
+class UploadScheduler:
+    """
+    Central queue for Sheet writes.
+
+    Writes are grouped per tab, coalesced into values_batch_update requests of
+    at most MAX_CELLS_PER_REQUEST cells, and tabs are sent one after another
+    (gspread sends every call through one requests.Session, which is not
+    thread-safe; the per-minute budget is the limit either way). Every
+    request goes through a shared per-minute budget; 429s and 5xx errors are
+    retried with exponential backoff.
+    """
+
+    def __init__(self, sh, requests_per_minute=WRITE_REQUESTS_PER_MINUTE,
+                 max_cells=MAX_CELLS_PER_REQUEST):
+        self.sh = sh
+        self.requests_per_minute = requests_per_minute
+        self.max_cells = max_cells
+        self.pending = {}            # tab -> {'requests', 'values', 'clears', 'final', 'on_send', 'on_success'}
+        self.requests_sent = 0
+        self.retries = 0
+        self._sent_at = deque()
+
+    # ------------------------------------------
+    # Queueing
+    # ------------------------------------------
+    def _tab(self, tab):
+        return self.pending.setdefault(tab, {'requests': [], 'values': None, 'clears': [], 'final': [],
+                                             'on_send': [], 'on_success': []})
+
+    def add_request(self, tab, request):
+        """Structural batchUpdate request, sent before the tab's values."""
+        self._tab(tab)['requests'].append(request)
+
+    def add_final_request(self, tab, request):
+        """batchUpdate request sent once the tab's values and clears have succeeded."""
+        self._tab(tab)['final'].append(request)
+
+    def add_values(self, tab, a1_range, values):
+        """Queue a value range. Spooled to a temp file, so queued tabs cost no memory."""
+        job = self._tab(tab)
+        if job['values'] is None:
+            job['values'] = tempfile.TemporaryFile('w+')
+        job['values'].write(json.dumps({'range': a1_range, 'values': values}) + '\n')
+
+    def add_clear(self, tab, a1_range):
+        self._tab(tab)['clears'].append(a1_range)
+
+    def on_send(self, tab, callback):
+        """Run `callback()` right before the first request for `tab` is sent."""
+        self._tab(tab)['on_send'].append(callback)
+
+    def on_success(self, tab, callback):
+        """Run `callback()` once every write queued for `tab` has succeeded."""
+        self._tab(tab)['on_success'].append(callback)
+
+    # ------------------------------------------
+    # Sending
+    # ------------------------------------------
+    def _throttle(self):
+        """Block until another request fits in the per-minute budget."""
+        while True:
+            now = time.monotonic()
+            while self._sent_at and now - self._sent_at[0] >= 60:
+                self._sent_at.popleft()
+            if len(self._sent_at) < self.requests_per_minute:
+                self._sent_at.append(now)
+                self.requests_sent += 1
+                return
+            time.sleep(60 - (now - self._sent_at[0]))
+
+    def call(self, fn, *args, **kwargs):
+        """Run one write request within the budget, retrying quota / server errors."""
+        for attempt in range(MAX_RETRIES + 1):
+            self._throttle()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == MAX_RETRIES or not is_retryable(e):
+                    raise
+                delay = min(64, 2 ** attempt) + random.random()
+                self.retries += 1
+                count('retries')
+                print(f"    [RETRY] {getattr(e, 'code', '')} - waiting {delay:.1f}s")
+                time.sleep(delay)
+
+    def _batches(self, data):
+        """Split value ranges into requests of at most max_cells cells."""
+        batch, cells = [], 0
+        for item in data:
+            n = sum(len(r) for r in item['values'])
+            if batch and cells + n > self.max_cells:
+                yield batch
+                batch, cells = [], 0
+            batch.append(item)
+            cells += n
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _spooled(spool):
+        """Value ranges queued by add_values, in order."""
+        if spool is None:
+            return
+        with spool:
+            spool.seek(0)
+            for line in spool:
+                yield json.loads(line)
+
+    def _split(self, data):
+        """Break value ranges larger than max_cells into row slices."""
+        for item in data:
+            values = item['values']
+            width = max((len(r) for r in values), default=1) or 1
+            step = max(1, self.max_cells // width)
+            if len(values) <= step:
+                yield item
+                continue
+            sheet, _, a1 = item['range'].rpartition('!')
+            first_row = int(re.search(r'\d+', a1).group())
+            for i in range(0, len(values), step):
+                start = first_row + i
+                chunk = values[i:i + step]
+                end = gspread.utils.rowcol_to_a1(start + len(chunk) - 1, width)
+                yield {'range': f"{sheet}!A{start}:{end}", 'values': chunk}
+
+    def _send_tab(self, tab, job):
+        with step('upload_tab', tab=tab):
+            for callback in job['on_send']:
+                callback()
+            if job['requests']:
+                with step('structure', tab=tab):
+                    self.call(self.sh.batch_update, {'requests': job['requests']})
+            for batch in self._batches(self._split(self._spooled(job['values']))):
+                rows = sum(len(b['values']) for b in batch)
+                with step('upload_chunk', tab=tab, rows=rows):
+                    self.call(self.sh.values_batch_update, body={'valueInputOption': 'RAW', 'data': batch})
+                count('rows_written', rows)
+                print(f"    {tab}: wrote {rows} rows")
+            if job['clears']:
+                with step('clear', tab=tab):
+                    self.call(self.sh.values_batch_clear, body={'ranges': job['clears']})
+            if job['final']:
+                with step('structure', tab=tab):
+                    self.call(self.sh.batch_update, {'requests': job['final']})
+            for callback in job['on_success']:
+                callback()
+
+    def flush(self):
+        """Send everything queued, tab by tab. Raises RuntimeError listing the tabs that failed."""
+        jobs, self.pending = self.pending, {}
+        if not jobs:
+            return
+        failures = {}
+        for tab, job in jobs.items():
+            try:
+                self._send_tab(tab, job)
+            except Exception as e:
+                failures[tab] = e
+        print(f"  [UPLOAD] {self.requests_sent} write requests, {self.retries} retries")
+        if failures:
+            raise RuntimeError('; '.join(f"{tab}: {e}" for tab, e in failures.items()))
+
+
+class TabGrid:
+    """Id and grid size of a tab, including grid changes queued but not yet sent."""
+    __slots__ = ('id', 'title', 'row_count', 'col_count')
+
+    def __init__(self, id, title, row_count, col_count):
+        self.id = id
+        self.title = title
+        self.row_count = row_count
+        self.col_count = col_count
+
+
+class SheetSink:
+    """
+    Diff-based tab writer.
+
+    write() compares the new rows against the snapshot of what was last
+    written to the tab and queues only the changed rows on the scheduler.
+    Nothing is sent before flush(), not even new tabs or grid resizes;
+    snapshots (and the digest in the tab's developer metadata) are dropped
+    when a tab's requests start and saved once they all succeed.
+    """
+
+    def __init__(self, sh, scheduler=None, snapshot_dir=SNAPSHOT_DIR):
+        self.sh = sh
+        self.scheduler = scheduler or UploadScheduler(sh)
+        self.snapshot_dir = snapshot_dir
+        self._worksheets = None
+        self._digests = None         # sheet id -> snapshot digest in the tab's metadata
+
+    # ------------------------------------------
+    # Snapshots
+    # ------------------------------------------
+    def _snapshot_path(self, tab):
+        return os.path.join(self.snapshot_dir, re.sub(r'[^A-Za-z0-9]+', '_', tab) + '.json')
+
+    def _load_snapshot(self, tab, ws):
+        path = self._snapshot_path(tab)
+        if FULL_REWRITE or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snap.get('spreadsheet_id') != self.sh.id or snap.get('sheet_id') != ws.id:
+            return None
+        if snapshot_digest(snap) != self._sheet_digests().get(ws.id):
+            print(f"  [WARN] {tab}: local snapshot does not match the Sheet, rewriting the whole tab")
+            return None
+        return snap
+
+    def _save_snapshot(self, tab, snap):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(tab)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(snap, f)
+        os.replace(tmp, path)
+
+    def _sheet_digests(self):
+        """Snapshot digests stored in the developer metadata of every tab (one read)."""
+        if self._digests is None:
+            meta = self.sh.fetch_sheet_metadata(params={
+                'fields': 'sheets(properties.sheetId,developerMetadata(metadataKey,metadataValue))'})
+            self._digests = {
+                sheet['properties']['sheetId']: m.get('metadataValue')
+                for sheet in meta.get('sheets', [])
+                for m in sheet.get('developerMetadata', [])
+                if m.get('metadataKey') == SNAPSHOT_METADATA_KEY
+            }
+        return self._digests
+
+    def _digest_request(self, ws, value):
+        """Create or update the snapshot digest in the developer metadata of `ws`."""
+        digests = self._sheet_digests()
+        if ws.id in digests:
+            request = {'updateDeveloperMetadata': {
+                'dataFilters': [{'developerMetadataLookup': {
+                    'metadataKey': SNAPSHOT_METADATA_KEY, 'metadataLocation': {'sheetId': ws.id}}}],
+                'developerMetadata': {'metadataValue': value},
+                'fields': 'metadataValue',
+            }}
+        else:
+            request = {'createDeveloperMetadata': {'developerMetadata': {
+                'metadataKey': SNAPSHOT_METADATA_KEY, 'metadataValue': value,
+                'location': {'sheetId': ws.id}, 'visibility': 'DOCUMENT',
+            }}}
+        digests[ws.id] = value
+        return request
+
+    def _drop_snapshot(self, tab):
+        # Once writes start, the tab no longer matches the old snapshot
+        try:
+            os.remove(self._snapshot_path(tab))
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------
+    # Worksheets
+    # ------------------------------------------
+    def worksheet(self, tab, rows=1000, cols=10):
+        """TabGrid of `tab`; a missing tab is queued as a new sheet of rows x cols."""
+        if self._worksheets is None:
+            self._worksheets = {ws.title: TabGrid(ws.id, ws.title, ws.row_count, ws.col_count)
+                                for ws in self.sh.worksheets()}
+        ws = self._worksheets.get(tab)
+        if ws is None:
+            used = {w.id for w in self._worksheets.values()}
+            sheet_id = next(i for i in iter(lambda: random.randrange(1, 2 ** 31), None) if i not in used)
+            ws = TabGrid(sheet_id, tab, rows, cols)
+            self.scheduler.add_request(tab, {'addSheet': {'properties': {
+                'sheetId': sheet_id, 'title': tab,
+                'gridProperties': {'rowCount': rows, 'columnCount': cols},
+            }}})
+            self._worksheets[tab] = ws
+        return ws
+
+    # ------------------------------------------
+    # Writing
+    # ------------------------------------------
+    def write(self, tab, rows, min_rows=1000, cols=10):
+        """
+        Queue `rows` (header first; any iterable of row lists) as the new content
+        of `tab`. Only rows that differ from the last write are sent.
+        """
+        with step('sheet_diff', tab=tab):
+            return self._write(tab, rows, min_rows, cols)
+
+    def _write(self, tab, rows, min_rows, cols):
+        ws = self.worksheet(tab, min_rows, cols)
+        prev = self._load_snapshot(tab, ws)
+        rows = iter(rows)
+        header = [cell_value(v) for v in next(rows, [])]
+        if prev and (row_hash(header) != prev['header'] or prev['width'] != len(header)):
+            prev = None                                # layout changed -> full rewrite
+        size = SNAPSHOT_BLOCK_ROWS
+        quoted = quote_tab(tab)
+
+        def queue(first, values):
+            """Queue data rows starting at data row index `first`."""
+            end = gspread.utils.rowcol_to_a1(first + len(values) + 1, max(max(len(r) for r in values), 1))
+            self.scheduler.add_values(tab, f"{quoted}!A{first + 2}:{end}", values)
+
+        def converted():
+            for row in rows:
+                row = [cell_value(v) for v in row]
+                yield row, row_hash(row)
+
+        # Old rows reappearing further down: new rows were added on top. An
+        # old block start found at data row i means i - j * size rows were inserted.
+        held, shift = [], 0
+        if prev:
+            anchors = {h: j for j, h in reversed(list(enumerate(prev['anchors'])))}
+            for row, h in converted():
+                held.append((row, h))
+                j = anchors.get(h)
+                if j is not None and len(held) - 1 >= j * size:
+                    shift = len(held) - 1 - j * size
+                    break
+                if len(held) >= SHIFT_SEARCH_ROWS:
+                    break
+
+        # Stream the rows once: hash the new snapshot's blocks, and queue every
+        # row that is new, inserted or in a block that differs from the old one
+        width = len(header)
+        blocks, anchors, block_rows = [], [], []
+        out, out_first = [], 0         # rows waiting to be queued (contiguous)
+        changed = 0
+        n = 0
+        for i, (row, h) in enumerate(chain(held, converted())):
+            n = i + 1
+            width = max(width, len(row))
+            if i % size == 0:
+                anchors.append(h)
+            block_rows.append(h)
+            if len(block_rows) == size:
+                blocks.append(block_hash(block_rows))
+                block_rows = []
+
+            k = i - shift                                  # row index in the old layout
+            if prev and k >= 0:
+                if k % size == 0:
+                    old_hashes, old_rows = [], []
+                old_hashes.append(h)
+                old_rows.append(row)
+                if k % size == size - 1:
+                    j = k // size
+                    if j >= len(prev['blocks']) or prev['blocks'][j] != block_hash(old_hashes):
+                        queue(i - size + 1, old_rows)
+                        changed += len(old_rows)
+                continue
+            # No snapshot, or a row inserted on top
+            out.append(row)
+            if len(out) == size:
+                queue(out_first, out)
+                changed += len(out)
+                out, out_first = [], i + 1
+        if block_rows:
+            blocks.append(block_hash(block_rows))
+        if prev and n - shift > 0 and (n - shift) % size:
+            j = (n - shift) // size
+            if j >= len(prev['blocks']) or prev['blocks'][j] != block_hash(old_hashes):
+                queue(n - len(old_rows), old_rows)
+                changed += len(old_rows)
+        if out:
+            queue(out_first, out)
+            changed += len(out)
+        total = n + 1
+        if not prev:
+            self.scheduler.add_values(tab, f"{quoted}!A1:{gspread.utils.rowcol_to_a1(1, max(len(header), 1))}", [header])
+            changed += 1
+
+        mode = 'diff' if prev else 'full'
+        if shift:
+            mode += f", {shift} rows inserted"
+        print(f"  [SHEET] {tab}: {total} rows, {changed} changed ({mode})")
+
+        snapshot = {'spreadsheet_id': self.sh.id, 'sheet_id': ws.id, 'width': width, 'rows': total,
+                    'header': row_hash(header), 'blocks': blocks, 'anchors': anchors}
+        if prev and not changed and not shift and total == prev['rows']:
+            return changed            # the tab already matches; nothing to send
+
+        self.scheduler.on_send(tab, lambda: self._drop_snapshot(tab))
+        # Until every write has landed the tab matches no snapshot
+        if ws.id in self._sheet_digests():
+            self.scheduler.add_request(tab, self._digest_request(ws, ''))
+        if shift:
+            self.scheduler.add_request(tab, {'insertDimension': {
+                'range': {'sheetId': ws.id, 'dimension': 'ROWS', 'startIndex': 1, 'endIndex': 1 + shift},
+                'inheritFromBefore': False,
+            }})
+        # Grid rows before this write, counting the inserted ones
+        grid_rows = ws.row_count + shift
+        grid_cols = ws.col_count
+        # Grow the grid before writing past its end
+        if total > grid_rows or width > grid_cols:
+            ws.row_count, ws.col_count = max(grid_rows, total), max(grid_cols, width)
+            self.scheduler.add_request(tab, {'updateSheetProperties': {
+                'properties': {'sheetId': ws.id, 'gridProperties': {'rowCount': ws.row_count, 'columnCount': ws.col_count}},
+                'fields': 'gridProperties(rowCount,columnCount)',
+            }})
+        else:
+            ws.row_count = grid_rows
+
+        # Clear whatever the new content no longer covers
+        old_rows = prev['rows'] + shift if prev else grid_rows
+        if old_rows > total:
+            self.scheduler.add_clear(tab, f"{quoted}!A{total + 1}:{gspread.utils.rowcol_to_a1(old_rows, max(grid_cols, width))}")
+        if not prev and grid_cols > width:
+            first_col = gspread.utils.rowcol_to_a1(1, width + 1).rstrip('1')
+            self.scheduler.add_clear(tab, f"{quoted}!{first_col}1:{gspread.utils.rowcol_to_a1(total, grid_cols)}")
+
+        self.scheduler.add_final_request(tab, self._digest_request(ws, snapshot_digest(snapshot)))
+        self.scheduler.on_success(tab, lambda: self._save_snapshot(tab, snapshot))
+        return changed
+
+    def write_frame(self, tab, df, min_rows=1000, cols=10):
+        """Queue a DataFrame (header + values) as the new content of `tab`."""
+        return self.write(tab, [df.columns.tolist()] + df.values.tolist(), min_rows, cols)
+
+    def flush(self):
+        self.scheduler.flush()
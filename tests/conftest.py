@@ -0,0 +1,12 @@
+"""
+Test Setup
+==========
+The pipeline scripts import each other as top-level modules from
+execution/, so tests do the same.
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'execution'))
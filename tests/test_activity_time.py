@@ -0,0 +1,46 @@
+"""Activity Time Analysis: the streaming engine must match the pandas engine."""
+
+import random
+
+import pandas as pd
+
+import generate_activity_time as gat
+
+NAMES = ['alice@example.com', 'bob', 'carol@example.com', 'dave']
+
+
+def source(seed, days, platform, per_window=2000):
+    """A fetcher-like stream: one sorted batch per 7-day window, oldest first."""
+    rng = random.Random(seed)
+    base = pd.Timestamp('2026-01-01', tz=gat.PST)
+    for start in range(0, days, 7):
+        end = min(days, start + 7) * 1440
+        events = [(rng.choice(NAMES), base + pd.Timedelta(minutes=rng.randrange(start * 1440, end)), platform)
+                  for _ in range(per_window)]
+        yield from gat.sorted_rows(events)
+
+
+def sources():
+    return [source(1, 40, 'Google Workspace'), source(2, 40, 'GitHub'), source(3, 40, 'Backendless', 300)]
+
+
+def test_stream_matches_pandas_engine():
+    streamed = gat.sort_time_rows(pd.DataFrame(gat.stream_time_metrics(sources()), columns=gat.TIME_COLUMNS))
+    events = pd.DataFrame([row for s in sources() for row in s], columns=['name', 'timestamp', 'platform'])
+    expected = gat.compute_time_metrics(events)
+
+    assert len(streamed) == len(expected) > 0
+    pd.testing.assert_frame_equal(streamed.astype(str), expected.astype(str))
+
+
+def test_stream_without_events_yields_nothing():
+    assert list(gat.stream_time_metrics([iter(()), iter(())])) == []
+
+
+def test_pst_windows_are_contiguous_pst_days_across_dst():
+    windows = list(gat.pst_windows('2026-03-01'))[:3]
+
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    # 2026-03-08 switches to PDT; every window still starts at PST midnight
+    assert [start.astimezone(gat.PST).hour for start, _ in windows] == [0, 0, 0]
+    assert windows[1][0].astimezone(gat.PST).strftime('%Y-%m-%d') == '2026-03-08'
@@ -0,0 +1,66 @@
+"""Daily Audit cube: incremental merges must match a full rebuild."""
+
+import numpy as np
+import pandas as pd
+
+from audit_cube import AuditCube, AUDIT_COLUMNS
+
+
+def audit_rows(seed, n, days, members=('A', 'B', 'C', 'D')):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Team Member': rng.choice(list(members), n),
+        'Activity Date': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.choice(list(days), n), 'D'),
+        'Platform': rng.choice(['ClickUp', 'GitHub'], n),
+        'Activity Type': rng.choice(['comment', 'push', 'task'], n),
+        'Count': rng.integers(1, 5, n),
+    }, columns=AUDIT_COLUMNS)
+
+
+def assert_same_cube(a, b):
+    assert a.members == b.members
+    assert a.event_types == b.event_types
+    assert a.dates.equals(b.dates)
+    np.testing.assert_array_equal(np.asarray(a.counts), np.asarray(b.counts))
+
+
+def test_merge_dates_matches_full_rebuild():
+    old = audit_rows(0, 500, range(20))
+    # The last days change, a member appears and dates 15-17 lose all activity
+    fresh = audit_rows(1, 100, range(18, 25), members=('A', 'B', 'E'))
+    full = pd.concat([old[old['Activity Date'] < pd.Timestamp('2026-01-15')], fresh], ignore_index=True)
+    dirty = pd.date_range('2026-01-16', '2026-01-25')
+
+    merged = AuditCube.from_frame(old).merge_dates(
+        AuditCube.from_frame(full[full['Activity Date'].isin(dirty)]), dirty)
+
+    # Day 15 is not dirty, so the merge keeps its old counts
+    expected = pd.concat([old[old['Activity Date'] == pd.Timestamp('2026-01-15')], full], ignore_index=True)
+    assert_same_cube(merged, AuditCube.from_frame(expected))
+
+
+def test_merge_with_nothing_fresh_drops_dirty_dates():
+    cube = AuditCube.from_frame(audit_rows(2, 50, range(5)))
+    merged = cube.merge_dates(AuditCube.from_frame(pd.DataFrame(columns=AUDIT_COLUMNS)), ['2026-01-05'])
+
+    assert pd.Timestamp('2026-01-05') not in merged.dates
+    assert_same_cube(merged.merge_dates(cube, ['2026-01-05']), cube)
+
+
+def test_all_zero_dates_are_dropped_in_both_paths():
+    rows = pd.DataFrame([
+        ['A', '01/02/26', 'GitHub', 'push', 0],
+        ['B', '01/03/26', 'GitHub', 'push', 2],
+    ], columns=AUDIT_COLUMNS)
+    cube = AuditCube.from_frame(rows)
+
+    assert list(cube.dates) == [pd.Timestamp('2026-01-03')]
+    assert_same_cube(cube.merge_dates(AuditCube.from_frame(rows), ['2026-01-02']), cube)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    cube = AuditCube.from_frame(audit_rows(3, 200, range(10)))
+    cube.save(tmp_path)
+
+    assert_same_cube(AuditCube.load(tmp_path), cube)
+    assert AuditCube.load(tmp_path / 'missing') is None
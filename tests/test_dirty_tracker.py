@@ -0,0 +1,72 @@
+"""Dirty-set tracking: per-date fingerprints and pending dates per stage."""
+
+import pandas as pd
+import pytest
+
+import dirty_tracker
+import generate_activity_time
+
+
+@pytest.fixture(autouse=True)
+def dirty_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dirty_tracker, 'DIRTY_DIR', str(tmp_path))
+    monkeypatch.setattr(dirty_tracker, 'PENDING_PATH', str(tmp_path / 'pending.json'))
+    monkeypatch.setattr(dirty_tracker, 'FULL_RECOMPUTE', False)
+    monkeypatch.setattr(dirty_tracker, 'START_DATE', '2026-01-01')
+
+
+def activity(*rows):
+    return pd.DataFrame(list(rows), columns=['Date', 'Name', 'Event Type'])
+
+
+def test_fingerprints_ignore_row_order():
+    df = activity(['01/02/26', 'a', 'push'], ['01/02/26', 'b', 'push'], ['01/03/26', 'a', 'task'])
+
+    fp = dirty_tracker.fingerprints(df)
+    assert set(fp) == {'2026-01-02', '2026-01-03'}
+    assert dirty_tracker.fingerprints(df.iloc[::-1]) == fp
+
+
+def test_nothing_recorded_means_recompute_everything():
+    assert dirty_tracker.load_dirty('daily_audit') is None
+
+
+def test_changed_added_and_removed_dates_become_dirty():
+    dirty_tracker.record_source('Github_Activity', activity(['01/02/26', 'a', 'push'], ['01/03/26', 'a', 'push']))
+    dirty_tracker.clear_dirty('daily_audit')
+    assert dirty_tracker.load_dirty('daily_audit') == set()
+
+    changed = activity(['01/02/26', 'a', 'push'], ['01/03/26', 'b', 'push'], ['01/04/26', 'a', 'push'])
+    assert dirty_tracker.source_changes('Github_Activity', changed) == {'2026-01-03', '2026-01-04'}
+    dirty_tracker.record_source('Github_Activity', changed)
+    assert dirty_tracker.load_dirty('daily_audit') == {'2026-01-03', '2026-01-04'}
+
+    dirty_tracker.clear_dirty('daily_audit')
+    # Dates that disappeared are dirty too
+    dirty_tracker.record_source('Github_Activity', activity(['01/02/26', 'a', 'push']))
+    assert dirty_tracker.load_dirty('daily_audit') == {'2026-01-03', '2026-01-04'}
+
+
+def test_dates_before_start_date_are_ignored():
+    dirty_tracker.record_source('Figma_Activity', activity(['12/31/25', 'a', 'comment'], ['01/05/26', 'a', 'comment']))
+    assert dirty_tracker.load_dirty('activity_time') == {'2026-01-05'}
+
+
+def test_clear_keeps_dates_recorded_after_load():
+    dirty_tracker.record_source('Clickup_Activity', activity(['01/02/26', 'a', 'task']))
+    loaded = dirty_tracker.load_dirty('daily_audit')
+    dirty_tracker.record_source('Clickup_Activity', activity(['01/02/26', 'a', 'task'], ['01/06/26', 'b', 'task']))
+
+    dirty_tracker.clear_dirty('daily_audit', loaded)
+    assert dirty_tracker.load_dirty('daily_audit') == {'2026-01-06'}
+    # Other stages keep their own pending dates
+    assert dirty_tracker.load_dirty('activity_time') == {'2026-01-02', '2026-01-06'}
+
+
+def test_recompute_since_covers_the_earliest_dirty_date(monkeypatch):
+    monkeypatch.setattr(generate_activity_time, 'START_DATE', '2026-01-01')
+    previous = pd.DataFrame(columns=generate_activity_time.TIME_COLUMNS)
+
+    assert generate_activity_time.recompute_since(None, {'2026-02-01'}) is None
+    assert generate_activity_time.recompute_since(previous, None) is None
+    assert generate_activity_time.recompute_since(previous, {'2026-02-01', '2026-03-01'}) == '2026-02-01'
@@ -0,0 +1,76 @@
+"""Dashboard export: content-hashed shards, unchanged data and shard cleanup."""
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import refresh_dashboard
+from audit_cube import AUDIT_COLUMNS
+
+
+@pytest.fixture(autouse=True)
+def dashboard_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(refresh_dashboard, 'DASHBOARD_DIR', str(tmp_path))
+    monkeypatch.setattr(refresh_dashboard, 'SHARD_DIR', str(tmp_path / 'data'))
+    monkeypatch.setattr(refresh_dashboard, 'PRECOMPRESS', False)
+    return tmp_path
+
+
+def audit(*rows):
+    return pd.DataFrame(list(rows), columns=AUDIT_COLUMNS)
+
+
+TIME = pd.DataFrame({
+    'Team Member': ['A'], 'Date': ['01/05/26'], 'First Activity (PST)': ['09:00 AM'],
+    'Last Activity (PST)': ['10:00 AM'], 'Active Window (Hours)': [1.0],
+    'Longest Break (Minutes)': [0], 'Total Events': [2],
+})
+JANUARY = ['A', '01/05/26', 'GitHub', 'push', 1]
+FEBRUARY = ['B', '02/03/26', 'Figma', 'comment', 2]
+
+
+def shard_files(dashboard_dir):
+    return sorted(os.listdir(dashboard_dir / 'data'))
+
+
+def test_shards_are_named_by_content_hash(dashboard_dir):
+    manifest = refresh_dashboard.export_dashboard(audit(JANUARY, FEBRUARY), TIME)
+
+    assert [m['month'] for m in manifest['months']] == ['2026-01', '2026-02']
+    for month in manifest['months']:
+        payload = (dashboard_dir / month['file']).read_bytes()
+        assert month['file'] == f"data/{month['month']}.{refresh_dashboard.content_hash(payload)}.json"
+        assert json.loads(payload)['month'] == month['month']
+
+
+def test_unchanged_data_leaves_the_manifest_alone(dashboard_dir):
+    refresh_dashboard.export_dashboard(audit(JANUARY, FEBRUARY), TIME)
+    before = (dashboard_dir / 'manifest.json').read_bytes()
+
+    refresh_dashboard.export_dashboard(audit(FEBRUARY, JANUARY), TIME)
+    assert (dashboard_dir / 'manifest.json').read_bytes() == before
+
+
+def test_changed_month_gets_a_new_shard_and_old_ones_live_one_more_run(dashboard_dir):
+    first = refresh_dashboard.export_dashboard(audit(JANUARY, FEBRUARY), TIME)
+    second = refresh_dashboard.export_dashboard(audit(JANUARY, FEBRUARY[:4] + [3]), TIME)
+
+    assert first['months'][0]['file'] == second['months'][0]['file']
+    assert first['months'][1]['file'] != second['months'][1]['file']
+    # The previous February shard is kept for pages still on the old manifest
+    assert len(shard_files(dashboard_dir)) == 3
+
+    refresh_dashboard.export_dashboard(audit(JANUARY, FEBRUARY[:4] + [3]), TIME)
+    assert shard_files(dashboard_dir) == sorted(os.path.basename(m['file']) for m in second['months'])
+
+
+def test_precompressed_variants_are_opt_in(dashboard_dir, monkeypatch):
+    monkeypatch.setattr(refresh_dashboard, 'PRECOMPRESS', True)
+    refresh_dashboard.export_dashboard(audit(JANUARY), TIME)
+    assert any(name.endswith('.json.gz') for name in shard_files(dashboard_dir))
+
+    monkeypatch.setattr(refresh_dashboard, 'PRECOMPRESS', False)
+    refresh_dashboard.export_dashboard(audit(JANUARY), TIME)
+    assert all(name.endswith('.json') for name in shard_files(dashboard_dir))
@@ -0,0 +1,81 @@
+"""Email summary: window totals answered from the date-indexed rollup."""
+
+import pandas as pd
+import pytest
+
+import send_daily_email
+from audit_cube import AuditCube, AUDIT_COLUMNS
+
+TODAY = pd.Timestamp('2026-03-10')
+
+
+def report_data(rows, time_df=None):
+    """The dict load_report_data() returns, built from Daily Audit rows."""
+    cube = AuditCube.from_frame(pd.DataFrame(rows, columns=AUDIT_COLUMNS))
+    start = TODAY - pd.Timedelta(days=1)
+    baseline_start = start - pd.Timedelta(days=send_daily_email.COMPARE_DAYS)
+    return {
+        'today': TODAY,
+        'start': start,
+        'baseline_start': baseline_start,
+        'cube': cube,
+        'rollup': cube.daily_rollup(baseline_start, TODAY),
+        'time': time_df,
+    }
+
+
+def day(offset):
+    return (TODAY - pd.Timedelta(days=offset)).strftime('%m/%d/%y')
+
+
+@pytest.fixture
+def data():
+    return report_data([
+        ['Alice', day(0), 'GitHub', 'push', 3],
+        ['Bob', day(1), 'Figma', 'comment', 2],
+        ['Alice', day(7), 'GitHub', 'push', 4],     # same days last week
+        ['Bob', day(8), 'GitHub', 'push', 1],
+        ['Bob', day(5), 'Figma', 'comment', 7],     # baseline only
+        ['Alice', day(30), 'GitHub', 'push', 99],   # outside every window
+    ])
+
+
+def test_window_totals_slice_the_rollup(data):
+    totals = send_daily_email.window_totals(data['rollup'], data['start'], TODAY)
+
+    assert totals['total'] == 5
+    assert totals['members'] == {'Alice': 3, 'Bob': 2}
+    assert totals['platforms'] == {'GitHub': 3, 'Figma': 2}
+
+
+def test_daily_summary_compares_with_last_week_and_the_baseline(data):
+    summary = send_daily_email.get_daily_summary(data)
+
+    assert summary['total_activities'] == 5
+    assert summary['active_members'] == 2
+    assert summary['last_week_activities'] == 5
+    assert summary['wow_change'] == 0
+    # Days 2-8 before today: 7 + 4 + 1
+    assert summary['avg_7d'] == round(12 / 7)
+    assert summary['top_performers'] == [('Alice', 3), ('Bob', 2)]
+
+
+def test_member_summaries_keep_first_and_last_activity_per_day(data):
+    data['time'] = pd.DataFrame({
+        'Team Member': ['Alice', 'Alice'],
+        'Date': [day(1), day(0)],
+        'First Activity (PST)': ['09:00 AM', '10:00 AM'],
+        'Last Activity (PST)': ['11:30 PM', '01:00 PM'],
+        'Active Window (Hours)': [14.5, 3.0],
+        'Longest Break (Minutes)': [45, 10],
+        'Sessions': [3, 1],
+        'Focus Time (Hours)': [6.0, 2.5],
+    }, index=pd.to_datetime([day(1), day(0)], format='%m/%d/%y'))
+
+    frame, platforms = send_daily_email.member_summaries(data)
+
+    alice = frame.loc['Alice']
+    assert alice['day_windows'] == f"{day(1)}: 09:00 AM - 11:30 PM<br>{day(0)}: 10:00 AM - 01:00 PM"
+    assert (alice['hours'], alice['sessions'], alice['longest_break']) == (17.5, 4, 45)
+    assert pd.isna(frame.loc['Bob', 'day_windows'])
+    assert platforms.loc['Bob', 'Figma'] == 2
@@ -0,0 +1,195 @@
+"""SheetSink diff writes, checked against an in-memory spreadsheet."""
+
+import gspread
+import pytest
+
+from sheets_io import SheetSink, UploadScheduler, SNAPSHOT_BLOCK_ROWS, SNAPSHOT_METADATA_KEY
+
+
+def a1_bounds(a1):
+    start, _, end = a1.rpartition('!')[2].partition(':')
+    (r1, c1), (r2, c2) = gspread.utils.a1_to_rowcol(start), gspread.utils.a1_to_rowcol(end)
+    return r1, c1, r2, c2
+
+
+class FakeWorksheet:
+    def __init__(self, id, title, rows, cols):
+        self.id, self.title, self.row_count, self.col_count = id, title, rows, cols
+
+
+class FakeSpreadsheet:
+    """Applies the requests SheetSink sends to in-memory grids."""
+
+    id = 'spreadsheet'
+
+    def __init__(self):
+        self.sheets = {}         # title -> FakeWorksheet
+        self.cells = {}          # title -> {(row, col): value}, 1-based
+        self.metadata = {}       # sheet id -> snapshot digest
+        self.calls = []
+
+    def add(self, title, rows=1000, cols=10, id=7):
+        self.sheets[title] = FakeWorksheet(id, title, rows, cols)
+        self.cells[title] = {}
+
+    def worksheets(self):
+        return list(self.sheets.values())
+
+    def fetch_sheet_metadata(self, params=None):
+        return {'sheets': [{'properties': {'sheetId': sid}, 'developerMetadata': [
+            {'metadataKey': SNAPSHOT_METADATA_KEY, 'metadataValue': value}]}
+            for sid, value in self.metadata.items()]}
+
+    def _title(self, sheet_id):
+        return next(t for t, ws in self.sheets.items() if ws.id == sheet_id)
+
+    def _range_title(self, a1):
+        return a1.rpartition('!')[0].strip("'").replace("''", "'")
+
+    def batch_update(self, body):
+        self.calls.append(('batch_update', [next(iter(r)) for r in body['requests']]))
+        for request in body['requests']:
+            kind, req = next(iter(request.items()))
+            if kind == 'addSheet':
+                props = req['properties']
+                grid = props['gridProperties']
+                self.add(props['title'], grid['rowCount'], grid['columnCount'], props['sheetId'])
+            elif kind == 'updateSheetProperties':
+                props = req['properties']
+                ws = self.sheets[self._title(props['sheetId'])]
+                ws.row_count = props['gridProperties']['rowCount']
+                ws.col_count = props['gridProperties']['columnCount']
+            elif kind == 'insertDimension':
+                rng = req['range']
+                title = self._title(rng['sheetId'])
+                n = rng['endIndex'] - rng['startIndex']
+                self.cells[title] = {(r + n if r > rng['startIndex'] else r, c): v
+                                     for (r, c), v in self.cells[title].items()}
+                self.sheets[title].row_count += n
+            elif kind == 'createDeveloperMetadata':
+                meta = req['developerMetadata']
+                assert meta['location']['sheetId'] not in self.metadata
+                self.metadata[meta['location']['sheetId']] = meta['metadataValue']
+            elif kind == 'updateDeveloperMetadata':
+                sid = req['dataFilters'][0]['developerMetadataLookup']['metadataLocation']['sheetId']
+                assert sid in self.metadata
+                self.metadata[sid] = req['developerMetadata']['metadataValue']
+
+    def values_batch_update(self, body):
+        self.calls.append(('values', sum(len(d['values']) for d in body['data'])))
+        for data in body['data']:
+            title = self._range_title(data['range'])
+            r1, c1, r2, c2 = a1_bounds(data['range'])
+            ws = self.sheets[title]
+            assert r2 <= ws.row_count and c2 <= ws.col_count, 'write past the end of the grid'
+            for i, row in enumerate(data['values']):
+                for j, value in enumerate(row):
+                    self.cells[title][(r1 + i, c1 + j)] = value
+
+    def values_batch_clear(self, body):
+        self.calls.append(('clear', len(body['ranges'])))
+        for a1 in body['ranges']:
+            title = self._range_title(a1)
+            r1, c1, r2, c2 = a1_bounds(a1)
+            self.cells[title] = {(r, c): v for (r, c), v in self.cells[title].items()
+                                 if not (r1 <= r <= r2 and c1 <= c <= c2)}
+
+    def grid(self, title):
+        """Non-empty content of a tab as a list of rows."""
+        cells = {k: v for k, v in self.cells[title].items() if v != ''}
+        if not cells:
+            return []
+        height = max(r for r, _ in cells)
+        width = max(c for _, c in cells)
+        return [[cells.get((r, c), '') for c in range(1, width + 1)] for r in range(1, height + 1)]
+
+    def values_sent(self):
+        return sum(n for kind, n in self.calls if kind == 'values')
+
+
+def tab_rows(n, start=0):
+    """Header plus `n` rows, newest first like the report tabs."""
+    return [['Name', 'Value']] + [[f'row {i}', i] for i in range(start + n, start, -1)]
+
+
+@pytest.fixture
+def sheet():
+    sh = FakeSpreadsheet()
+    sh.add('Tab')
+    return sh
+
+
+def write(sh, snapshot_dir, rows, tab='Tab'):
+    sh.calls.clear()
+    sink = SheetSink(sh, UploadScheduler(sh, requests_per_minute=10 ** 6), snapshot_dir=str(snapshot_dir))
+    sink.write(tab, rows)
+    sink.flush()
+
+
+def test_first_write_then_unchanged_rows_send_nothing(sheet, tmp_path):
+    rows = tab_rows(1200)
+    write(sheet, tmp_path, rows)
+    assert sheet.grid('Tab') == rows
+
+    write(sheet, tmp_path, rows)
+    assert sheet.calls == []
+
+
+def test_only_changed_blocks_are_sent(sheet, tmp_path):
+    rows = tab_rows(3 * SNAPSHOT_BLOCK_ROWS)
+    write(sheet, tmp_path, rows)
+
+    rows[SNAPSHOT_BLOCK_ROWS + 10] = ['edited', -1]
+    write(sheet, tmp_path, rows)
+
+    assert sheet.grid('Tab') == rows
+    assert 0 < sheet.values_sent() <= SNAPSHOT_BLOCK_ROWS
+
+
+def test_new_rows_on_top_are_inserted(sheet, tmp_path):
+    rows = tab_rows(2 * SNAPSHOT_BLOCK_ROWS)
+    write(sheet, tmp_path, rows)
+
+    grown = tab_rows(2 * SNAPSHOT_BLOCK_ROWS + 3)
+    write(sheet, tmp_path, grown)
+
+    assert sheet.grid('Tab') == grown
+    assert ('batch_update', ['updateDeveloperMetadata', 'insertDimension']) in sheet.calls
+    assert sheet.values_sent() == 3
+
+
+def test_shorter_content_clears_the_leftover_rows(sheet, tmp_path):
+    write(sheet, tmp_path, tab_rows(900))
+
+    shorter = tab_rows(900)[:301]
+    write(sheet, tmp_path, shorter)
+
+    assert sheet.grid('Tab') == shorter
+    assert ('clear', 1) in sheet.calls
+    # Only the now partial last block is re-sent
+    assert sheet.values_sent() <= SNAPSHOT_BLOCK_ROWS
+
+
+def test_stale_local_snapshot_forces_a_full_rewrite(sheet, tmp_path):
+    rows = tab_rows(600)
+    write(sheet, tmp_path, rows)
+    stale = (tmp_path / 'Tab.json').read_text()
+    write(sheet, tmp_path, tab_rows(600, start=5))
+
+    # e.g. a state cache restored from an older run
+    (tmp_path / 'Tab.json').write_text(stale)
+    write(sheet, tmp_path, rows)
+
+    assert sheet.grid('Tab') == rows
+    assert sheet.values_sent() == len(rows)
+
+
+def test_new_tab_is_created_and_grown_only_on_flush(sheet, tmp_path):
+    rows = tab_rows(1500)
+    sink = SheetSink(sheet, UploadScheduler(sheet, requests_per_minute=10 ** 6), snapshot_dir=str(tmp_path))
+    sink.write('New Tab', rows, 1000, 3)
+
+    assert sheet.calls == [] and 'New Tab' not in sheet.sheets
+    sink.flush()
+    assert sheet.grid('New Tab') == rows
+    assert sheet.sheets['New Tab'].row_count >= len(rows)